@@ -0,0 +1,140 @@
+"""
+Load benchmark: sync (threadpool) vs async (DB_ASYNC=true) request handling.
+
+Seeds a database, then for each mode starts the API under uvicorn and
+drives the public tracking endpoint with 50/200/1000 concurrent clients,
+reporting requests/sec and latency percentiles.
+
+Usage (from backend/, needs httpx):
+    python -m benchmarks.async_load --database-url postgresql://... --duration 15
+Without --database-url a local SQLite file is used, which mostly measures
+the server itself rather than network latency to the database.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def seed(database_url: str, parcels: int):
+    os.environ["DATABASE_URL"] = database_url
+    sys.path.insert(0, BACKEND_DIR)
+    from config.database import engine, SessionLocal
+    from migrations.runner import run_migrations
+    from models.sql_models import User, Parcel
+
+    run_migrations(engine)
+    db = SessionLocal()
+    try:
+        existing = db.query(Parcel.tracking_number).filter(Parcel.tracking_number.like("BENCH%")).all()
+        if len(existing) >= parcels:
+            return [row.tracking_number for row in existing[:parcels]]
+        sender = db.query(User).filter(User.email == "bench-sender@example.com").first()
+        if not sender:
+            sender = User(name="Bench", email="bench-sender@example.com", password_hash="x", role="customer")
+            db.add(sender)
+            db.flush()
+        db.add_all([
+            Parcel(
+                tracking_number=f"BENCH{i:08d}",
+                sender_id=sender.user_id,
+                receiver_name="Receiver",
+                receiver_phone="0300",
+                receiver_address="Benchmark Street",
+                weight_kg=1.0,
+            )
+            for i in range(len(existing), parcels)
+        ])
+        db.commit()
+        return [f"BENCH{i:08d}" for i in range(parcels)]
+    finally:
+        db.close()
+
+
+def start_server(database_url: str, port: int, **env_overrides):
+    env = dict(os.environ, DATABASE_URL=database_url, **env_overrides)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                return server
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("Server did not start")
+
+
+async def drive(base_url: str, tracking_numbers, concurrency: int, duration: float):
+    latencies = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        stop_at = time.perf_counter() + duration
+
+        async def worker(offset: int):
+            nonlocal errors
+            i = offset
+            while time.perf_counter() < stop_at:
+                started = time.perf_counter()
+                try:
+                    res = await client.get(f"/customer/parcel/track/{tracking_numbers[i % len(tracking_numbers)]}")
+                    if res.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+                i += concurrency
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+def percentile(values, pct: float):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=f"sqlite:///{os.path.join(tempfile.gettempdir(), 'courier_bench.db')}")
+    parser.add_argument("--concurrency", default="50,200,1000")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--parcels", type=int, default=1000)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    tracking_numbers = seed(args.database_url, args.parcels)
+    levels = [int(n) for n in args.concurrency.split(",")]
+
+    print(f"{'mode':<6} {'clients':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for db_async in (False, True):
+        server = start_server(args.database_url, args.port, DB_ASYNC="true" if db_async else "false")
+        try:
+            for concurrency in levels:
+                latencies, errors, elapsed = asyncio.run(
+                    drive(f"http://127.0.0.1:{args.port}", tracking_numbers, concurrency, args.duration)
+                )
+                print(
+                    f"{'async' if db_async else 'sync':<6} {concurrency:>7} {len(latencies) / elapsed:>9.1f} "
+                    f"{percentile(latencies, 50) * 1000:>8.1f} {percentile(latencies, 99) * 1000:>8.1f} {errors:>7}"
+                )
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
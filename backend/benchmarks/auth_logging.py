@@ -0,0 +1,114 @@
+"""
+Auth logging benchmark: per-request cost of logging on the token path.
+
+Decodes tokens from several threads (like the request threadpool) and
+reports the time per call in three setups:
+
+    before      the old decode_token logging: two f-string INFO lines per call,
+                one echoing the decoded payload, written synchronously
+                through logging.basicConfig's handler
+    after       the current decode_token with config.log_config (queue
+                handler, background writer, lazy formatting)
+    no logging  decode_token with logging disabled, the floor
+
+Log output goes to --sink (a file by default; pass /dev/stderr to see it,
+or a slow network mount to see what a slow sink does to requests).
+
+Usage (from backend/):
+    python -m benchmarks.auth_logging --calls 20000 --threads 8
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.async_load import BACKEND_DIR, percentile
+
+
+def legacy_decode_token(token: str):
+    """decode_token as it logged before the logging pipeline"""
+    from jose import jwt
+    from utils.security import SECRET_KEY, ALGORITHM
+
+    logger = logging.getLogger("utils.security")
+    logger.info(f"Decoding token (first 20 chars): {token[:20]}...")
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    logger.info(f"Token decoded successfully: {payload}")
+    return payload
+
+
+def reset_logging():
+    from config import log_config
+
+    log_config.stop_logging()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    for name in log_config.AUTH_LOGGERS:
+        logging.getLogger(name).filters.clear()
+    logging.disable(logging.NOTSET)
+
+
+def run(decode, tokens, threads: int):
+    def timed(token):
+        started = time.perf_counter()
+        decode(token)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = sorted(pool.map(timed, tokens))
+    return latencies, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--sink", default=os.path.join(tempfile.gettempdir(), "courier_auth_logging.log"))
+    args = parser.parse_args()
+
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    sys.path.insert(0, BACKEND_DIR)
+    from config import log_config
+    from utils.security import create_access_token, decode_token
+
+    tokens = [create_access_token({"sub": f"user{i}@example.com", "role": "customer", "user_id": i}) for i in range(args.calls)]
+    # Point stderr at the sink for both setups, so both write to the same place
+    sink = open(args.sink, "a")
+    stderr = sys.stderr
+    sys.stderr = sink
+
+    results = {}
+    try:
+        reset_logging()
+        logging.basicConfig(level=logging.INFO, format=log_config.TEXT_FORMAT, stream=sink)
+        results["before"] = run(legacy_decode_token, tokens, args.threads)
+
+        reset_logging()
+        log_config.configure_logging()
+        results["after"] = run(decode_token, tokens, args.threads)
+        log_config.stop_logging()
+
+        reset_logging()
+        logging.disable(logging.CRITICAL)
+        results["no logging"] = run(decode_token, tokens, args.threads)
+    finally:
+        reset_logging()
+        sys.stderr = stderr
+        sink.close()
+
+    print(f"{'setup':<12}{'calls/s':>10}{'mean us':>10}{'p50 us':>10}{'p99 us':>10}")
+    for name, (latencies, elapsed) in results.items():
+        mean = sum(latencies) / len(latencies)
+        print(
+            f"{name:<12}{len(latencies) / elapsed:>10.0f}{mean * 1e6:>10.1f}"
+            f"{percentile(latencies, 50) * 1e6:>10.1f}{percentile(latencies, 99) * 1e6:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
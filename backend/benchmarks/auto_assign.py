@@ -0,0 +1,91 @@
+"""
+Auto-assignment benchmark: dispatch a large backlog in one run.
+
+Seeds riders and unassigned parcels spread over a number of delivery
+areas, then times utils.dispatch.auto_assign end to end (load, plan, bulk
+insert, commit) and reports how evenly the parcels were spread and how
+many riders each area was split across.
+
+Usage (from backend/):
+    python -m benchmarks.auto_assign --parcels 50000 --riders 500
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from benchmarks.async_load import BACKEND_DIR
+
+
+def seed(database_url: str, parcels: int, riders: int, areas: int):
+    os.environ["DATABASE_URL"] = database_url
+    sys.path.insert(0, BACKEND_DIR)
+    from sqlalchemy import insert
+    from config.database import engine, SessionLocal
+    from migrations.runner import run_migrations
+    from models.sql_models import User, Parcel
+
+    run_migrations(engine)
+    rng = random.Random(42)
+    with SessionLocal() as db:
+        db.execute(insert(User), [
+            {"name": "Bench sender", "email": "bench-dispatch-sender@example.com", "password_hash": "x", "role": "customer"},
+            *(
+                {"name": f"Rider {i}", "email": f"bench-dispatch-rider{i}@example.com", "password_hash": "x", "role": "rider"}
+                for i in range(riders)
+            ),
+        ])
+        sender_id = db.query(User.user_id).filter(User.email == "bench-dispatch-sender@example.com").scalar()
+        db.execute(insert(Parcel), [
+            {
+                "tracking_number": f"DISPATCH{i:08d}",
+                "sender_id": sender_id,
+                "receiver_name": "Receiver",
+                "receiver_phone": "0300",
+                "receiver_address": f"House {i}, Sector {rng.randrange(areas)}, Lahore",
+                "weight_kg": round(rng.uniform(0.2, 5.0), 1),
+                "current_status": "booked",
+            }
+            for i in range(parcels)
+        ])
+        db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parcels", type=int, default=50000)
+    parser.add_argument("--riders", type=int, default=500)
+    parser.add_argument("--areas", type=int, default=300)
+    parser.add_argument("--max-parcels", type=int, default=150, help="per rider")
+    parser.add_argument("--max-weight", type=float, default=500, help="kg per rider")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.gettempdir(), "courier_dispatch_bench.db")
+    if os.path.exists(path):
+        os.remove(path)
+    database_url = f"sqlite:///{path}"
+    seed(database_url, args.parcels, args.riders, args.areas)
+
+    from config.database import SessionLocal
+    from utils.dispatch import address_area, auto_assign
+
+    with SessionLocal() as db:
+        started = time.perf_counter()
+        summary, plan = auto_assign(db, max_parcels=args.max_parcels, max_weight_kg=args.max_weight)
+        elapsed = time.perf_counter() - started
+
+    loads = sorted(rider["parcels"] for rider in summary["riders"])
+    riders_per_area = {}
+    for parcel, rider_id in plan:
+        riders_per_area.setdefault(address_area(parcel.receiver_address), set()).add(rider_id)
+    spread = sorted(len(rider_ids) for rider_ids in riders_per_area.values())
+
+    print(f"assigned         {summary['assigned']} of {args.parcels} parcels to {len(loads)} riders")
+    print(f"elapsed          {elapsed:.2f} s")
+    print(f"parcels/rider    min {loads[0]}  median {loads[len(loads) // 2]}  max {loads[-1]}")
+    print(f"riders/area      min {spread[0]}  median {spread[len(spread) // 2]}  max {spread[-1]}")
+
+
+if __name__ == "__main__":
+    main()
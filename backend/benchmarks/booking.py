@@ -0,0 +1,124 @@
+"""
+Booking throughput benchmark: bookings/sec before and after utils.booking.
+
+    before   the original create path: add the parcel, commit, refresh,
+             add the history row, commit again (staff bookings first look
+             the customer up by email)
+    after    utils.booking.book_parcel: INSERT ... RETURNING, history and
+             counters in one transaction with one commit (the staff lookup
+             is folded into the insert)
+
+Bookings run from --threads threads, each with its own session, like
+concurrent requests.
+
+Usage (from backend/):
+    python -m benchmarks.booking --bookings 2000 --threads 4
+    python -m benchmarks.booking --database-url postgresql://...
+Without --database-url a local SQLite file is used.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.async_load import BACKEND_DIR
+
+CUSTOMER_EMAIL = "bench-booking@example.com"
+
+
+def seed(database_url: str):
+    os.environ["DATABASE_URL"] = database_url
+    sys.path.insert(0, BACKEND_DIR)
+    from config.database import engine, SessionLocal
+    from migrations.runner import run_migrations
+    from models.sql_models import User
+    from utils.tracking import tracking_generator
+
+    run_migrations(engine)
+    # Lease the tracking worker id up front, not inside a booking transaction
+    # (on SQLite the lease write would wait on it and fail as locked)
+    tracking_generator()
+    with SessionLocal() as db:
+        customer = db.query(User).filter(User.email == CUSTOMER_EMAIL).first()
+        if customer is None:
+            customer = User(name="Bench", email=CUSTOMER_EMAIL, password_hash="x", role="customer")
+            db.add(customer)
+            db.commit()
+        return customer.user_id
+
+
+def legacy_book(db, parcel, customer_email: str):
+    """The create path before utils.booking"""
+    from models.sql_models import Parcel, StatusHistory, User
+    from utils.pricing import quote_charges
+    from utils.tracking import new_tracking_number
+
+    customer = db.query(User).filter(User.email == customer_email, User.role == "customer").first()
+    new_parcel = Parcel(
+        sender_id=customer.user_id,
+        receiver_name=parcel.receiver_name,
+        receiver_phone=parcel.receiver_phone,
+        receiver_address=parcel.receiver_address,
+        weight_kg=parcel.weight_kg,
+        charges=quote_charges(parcel.weight_kg, parcel.receiver_address, parcel.service_level),
+        tracking_number=new_tracking_number(),
+        current_status="booked",
+    )
+    db.add(new_parcel)
+    db.commit()
+    db.refresh(new_parcel)
+    db.add(StatusHistory(parcel_id=new_parcel.parcel_id, status="booked"))
+    db.commit()
+    return new_parcel
+
+
+def run(book, bookings: int, threads: int):
+    from config.database import SessionLocal
+    from schemas.pydantic_schemas import ParcelCreate
+
+    parcel = ParcelCreate(receiver_name="Receiver", receiver_phone="0300-1234567", receiver_address="House 1, Gulberg, Lahore", weight_kg=1.5)
+
+    def worker(count: int):
+        with SessionLocal() as db:
+            for _ in range(count):
+                book(db, parcel, CUSTOMER_EMAIL)
+
+    per_thread = [bookings // threads + (1 if i < bookings % threads else 0) for i in range(threads)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(worker, per_thread))
+    return bookings / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url")
+    parser.add_argument("--bookings", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if not database_url:
+        path = os.path.join(tempfile.gettempdir(), "courier_booking_bench.db")
+        if os.path.exists(path):
+            os.remove(path)
+        database_url = f"sqlite:///{path}"
+    seed(database_url)
+
+    from utils.booking import book_parcel
+
+    def current(db, parcel, customer_email):
+        return book_parcel(db, parcel, customer_email=customer_email)
+
+    from utils.tracking import release_worker_lease
+
+    try:
+        for name, book in (("before", legacy_book), ("after", current)):
+            print(f"{name:<8}{run(book, args.bookings, args.threads):>10.0f} bookings/s")
+    finally:
+        release_worker_lease()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Login flood benchmark: does bcrypt work starve the tracking endpoint?
+
+Measures public tracking latency on its own, then again while a crowd of
+clients hammers /auth/login. Runs once with hashing on the request
+threadpool (PASSWORD_HASH_WORKERS=0, the old behaviour) and once with the
+bounded process pool. Logins rejected with 429 are the pool's back-pressure.
+
+Usage (from backend/, needs httpx):
+    python -m benchmarks.login_flood --login-clients 100 --duration 10
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import httpx
+from collections import Counter
+from benchmarks.async_load import BACKEND_DIR, seed, start_server, percentile
+
+LOGIN_EMAIL = "bench-login@example.com"
+LOGIN_PASSWORD = "bench-password"
+
+
+def seed_login_user(database_url: str):
+    os.environ["DATABASE_URL"] = database_url
+    sys.path.insert(0, BACKEND_DIR)
+    from config.database import SessionLocal
+    from models.sql_models import User
+    from utils.security import get_password_hash
+
+    db = SessionLocal()
+    try:
+        if not db.query(User).filter(User.email == LOGIN_EMAIL).first():
+            db.add(User(name="Bench", email=LOGIN_EMAIL, password_hash=get_password_hash(LOGIN_PASSWORD), role="customer"))
+            db.commit()
+    finally:
+        db.close()
+
+
+async def run_phase(base_url: str, tracking_numbers, track_clients: int, login_clients: int, duration: float):
+    track_latencies = []
+    login_statuses = Counter()
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        stop_at = time.perf_counter() + duration
+
+        async def tracker(offset: int):
+            i = offset
+            while time.perf_counter() < stop_at:
+                started = time.perf_counter()
+                await client.get(f"/customer/parcel/track/{tracking_numbers[i % len(tracking_numbers)]}")
+                track_latencies.append(time.perf_counter() - started)
+                i += track_clients
+
+        async def login():
+            while time.perf_counter() < stop_at:
+                try:
+                    res = await client.post("/auth/login", json={"email": LOGIN_EMAIL, "password": LOGIN_PASSWORD})
+                    login_statuses[res.status_code] += 1
+                except httpx.HTTPError:
+                    login_statuses["error"] += 1
+
+        await asyncio.gather(
+            *(tracker(n) for n in range(track_clients)),
+            *(login() for _ in range(login_clients)),
+        )
+    return track_latencies, login_statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=f"sqlite:///{os.path.join(tempfile.gettempdir(), 'courier_bench.db')}")
+    parser.add_argument("--track-clients", type=int, default=20)
+    parser.add_argument("--login-clients", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per phase")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    tracking_numbers = seed(args.database_url, 1000)
+    seed_login_user(args.database_url)
+
+    print(f"{'hashing':<12} {'phase':<13} {'track p50 ms':>12} {'track p99 ms':>12}  logins")
+    for label, workers in (("threadpool", "0"), ("process pool", str(min(4, os.cpu_count() or 1)))):
+        server = start_server(args.database_url, args.port, PASSWORD_HASH_WORKERS=workers)
+        try:
+            base_url = f"http://127.0.0.1:{args.port}"
+            for phase, login_clients in (("idle", 0), ("login flood", args.login_clients)):
+                latencies, logins = asyncio.run(
+                    run_phase(base_url, tracking_numbers, args.track_clients, login_clients, args.duration)
+                )
+                print(
+                    f"{label:<12} {phase:<13} {percentile(latencies, 50) * 1000:>12.1f} "
+                    f"{percentile(latencies, 99) * 1000:>12.1f}  {dict(logins) or '-'}"
+                )
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
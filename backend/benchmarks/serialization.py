@@ -0,0 +1,110 @@
+"""
+Serialization benchmark: building a 10k-parcel JSON response.
+
+Compares, for the same rows:
+
+    orm + jsonable_encoder   select(Parcel) objects through FastAPI's encoder
+                             (what list endpoints without a response_model did)
+    orm + ParcelOut          select(Parcel) objects validated into ParcelOut
+    rows + fast encoder      ParcelOut columns as rows, encoded by
+                             utils.serialization (the current list endpoints)
+
+Each timing covers the query, row/object construction and encoding.
+
+Usage (from backend/):
+    python -m benchmarks.serialization --rows 10000 --repeat 5
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from benchmarks.async_load import BACKEND_DIR
+
+
+def seed(database_url: str, rows: int):
+    os.environ["DATABASE_URL"] = database_url
+    sys.path.insert(0, BACKEND_DIR)
+    from sqlalchemy import insert
+    from config.database import engine, SessionLocal
+    from migrations.runner import run_migrations
+    from models.sql_models import User, Parcel
+
+    run_migrations(engine)
+    with SessionLocal() as db:
+        sender = User(name="Bench sender", email="bench-serial@example.com", password_hash="x", role="customer")
+        db.add(sender)
+        db.flush()
+        db.execute(insert(Parcel), [
+            {
+                "tracking_number": f"SERIAL{i:010d}",
+                "sender_id": sender.user_id,
+                "receiver_name": f"Receiver {i}",
+                "receiver_phone": "0300-1234567",
+                "receiver_address": f"House {i}, Gulberg, Lahore",
+                "weight_kg": 1.5,
+                "charges": 75.0,
+                "current_status": "booked",
+            }
+            for i in range(rows)
+        ])
+        db.commit()
+        return sender.user_id
+
+
+def best_of(repeat: int, fn):
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = len(fn())
+        timings.append(time.perf_counter() - started)
+    return min(timings), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.gettempdir(), "courier_serialization_bench.db")
+    if os.path.exists(path):
+        os.remove(path)
+    sender_id = seed(f"sqlite:///{path}", args.rows)
+
+    from fastapi.encoders import jsonable_encoder
+    from sqlalchemy import select
+    from config.database import SessionLocal
+    from models.sql_models import Parcel
+    from schemas.pydantic_schemas import ParcelOut
+    from utils.serialization import dumps, fetch_parcel_rows
+
+    statement = select(Parcel).where(Parcel.sender_id == sender_id)
+
+    def orm_encoder():
+        with SessionLocal() as db:
+            return json.dumps(jsonable_encoder(db.scalars(statement).all())).encode("utf-8")
+
+    def orm_pydantic():
+        with SessionLocal() as db:
+            parcels = [ParcelOut.model_validate(p) for p in db.scalars(statement).all()]
+            return json.dumps(jsonable_encoder(parcels)).encode("utf-8")
+
+    def fast_rows():
+        with SessionLocal() as db:
+            return dumps(fetch_parcel_rows(db, statement))
+
+    print(f"{'path':<26}{'ms':>10}{'bytes':>12}")
+    for name, fn in (
+        ("orm + jsonable_encoder", orm_encoder),
+        ("orm + ParcelOut", orm_pydantic),
+        ("rows + fast encoder", fast_rows),
+    ):
+        elapsed, size = best_of(args.repeat, fn)
+        print(f"{name:<26}{elapsed * 1000:>10.1f}{size:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+SSE benchmark: memory held by idle event streams and push fan-out latency.
+
+Starts the API under uvicorn, opens N idle /events/staff streams (all as
+one staff user, so the per-user stream cap is raised to N), and
+reports the server's resident memory before and after. Then edits a parcel
+as staff and measures how long each stream takes to receive the
+parcel_updated event.
+
+Every stream is one socket on both ends, so raise the open file limit
+first (e.g. `ulimit -n 65536`) when going past ~1000 connections.
+
+Usage (from backend/, needs httpx):
+    python -m benchmarks.sse_idle --connections 10000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import httpx
+from benchmarks.async_load import BACKEND_DIR, seed, start_server, percentile
+
+
+def staff_token(database_url: str):
+    os.environ["DATABASE_URL"] = database_url
+    sys.path.insert(0, BACKEND_DIR)
+    from utils.security import create_access_token
+
+    return create_access_token({"sub": "bench-staff@example.com", "role": "staff", "user_id": 0})
+
+
+def first_parcel_id(database_url: str, tracking_number: str):
+    from config.database import SessionLocal
+    from models.sql_models import Parcel
+
+    with SessionLocal() as db:
+        return db.query(Parcel.parcel_id).filter(Parcel.tracking_number == tracking_number).scalar()
+
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+async def run(base_url: str, pid: int, token: str, parcel_id: int, connections: int):
+    limits = httpx.Limits(max_connections=connections + 1, max_keepalive_connections=0)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=None) as client:
+        baseline = rss_mb(pid)
+        opened = asyncio.Event()
+        ready = 0
+        received = []
+        published_at = None
+
+        async def listen():
+            nonlocal ready
+            async with client.stream("GET", "/events/staff", headers={"Authorization": f"Bearer {token}"}) as res:
+                lines = res.aiter_lines()
+                await lines.__anext__()  # the retry: preamble
+                ready += 1
+                if ready == connections:
+                    opened.set()
+                async for line in lines:
+                    if line.startswith("data:"):
+                        received.append(time.perf_counter() - published_at)
+                        return
+
+        tasks = [asyncio.create_task(listen()) for _ in range(connections)]
+        await opened.wait()
+        await asyncio.sleep(1)
+        idle = rss_mb(pid)
+
+        published_at = time.perf_counter()
+        res = await client.put(
+            f"/staff/parcel/{parcel_id}",
+            headers={"Authorization": f"Bearer {token}"},
+            json={"receiver_name": "Receiver", "receiver_phone": "0300", "receiver_address": "Benchmark Street", "weight_kg": 1.0},
+        )
+        res.raise_for_status()
+        await asyncio.wait_for(asyncio.gather(*tasks), timeout=60)
+    return baseline, idle, received
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=f"sqlite:///{os.path.join(tempfile.gettempdir(), 'courier_bench.db')}")
+    parser.add_argument("--connections", type=int, default=10000)
+    parser.add_argument("--port", type=int, default=8767)
+    args = parser.parse_args()
+
+    tracking_numbers = seed(args.database_url, 1)
+    token = staff_token(args.database_url)
+    parcel_id = first_parcel_id(args.database_url, tracking_numbers[0])
+
+    # Every stream belongs to the one bench staff user
+    server = start_server(args.database_url, args.port, EVENTS_MAX_STREAMS_PER_CLIENT=str(args.connections))
+    try:
+        baseline, idle, received = asyncio.run(
+            run(f"http://127.0.0.1:{args.port}", server.pid, token, parcel_id, args.connections)
+        )
+    finally:
+        server.terminate()
+        server.wait()
+
+    per_conn_kb = (idle - baseline) * 1024 / args.connections
+    print(f"connections      {args.connections}")
+    print(f"server RSS       {baseline:.1f} MB -> {idle:.1f} MB ({per_conn_kb:.1f} KB per stream)")
+    print(f"fan-out p50      {percentile(received, 50) * 1000:.1f} ms")
+    print(f"fan-out p99      {percentile(received, 99) * 1000:.1f} ms")
+    print(f"fan-out max      {max(received) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
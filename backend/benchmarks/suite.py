@@ -0,0 +1,370 @@
+"""
+Mixed-workload benchmark suite with a JSON baseline for regression checks.
+
+Seeds a database with configurable volumes (customers, riders, parcels,
+rider assignments and status history), then drives the FastAPI `app` from
+main.py with a closed loop of concurrent clients. Each client repeatedly
+picks a scenario by weight:
+
+    tracking    public tracking lookups                 GET  /customer/parcel/track/{tracking_number}
+    customer    a customer's parcel list                GET  /customer/my-parcels
+    rider       a rider's route plus a scan burst       GET  /rider/my-parcels, POST /rider/update-status/batch
+    staff       dashboard counters and a parcel page    GET  /staff/stats, GET /staff/parcels
+    login       password logins (bcrypt)                POST /auth/login
+
+By default the app runs in-process over httpx's ASGI transport, so no
+server is needed. With --url a running server is driven instead (it must
+share the database and SECRET_KEY). Queries per request come from the
+server's own /metrics (see utils/request_metrics.py).
+
+The report lists throughput, p50/p95/p99 latency, errors and queries per
+request for each endpoint; 429 answers (back-pressure) are counted
+separately from errors. --output writes it as JSON. --compare checks a
+run against a saved baseline and exits 1 when throughput or p95 regress by
+more than --tolerance, queries per request grow, or errors appear.
+
+Usage (from backend/):
+    python -m benchmarks.suite --parcels 20000 --duration 20 --output baseline.json
+    python -m benchmarks.suite --parcels 20000 --duration 20 --compare baseline.json
+    python -m benchmarks.suite --workload tracking --concurrency 100
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+import httpx
+from benchmarks.async_load import BACKEND_DIR, percentile
+
+WORKLOADS = {
+    "mixed": {"tracking": 70, "customer": 10, "rider": 10, "staff": 5, "login": 5},
+    "tracking": {"tracking": 1},
+    "rider": {"rider": 1},
+    "staff": {"staff": 1},
+    "login": {"login": 1},
+}
+LIFECYCLE = ("booked", "packed", "in transit", "out for delivery", "delivered")
+PASSWORD = "bench-password"
+SCAN_BURST = 5
+
+
+def seed(database_url: str, customers: int, riders: int, parcels: int, assigned: float, history: int):
+    """Fill an empty database; returns the ids the scenarios need"""
+    os.environ["DATABASE_URL"] = database_url
+    sys.path.insert(0, BACKEND_DIR)
+    from sqlalchemy import insert, select
+    from config.database import engine, SessionLocal
+    from migrations.runner import run_migrations
+    from models.sql_models import DeliveryAssignment, Parcel, StatusHistory, User
+    from utils.security import get_password_hash
+    from utils.stats import reconcile
+    from utils.tracking import new_tracking_number, tracking_generator
+
+    run_migrations(engine)
+    # Lease the tracking worker id before the seed transaction: on SQLite the
+    # lease write on a second connection would wait on it and fail as locked
+    tracking_generator()
+    rng = random.Random(42)
+    password_hash = get_password_hash(PASSWORD)
+    with SessionLocal() as db:
+        db.execute(insert(User), [
+            {"name": "Bench staff", "email": "bench-suite-staff@example.com", "password_hash": password_hash, "role": "staff"},
+            *(
+                {"name": f"Customer {i}", "email": f"bench-suite-customer{i}@example.com", "password_hash": password_hash, "role": "customer"}
+                for i in range(customers)
+            ),
+            *(
+                {"name": f"Rider {i}", "email": f"bench-suite-rider{i}@example.com", "password_hash": password_hash, "role": "rider"}
+                for i in range(riders)
+            ),
+        ])
+        users = db.execute(select(User.user_id, User.email, User.role).where(User.email.like("bench-suite-%"))).all()
+        customer_ids = [u.user_id for u in users if u.role == "customer"]
+        rider_ids = [u.user_id for u in users if u.role == "rider"]
+        staff = next(u for u in users if u.role == "staff")
+
+        now = datetime.utcnow()
+        chunk = 5000
+        for start in range(0, parcels, chunk):
+            rows = []
+            for _ in range(start, min(parcels, start + chunk)):
+                rows.append({
+                    "tracking_number": new_tracking_number(),
+                    "sender_id": rng.choice(customer_ids),
+                    "receiver_name": f"Receiver {rng.randrange(100000)}",
+                    "receiver_phone": f"0300-{rng.randrange(10 ** 7):07d}",
+                    "receiver_address": f"House {rng.randrange(500)}, Sector {rng.randrange(50)}, Lahore",
+                    "weight_kg": round(rng.uniform(0.2, 5.0), 1),
+                    "charges": 100.0,
+                    "current_status": "booked",
+                    "booked_at": now - timedelta(days=rng.randrange(30), seconds=rng.randrange(86400)),
+                })
+            inserted = db.execute(insert(Parcel).returning(Parcel.parcel_id, Parcel.booked_at), rows).all()
+            db.execute(insert(StatusHistory), [
+                {"parcel_id": p.parcel_id, "status": "booked", "updated_at": p.booked_at + timedelta(minutes=i)}
+                for p in inserted for i in range(history)
+            ])
+            assignments = [
+                {"parcel_id": p.parcel_id, "rider_id": rng.choice(rider_ids)}
+                for p in inserted if rider_ids and rng.random() < assigned
+            ]
+            if assignments:
+                db.execute(insert(DeliveryAssignment), assignments)
+        db.commit()
+        reconcile(db)
+
+        tracking_numbers = list(db.scalars(select(Parcel.tracking_number)))
+        routes = defaultdict(deque)
+        for parcel_id, rider_id in db.execute(select(DeliveryAssignment.parcel_id, DeliveryAssignment.rider_id)):
+            routes[rider_id].append(parcel_id)
+    return {
+        "customers": [(u.user_id, u.email) for u in users if u.role == "customer"],
+        "riders": [(u.user_id, u.email) for u in users if u.role == "rider"],
+        "staff": (staff.user_id, staff.email),
+        "tracking_numbers": tracking_numbers,
+        "routes": routes,
+    }
+
+
+class Scenarios:
+    """One method per scenario; each makes its requests through `self.call`"""
+
+    def __init__(self, client, data, rng):
+        from utils.security import create_access_token
+
+        def headers(user_id, email, role):
+            token = create_access_token({"sub": email, "role": role, "user_id": user_id})
+            return {"Authorization": f"Bearer {token}"}
+
+        self.client = client
+        self.data = data
+        self.rng = rng
+        self.customers = [(email, headers(user_id, email, "customer")) for user_id, email in data["customers"]]
+        self.riders = [(user_id, headers(user_id, email, "rider")) for user_id, email in data["riders"]]
+        self.staff_headers = headers(*data["staff"], "staff")
+        self.state = {}  # parcel_id -> index into LIFECYCLE
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.rejected = defaultdict(int)
+        self.operations = 0
+
+    async def call(self, endpoint: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            res = await self.client.request(method, url, **kwargs)
+            status = res.status_code
+        except httpx.HTTPError:
+            res, status = None, None
+        self.latencies[endpoint].append(time.perf_counter() - started)
+        if status == 429:
+            # Back-pressure (e.g. the password hashing queue), not a failure
+            self.rejected[endpoint] += 1
+        elif status is None or status >= 400:
+            self.errors[endpoint] += 1
+        return res
+
+    async def tracking(self):
+        tracking_number = self.rng.choice(self.data["tracking_numbers"])
+        await self.call("GET /customer/parcel/track/{tracking_number}", "GET", f"/customer/parcel/track/{tracking_number}")
+
+    async def customer(self):
+        _, headers = self.rng.choice(self.customers)
+        await self.call("GET /customer/my-parcels", "GET", "/customer/my-parcels", headers=headers)
+
+    async def rider(self):
+        rider_id, headers = self.rng.choice(self.riders)
+        await self.call("GET /rider/my-parcels", "GET", "/rider/my-parcels", headers=headers)
+        route = self.data["routes"][rider_id]
+        burst = [route.popleft() for _ in range(min(SCAN_BURST, len(route)))]
+        if not burst:
+            return
+        now = datetime.utcnow().isoformat()
+        updates = []
+        for parcel_id in burst:
+            step = self.state.get(parcel_id, 0) + 1
+            self.state[parcel_id] = step
+            self.operations += 1
+            updates.append({
+                "operation_id": f"bench-{os.getpid()}-{self.operations}",
+                "parcel_id": parcel_id,
+                "status": LIFECYCLE[step],
+                "client_timestamp": now,
+            })
+            if step < len(LIFECYCLE) - 1:
+                route.append(parcel_id)
+        await self.call(
+            "POST /rider/update-status/batch", "POST", "/rider/update-status/batch",
+            json={"updates": updates}, headers=headers,
+        )
+
+    async def staff(self):
+        await self.call("GET /staff/stats", "GET", "/staff/stats", headers=self.staff_headers)
+        await self.call("GET /staff/parcels", "GET", "/staff/parcels", params={"limit": 50}, headers=self.staff_headers)
+
+    async def login(self):
+        email, _ = self.rng.choice(self.customers)
+        await self.call("POST /auth/login", "POST", "/auth/login", json={"email": email, "password": PASSWORD})
+
+
+def parse_query_counts(metrics_text: str):
+    """{"METHOD route": (query_sum, request_count)} from http_request_db_queries"""
+    totals = defaultdict(lambda: [0.0, 0])
+    for line in metrics_text.splitlines():
+        for suffix, index in (("_sum{", 0), ("_count{", 1)):
+            prefix = "http_request_db_queries" + suffix
+            if line.startswith(prefix):
+                labels, _, value = line[len(prefix):].rpartition("} ")
+                fields = dict(part.split("=", 1) for part in labels.split('",'))
+                method = fields["method"].strip('"')
+                route = fields["route"].strip('"')
+                totals[f"{method} {route}"][index] = float(value)
+    return totals
+
+
+async def run_workload(data, workload: str, concurrency: int, duration: float, url: str = None, seed_value: int = 1):
+    if url:
+        transport = None
+        base_url = url
+    else:
+        from main import app
+        transport = httpx.ASGITransport(app=app)
+        base_url = "http://bench"
+    weights = WORKLOADS[workload]
+    names = list(weights)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, transport=transport, limits=limits, timeout=120) as client:
+        before = parse_query_counts((await client.get("/metrics")).text)
+        scenarios = Scenarios(client, data, random.Random(seed_value))
+        stop_at = time.perf_counter() + duration
+
+        async def worker(n: int):
+            rng = random.Random(seed_value * 1000 + n)
+            while time.perf_counter() < stop_at:
+                name = rng.choices(names, weights=[weights[name] for name in names])[0]
+                await getattr(scenarios, name)()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        after = parse_query_counts((await client.get("/metrics")).text)
+
+    endpoints = {}
+    for endpoint, latencies in sorted(scenarios.latencies.items()):
+        queries, requests = after.get(endpoint, (0.0, 0))
+        queries -= before.get(endpoint, (0.0, 0))[0]
+        requests -= before.get(endpoint, (0.0, 0))[1]
+        endpoints[endpoint] = {
+            "requests": len(latencies),
+            "throughput": round(len(latencies) / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "errors": scenarios.errors.get(endpoint, 0),
+            "rejected": scenarios.rejected.get(endpoint, 0),
+            "queries_per_request": round(queries / requests, 2) if requests else None,
+        }
+    total = sum(e["requests"] for e in endpoints.values())
+    return {
+        "workload": workload,
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 2),
+        "throughput": round(total / elapsed, 2),
+        "endpoints": endpoints,
+    }
+
+
+def compare(baseline: dict, current: dict, tolerance: float):
+    """Regressions of `current` against `baseline`, as readable strings"""
+    problems = []
+    for endpoint, base in baseline["endpoints"].items():
+        now = current["endpoints"].get(endpoint)
+        if now is None:
+            problems.append(f"{endpoint}: not exercised in this run")
+            continue
+        if now["throughput"] < base["throughput"] * (1 - tolerance):
+            problems.append(f"{endpoint}: throughput {now['throughput']}/s, baseline {base['throughput']}/s")
+        if now["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            problems.append(f"{endpoint}: p95 {now['p95_ms']} ms, baseline {base['p95_ms']} ms")
+        # Query counts are deterministic, so any growth beyond noise from retries is a regression
+        if base["queries_per_request"] is not None and now["queries_per_request"] is not None:
+            if now["queries_per_request"] > base["queries_per_request"] + 0.5:
+                problems.append(
+                    f"{endpoint}: {now['queries_per_request']} queries/request, baseline {base['queries_per_request']}"
+                )
+        if now["errors"] > base["errors"]:
+            problems.append(f"{endpoint}: {now['errors']} errors, baseline {base['errors']}")
+    return problems
+
+
+def print_report(report: dict):
+    print(f"{report['workload']} workload, {report['concurrency']} clients, {report['duration_s']} s: "
+          f"{report['throughput']} req/s")
+    print(f"{'endpoint':<48}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}{'429s':>6}{'q/req':>7}")
+    for endpoint, e in report["endpoints"].items():
+        queries = "-" if e["queries_per_request"] is None else f"{e['queries_per_request']:.1f}"
+        print(f"{endpoint:<48}{e['throughput']:>9.1f}{e['p50_ms']:>9.1f}{e['p95_ms']:>9.1f}"
+              f"{e['p99_ms']:>9.1f}{e['errors']:>8}{e['rejected']:>6}{queries:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="defaults to a fresh SQLite file")
+    parser.add_argument("--url", help="drive a running server instead of the in-process app")
+    parser.add_argument("--workload", choices=sorted(WORKLOADS), default="mixed")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds")
+    parser.add_argument("--customers", type=int, default=500)
+    parser.add_argument("--riders", type=int, default=50)
+    parser.add_argument("--parcels", type=int, default=20000)
+    parser.add_argument("--assigned", type=float, default=0.3, help="fraction of parcels assigned to riders")
+    parser.add_argument("--history", type=int, default=3, help="history rows per parcel")
+    parser.add_argument("--output", help="write the report as JSON")
+    parser.add_argument("--compare", help="baseline JSON to check this run against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if not database_url:
+        path = os.path.join(tempfile.gettempdir(), "courier_suite_bench.db")
+        if os.path.exists(path):
+            os.remove(path)
+        database_url = f"sqlite:///{path}"
+    data = seed(database_url, args.customers, args.riders, args.parcels, args.assigned, args.history)
+
+    # One log line per request from the client would dominate the run
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    try:
+        report = asyncio.run(run_workload(data, args.workload, args.concurrency, args.duration, args.url))
+    finally:
+        from utils.password_pool import password_hasher
+        from utils.tracking import release_worker_lease
+        password_hasher.shutdown()
+        release_worker_lease()
+    report["seed"] = {
+        "customers": args.customers, "riders": args.riders, "parcels": args.parcels,
+        "assigned": args.assigned, "history": args.history,
+    }
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            problems = compare(json.load(f), report, args.tolerance)
+        if problems:
+            print("\nRegressions against the baseline:")
+            for problem in problems:
+                print(f"  {problem}")
+            sys.exit(1)
+        print("\nNo regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,370 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from contextvars import ContextVar
+from sqlalchemy import create_engine, event, exc, insert, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from starlette.concurrency import run_in_threadpool, iterate_in_threadpool
 from dotenv import load_dotenv
+from utils.metrics import PoolMetrics
+import asyncio
+import itertools
+import logging
 import os
+import threading
+import time
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Set DB_ASYNC=true to serve requests through an asyncio driver (asyncpg /
+# aiosqlite) instead of running every query on FastAPI's threadpool.
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() in ("1", "true", "yes")
+
+# Connection pool settings. Size the pool so that
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) stays under the database's
+# connection limit. Use DB_POOL_MODE=null behind pgbouncer or another
+# transaction pooler: the app then opens a connection per session and
+# leaves pooling to the pooler.
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "queue").lower()
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
 # Ensure SSL when connecting to hosted Postgres (e.g., Supabase). If the
 # DATABASE_URL provider requires SSL, pass the appropriate connect_args.
 connect_args = {}
 if DATABASE_URL and DATABASE_URL.startswith("postgresql"):
     connect_args = {"sslmode": "require"}
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+pool_metrics = PoolMetrics()
+
+def _timed_pool(pool_class):
+    """Subclass `pool_class` so every checkout records how long it waited"""
+    class TimedPool(pool_class):
+        def connect(self):
+            started = time.perf_counter()
+            try:
+                return super().connect()
+            except exc.TimeoutError:
+                pool_metrics.record_timeout()
+                raise
+            finally:
+                pool_metrics.checkout_wait.observe(time.perf_counter() - started)
+
+    TimedPool.__name__ = pool_class.__name__
+    return TimedPool
+
+def pool_options(pool_class):
+    if DB_POOL_MODE == "null":
+        return {"poolclass": _timed_pool(NullPool)}
+    return {
+        "poolclass": _timed_pool(pool_class),
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+# Objects returned from handlers are serialized after the session work is
+# done, so they must not expire (and lazy-load) on commit.
+engine = create_engine(DATABASE_URL, connect_args=connect_args, **pool_options(QueuePool))
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+def get_async_database_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto the matching asyncio driver"""
+    scheme, _, rest = url.partition("://")
+    if scheme.startswith("postgresql"):
+        return f"postgresql+asyncpg://{rest}"
+    if scheme.startswith("sqlite"):
+        return f"sqlite+aiosqlite://{rest}"
+    return url
+
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    async_connect_args = {}
+    if DATABASE_URL.startswith("postgresql"):
+        # asyncpg spells sslmode as `ssl`
+        async_connect_args = {"ssl": "require"}
+        if DB_POOL_MODE == "null":
+            # Transaction poolers hand each transaction a different server
+            # connection, so asyncpg's prepared statement cache must be off
+            async_connect_args["statement_cache_size"] = 0
+    async_engine = create_async_engine(
+        get_async_database_url(DATABASE_URL),
+        connect_args=async_connect_args,
+        **pool_options(AsyncAdaptedQueuePool),
+    )
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Read replicas. GET handlers that only read take their session from
+# `get_read_db`, which routes to a healthy replica unless the calling user
+# committed a write within REPLICA_STICKY_SECONDS (read-your-writes), in
+# which case they stay on the primary. Replicas that fail the periodic
+# health check, or lag more than REPLICA_MAX_LAG_SECONDS (Postgres), are
+# skipped until they recover; with none healthy, reads go to the primary.
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "10"))
+REPLICA_HEALTH_INTERVAL_SECONDS = float(os.getenv("REPLICA_HEALTH_INTERVAL_SECONDS", "5"))
+
+# Set by authentication so sessions know whose reads and writes they serve
+current_user_id: ContextVar = ContextVar("current_user_id", default=None)
+
+class ReadYourWrites:
+    """Remembers, per user, until when their reads must see the primary"""
+
+    def __init__(self, sticky_seconds: float = REPLICA_STICKY_SECONDS):
+        self.sticky_seconds = sticky_seconds
+        self._until = {}
+        self._lock = threading.Lock()
+
+    def wrote(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            self._until[user_id] = now + self.sticky_seconds
+            if len(self._until) > 100000:
+                self._until = {u: t for u, t in self._until.items() if t > now}
+
+    def is_sticky(self, user_id) -> bool:
+        if user_id is None:
+            return False
+        with self._lock:
+            until = self._until.get(user_id)
+        return until is not None and until > time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            self._until.clear()
+
+read_your_writes = ReadYourWrites()
+
+class Replica:
+    def __init__(self, url: str, engine):
+        self.url = url
+        self.engine = engine  # Engine, or AsyncEngine with DB_ASYNC
+        self.healthy = True
+
+    @property
+    def bind(self):
+        """What a Session binds to (the sync side of an AsyncEngine)"""
+        return getattr(self.engine, "sync_engine", self.engine)
+
+class ReplicaSet:
+    """Round-robin over the replicas that passed their last health check"""
+
+    def __init__(self, replicas):
+        self.replicas = list(replicas)
+        self._next = itertools.count()
+
+    def pick(self):
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._next) % len(healthy)]
+
+    def mark(self, replica: Replica, healthy: bool, reason: str = ""):
+        if replica.healthy != healthy:
+            if healthy:
+                logger.info(f"Replica {replica.engine.url.render_as_string()} is back in rotation")
+            else:
+                logger.warning(f"Replica {replica.engine.url.render_as_string()} taken out of rotation: {reason}")
+        replica.healthy = healthy
+
+    @staticmethod
+    def _lag_query(dialect_name: str):
+        if dialect_name == "postgresql":
+            return text("SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)")
+        return text("SELECT 0")
+
+    def _result(self, replica: Replica, lag):
+        if lag is not None and float(lag) > REPLICA_MAX_LAG_SECONDS:
+            self.mark(replica, False, f"{float(lag):.1f}s behind the primary")
+        else:
+            self.mark(replica, True)
+
+    def check(self):
+        """Health-check every replica once (sync engines)"""
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as conn:
+                    lag = conn.scalar(self._lag_query(conn.dialect.name))
+                self._result(replica, lag)
+            except Exception as exc:
+                self.mark(replica, False, str(exc))
+
+    async def check_async(self):
+        """Health-check every replica once (async engines)"""
+        for replica in self.replicas:
+            try:
+                async with replica.engine.connect() as conn:
+                    lag = await conn.scalar(self._lag_query(conn.dialect.name))
+                self._result(replica, lag)
+            except Exception as exc:
+                self.mark(replica, False, str(exc))
+
+def _replica_engine(url: str):
+    # Same driver, SSL and pool settings as the primary
+    if DB_ASYNC:
+        replica_connect_args = {"ssl": "require"} if url.startswith("postgresql") else {}
+        engine = create_async_engine(
+            get_async_database_url(url), connect_args=replica_connect_args, **pool_options(AsyncAdaptedQueuePool)
+        )
+    else:
+        replica_connect_args = {"sslmode": "require"} if url.startswith("postgresql") else {}
+        engine = create_engine(url, connect_args=replica_connect_args, **pool_options(QueuePool))
+    return Replica(url, engine)
+
+replicas = ReplicaSet(_replica_engine(url) for url in DATABASE_REPLICA_URLS)
 
-def get_db():
+def _drop_replica_on_disconnect(replica: Replica):
+    def handle_error(context):
+        # A lost connection takes the replica out until the next health check
+        if context.is_disconnect:
+            replicas.mark(replica, False, str(context.original_exception))
+    event.listen(replica.bind, "handle_error", handle_error)
+
+for _replica in replicas.replicas:
+    _drop_replica_on_disconnect(_replica)
+
+class RoutingSession(Session):
+    """Session for read-only handlers: binds to a replica or, for
+    read-your-writes and failover, to the primary. The choice is made on
+    first use and kept for the session's lifetime."""
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        bind = self.info.get("bind")
+        if bind is None:
+            replica = None if read_your_writes.is_sticky(current_user_id.get()) else replicas.pick()
+            if replica is not None:
+                bind = replica.bind
+                self.info["replica"] = replica
+            else:
+                bind = async_engine.sync_engine if async_engine is not None else engine
+            self.info["bind"] = bind
+        return bind
+
+ReadSessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, expire_on_commit=False)
+AsyncReadSessionLocal = None
+if DB_ASYNC:
+    AsyncReadSessionLocal = async_sessionmaker(sync_session_class=RoutingSession, autoflush=False, expire_on_commit=False)
+
+@event.listens_for(Session, "after_flush")
+def _session_wrote(session, flush_context):
+    session.info["wrote"] = True
+
+@event.listens_for(Session, "do_orm_execute")
+def _session_executed(orm_execute_state):
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["wrote"] = True
+
+@event.listens_for(Session, "after_commit")
+def _session_committed(session):
+    # Reads by this user go to the primary until replicas have caught up
+    if session.info.pop("wrote", False):
+        user_id = current_user_id.get()
+        if user_id is not None:
+            read_your_writes.wrote(user_id)
+
+def used_replica(db) -> bool:
+    """Whether a session from get_read_db was served by a replica"""
+    session = getattr(db, "sync_session", db)
+    return "replica" in session.info
+
+def pool_status():
+    """Pool usage and checkout wait metrics for the engine serving requests"""
+    pool = async_engine.pool if async_engine is not None else engine.pool
+    status = pool_metrics.snapshot(pool)
+    if replicas.replicas:
+        status["replicas"] = [
+            {"url": replica.engine.url.render_as_string(), "healthy": replica.healthy} for replica in replicas.replicas
+        ]
+    return status
+
+def get_sync_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Request-scoped session dependency used by the routers
+get_db = get_async_db if DB_ASYNC else get_sync_db
+
+def get_sync_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+# Session dependency for read-only handlers (the primary when there are no replicas)
+get_read_db = get_async_read_db if DB_ASYNC else get_sync_read_db
+
+async def replica_health_job(interval_seconds: float):
+    """Health-check the replicas every `interval_seconds` until cancelled"""
+    while True:
+        try:
+            if DB_ASYNC:
+                await replicas.check_async()
+            else:
+                await run_in_threadpool(replicas.check)
+        except Exception:
+            logger.exception("Replica health check failed")
+        await asyncio.sleep(interval_seconds)
+
+def dialect_insert(db, model):
+    """INSERT for `model` built with the dialect's own insert(), so callers
+    can use on_conflict_do_nothing / on_conflict_do_update"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model)
+    if dialect == "sqlite":
+        return sqlite.insert(model)
+    return insert(model)
+
+async def run_db(db, fn, *args, **kwargs):
+    """Run `fn(session, *args, **kwargs)` without blocking the event loop.
+
+    Handlers keep their ORM code in plain sync functions. With an
+    AsyncSession the function runs on the async driver through `run_sync`;
+    with a sync Session it runs on the threadpool as before.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+async def stream_partitions(statement, batch_size: int = 500):
+    """Yield the ORM objects selected by `statement` in lists of `batch_size`.
+
+    Streams use their own session because the request session may already
+    be closed while the response body is being sent.
+    """
+    statement = statement.execution_options(yield_per=batch_size)
+    if DB_ASYNC:
+        async with AsyncSessionLocal() as db:
+            result = await db.stream_scalars(statement)
+            async for partition in result.partitions():
+                yield partition
+        return
+
+    def partitions():
+        with SessionLocal() as db:
+            yield from db.scalars(statement).partitions()
+
+    async for partition in iterate_in_threadpool(partitions()):
+        yield partition
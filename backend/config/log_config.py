@@ -0,0 +1,179 @@
+"""
+Application logging setup.
+
+Log calls only put the record on an in-memory queue (QueueHandler). A
+background QueueListener thread formats and writes them, so a slow
+stdout/stderr or log shipper never blocks a request. Records are kept
+unformatted until the writer thread handles them, so `%s` arguments cost
+nothing for records that are filtered out or never written.
+
+Settings:
+    LOG_LEVEL       root level (default INFO)
+    LOG_LEVELS      per-logger overrides, e.g. "utils.auth=WARNING,sqlalchemy.engine=INFO"
+    LOG_FORMAT      "text" (default) or "json"
+    AUTH_LOG_RATE   info/debug records per second allowed from the auth loggers
+                    (default 5, bursts of AUTH_LOG_BURST); the rest are counted
+                    and dropped. Warnings and errors are never dropped
+
+Anything that looks like a JWT or a bearer token is redacted by the
+formatter before it is written.
+"""
+from logging.handlers import QueueHandler, QueueListener
+from dotenv import load_dotenv
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+
+load_dotenv()
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+AUTH_LOG_RATE = float(os.getenv("AUTH_LOG_RATE", "5"))
+AUTH_LOG_BURST = int(os.getenv("AUTH_LOG_BURST", "20"))
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+AUTH_LOGGERS = ("routers.auth", "utils.auth", "utils.security")
+
+REDACTIONS = (
+    # header.payload.signature, all base64url; JWT headers start with {"  -> eyJ
+    (re.compile(r"eyJ[\w-]*\.[\w-]+\.[\w-]*"), "[redacted token]"),
+    (re.compile(r"(?i)\b(bearer\s+)[\w.~+/=-]+"), r"\1[redacted]"),
+    (re.compile(r"(?i)([\"']?(?:password|token|secret)[\"']?\s*[:=]\s*)[\"']?[^\s,'\"}]+[\"']?"), r"\1[redacted]"),
+)
+
+def redact(text: str) -> str:
+    for pattern, replacement in REDACTIONS:
+        text = pattern.sub(replacement, text)
+    return text
+
+class RedactingFormatter(logging.Formatter):
+    def format(self, record):
+        return redact(super().format(record))
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra={...}` fields are included"""
+
+    RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in self.RESERVED:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return redact(json.dumps(entry, default=str))
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket per logger: lets `rate` records/second through, with bursts
+    of `burst`, and notes on the next record let through how many were dropped.
+
+    Only records below `max_level` are throttled; errors always get through.
+    """
+
+    def __init__(self, rate: float = AUTH_LOG_RATE, burst: int = AUTH_LOG_BURST, max_level: int = logging.WARNING):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.max_level = max_level
+        self.tokens = float(burst)
+        self.suppressed = 0
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def filter(self, record) -> bool:
+        if record.levelno >= self.max_level:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                self.suppressed += 1
+                return False
+            self.tokens -= 1
+            suppressed, self.suppressed = self.suppressed, 0
+        if suppressed:
+            record.suppressed = suppressed
+            record.msg = f"{record.msg} ({suppressed} similar records suppressed)"
+        return True
+
+class _LazyQueueHandler(QueueHandler):
+    """Hand the record to the writer thread as-is.
+
+    QueueHandler.prepare() formats the message in the calling thread so the
+    record can be pickled; this queue never leaves the process, so the
+    writer thread does the formatting instead.
+    """
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Dropping a log line beats stalling a request on a wedged writer
+            pass
+
+_listener = None
+
+def parse_levels(spec: str):
+    """"a=WARNING,b.c=DEBUG" -> {"a": "WARNING", "b.c": "DEBUG"}"""
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+def configure_logging():
+    """Route the root logger through the background writer; safe to call twice"""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    output = logging.StreamHandler()
+    output.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else RedactingFormatter(TEXT_FORMAT))
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_LazyQueueHandler(log_queue))
+    root.setLevel(LOG_LEVEL)
+
+    for name, level in parse_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+    for name in AUTH_LOGGERS:
+        logger = logging.getLogger(name)
+        if not any(isinstance(f, RateLimitFilter) for f in logger.filters):
+            logger.addFilter(RateLimitFilter())
+    return _listener
+
+def stop_logging():
+    """Flush queued records, stop the writer thread and log synchronously from then on"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, _LazyQueueHandler):
+            root.removeHandler(handler)
+    for handler in _listener.handlers:
+        root.addHandler(handler)
+    _listener = None
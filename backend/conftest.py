@@ -0,0 +1,68 @@
+"""
+Shared pytest fixtures.
+
+Tests run against a throwaway SQLite database; DATABASE_URL is set here
+before any application module reads it from the environment.
+"""
+import os
+import tempfile
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "courier_test.db")
+# Hash passwords on the threadpool instead of spawning worker processes
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+# One test process; the lease path is covered in test_tracking.py
+os.environ.setdefault("TRACKING_WORKER_ID", "1")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from config.database import engine, async_engine, SessionLocal, read_your_writes
+from models.sql_models import Base
+from utils.security import create_access_token
+from utils.auth import principal_cache
+from utils.tracking_cache import tracking_cache
+from utils.search import search_index
+from main import app
+
+
+@pytest.fixture
+def db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client(db):
+    principal_cache.clear()
+    tracking_cache.local.clear()
+    search_index.clear()
+    read_your_writes.clear()
+    return TestClient(app)
+
+
+@pytest.fixture
+def auth_header():
+    def make(user):
+        token = create_access_token({"sub": user.email, "role": user.role, "user_id": user.user_id})
+        return {"Authorization": f"Bearer {token}"}
+    return make
+
+
+@pytest.fixture
+def count_queries():
+    """Return a list that collects every SQL statement run on the engine"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    target = async_engine.sync_engine if async_engine is not None else engine
+    event.listen(target, "before_cursor_execute", record)
+    yield statements
+    event.remove(target, "before_cursor_execute", record)
@@ -1,17 +1,28 @@
 from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from routers import auth, customer, staff, rider
+from fastapi.responses import JSONResponse, PlainTextResponse
+from routers import auth, customer, staff, rider, events
 
-from config.database import engine
-from models.sql_models import Base
-from sqlalchemy import inspect
+from config.log_config import configure_logging, stop_logging
+from config.database import (
+    REPLICA_HEALTH_INTERVAL_SECONDS, engine, async_engine, pool_metrics, pool_status, replica_health_job, replicas,
+)
+from migrations.runner import run_migrations
+from utils.password_pool import password_hasher
+from utils.events import event_bus
+from utils.dispatch import AUTO_ASSIGN_INTERVAL_SECONDS, auto_assign_job
+from utils.stats import STATS_RECONCILE_INTERVAL_SECONDS, reconcile_job
+from utils.archive import ARCHIVE_INTERVAL_SECONDS, archive_job
+from utils.tracking import release_worker_lease, tracking_generator, worker_lease_job
+from utils.request_metrics import RequestMetricsMiddleware, instrument_engine, render_metrics, slow_traces
+import asyncio
 import logging
+import math
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Log through a background writer thread (see config/log_config.py)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 app = FastAPI(
@@ -36,11 +47,35 @@ app.add_middleware(
     max_age=3600,
 )
 
+# Per-route latency and per-request query counts, served on /metrics
+app.add_middleware(RequestMetricsMiddleware)
+instrument_engine(engine)
+if async_engine is not None:
+    instrument_engine(async_engine.sync_engine)
+for replica in replicas.replicas:
+    instrument_engine(replica.bind)
+
+def _json_safe(value):
+    if isinstance(value, float) and not math.isfinite(value):
+        return str(value)
+    if isinstance(value, dict):
+        return {key: _json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(item) for item in value]
+    return value
+
+@app.exception_handler(RequestValidationError)
+async def validation_error_handler(request, exc: RequestValidationError):
+    # The default handler echoes the rejected input, which cannot be
+    # encoded as JSON when it is inf or nan (e.g. a weight of Infinity)
+    return JSONResponse(status_code=422, content={"detail": _json_safe(jsonable_encoder(exc.errors()))})
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(customer.router)
 app.include_router(staff.router)
 app.include_router(rider.router)
+app.include_router(events.router)
 
 @app.get("/")
 def home():
@@ -50,17 +85,54 @@ def home():
 def health():
     return {"status": "ok", "service": "courier-backend"}
 
+@app.get("/health/db-pool")
+def db_pool_health():
+    """Connection pool usage and checkout wait times for sizing workers"""
+    return pool_status()
+
+@app.get("/health/slow-requests")
+def slow_requests():
+    """Recent sampled slow requests with the SQL they ran (see SLOW_REQUEST_SAMPLE_RATE)"""
+    return list(slow_traces)
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint"""
+    pool = async_engine.pool if async_engine is not None else engine.pool
+    return PlainTextResponse(render_metrics(pool, pool_metrics), media_type="text/plain; version=0.0.4")
+
 @app.on_event("startup")
 def on_startup():
-    """Create DB tables at application startup if none exist."""
+    """Bring the database schema up to date at application startup."""
     try:
-        inspector = inspect(engine)
-        existing = inspector.get_table_names()
-        if existing:
-            logger.info(f"Database already has {len(existing)} tables: {existing}. Skipping table creation.")
+        applied = run_migrations(engine)
+        if applied:
+            logger.info(f"Applied schema migrations: {applied}")
         else:
-            logger.info("No existing tables found. Creating database tables...")
-            Base.metadata.create_all(bind=engine)
-            logger.info("Database tables created successfully")
+            logger.info("Database schema is up to date")
     except Exception as exc:
-        logger.error(f"Failed to inspect/create DB tables on startup: {exc}")
\ No newline at end of file
+        logger.error(f"Failed to apply schema migrations on startup: {exc}")
+    # Fail the worker now rather than on its first booking
+    tracking_generator()
+    password_hasher.start()
+
+@app.on_event("startup")
+async def start_background_jobs():
+    app.state.background_tasks = [asyncio.create_task(worker_lease_job())]
+    if AUTO_ASSIGN_INTERVAL_SECONDS > 0:
+        app.state.background_tasks.append(asyncio.create_task(auto_assign_job(AUTO_ASSIGN_INTERVAL_SECONDS)))
+    if replicas.replicas:
+        app.state.background_tasks.append(asyncio.create_task(replica_health_job(REPLICA_HEALTH_INTERVAL_SECONDS)))
+    if STATS_RECONCILE_INTERVAL_SECONDS > 0:
+        app.state.background_tasks.append(asyncio.create_task(reconcile_job(STATS_RECONCILE_INTERVAL_SECONDS)))
+    if ARCHIVE_INTERVAL_SECONDS > 0:
+        app.state.background_tasks.append(asyncio.create_task(archive_job(ARCHIVE_INTERVAL_SECONDS)))
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    for task in getattr(app.state, "background_tasks", []):
+        task.cancel()
+    password_hasher.shutdown()
+    release_worker_lease()
+    await event_bus.stop()
+    stop_logging()
@@ -0,0 +1,98 @@
+"""
+Check that the queries issued by the routers are served by an index.
+
+Runs EXPLAIN (Postgres) or EXPLAIN QUERY PLAN (SQLite) for each hot query
+against the configured database and fails if any plan needs a full table
+scan, or if a keyset page walks its index from the top instead of seeking
+to the cursor. Run with `python -m migrations.explain_check` after migrating.
+"""
+from datetime import datetime
+from sqlalchemy import select, text
+from models.sql_models import User, Parcel, DeliveryAssignment, StatusHistory
+from routers.staff import _filtered_parcels
+from utils.pagination import encode_cursor
+import sys
+
+CURSOR = encode_cursor(datetime(2025, 1, 1), 1)
+
+# Router query -> statement using the same filters and ordering
+ROUTER_QUERIES = {
+    "auth.login (user by email)": select(User).where(User.email == "someone@example.com"),
+    "customer.track_parcel": select(Parcel).where(Parcel.tracking_number == "TRK0"),
+    "customer.get_my_parcels": select(Parcel).where(Parcel.sender_id == 1),
+    "rider.my_parcels": select(DeliveryAssignment).where(DeliveryAssignment.rider_id == 1),
+    "rider.update_status (assignment)": select(DeliveryAssignment).where(
+        DeliveryAssignment.parcel_id == 1, DeliveryAssignment.rider_id == 1
+    ),
+    "staff.get_all_parcels": _filtered_parcels(None, None, None, None, None, None).limit(51),
+    "staff.get_all_parcels (status filter)": _filtered_parcels("booked", None, None, None, None, None).limit(51),
+    "staff.get_all_riders": select(User).where(User.role == "rider"),
+    "staff.assign_rider (existing assignment)": select(DeliveryAssignment).where(DeliveryAssignment.parcel_id == 1),
+    "status history by parcel": select(StatusHistory)
+        .where(StatusHistory.parcel_id == 1).order_by(StatusHistory.updated_at),
+    "staff.get_parcel_timelines": select(StatusHistory)
+        .where(StatusHistory.parcel_id.in_([1, 2, 3]))
+        .order_by(StatusHistory.parcel_id, StatusHistory.updated_at),
+}
+
+# Keyset pages past the first, built by the router itself: these must seek
+KEYSET_QUERIES = {
+    "staff.get_all_parcels (next page)": _filtered_parcels(None, None, None, None, None, CURSOR).limit(51),
+    "staff.get_all_parcels (status filter, next page)":
+        _filtered_parcels("booked", None, None, None, None, CURSOR).limit(51),
+}
+
+
+def explain(conn, statement):
+    sql = str(statement.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    if conn.dialect.name == "sqlite":
+        return [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+    return [row[0] for row in conn.execute(text(f"EXPLAIN {sql}"))]
+
+
+def uses_index(plan):
+    for line in plan:
+        # SQLite: "SCAN parcels" is a full scan, "SEARCH ... USING INDEX" or
+        # "SCAN ... USING INDEX" walk an index. Postgres: "Seq Scan on ..."
+        if "Seq Scan" in line:
+            return False
+        if line.startswith("SCAN") and "USING" not in line:
+            return False
+    return True
+
+
+def seeks_index(plan):
+    # The cursor bound must be part of the index lookup. SQLite: "SEARCH ... (booked_at<?)",
+    # Postgres: "Index Cond: (ROW(booked_at, parcel_id) < ...)"
+    return uses_index(plan) and any(
+        "booked_at" in line and (line.startswith("SEARCH") or "Index Cond" in line) for line in plan
+    )
+
+
+def run_check(engine):
+    failures = []
+    with engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            # Small tables are cheaper to scan, which would hide a missing index
+            conn.execute(text("SET enable_seqscan = off"))
+        checks = [(name, statement, uses_index) for name, statement in ROUTER_QUERIES.items()]
+        checks += [(name, statement, seeks_index) for name, statement in KEYSET_QUERIES.items()]
+        for name, statement, check in checks:
+            plan = explain(conn, statement)
+            ok = check(plan)
+            print(f"{'✓' if ok else '✗'} {name}")
+            for line in plan:
+                print(f"    {line}")
+            if not ok:
+                failures.append(name)
+    return failures
+
+
+if __name__ == "__main__":
+    from config.database import engine
+
+    failed = run_check(engine)
+    if failed:
+        print(f"\n{len(failed)} queries need a full table or index scan: {', '.join(failed)}")
+        sys.exit(1)
+    print("\nAll router queries use an index")
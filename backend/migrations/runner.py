@@ -0,0 +1,53 @@
+"""Apply pending schema migrations and record them in `schema_migrations`.
+
+Run manually with `python -m migrations.runner`; the API also runs it on
+startup (see `main.py`).
+"""
+from sqlalchemy import Table, Column, Integer, String, DateTime, MetaData, select, text
+from datetime import datetime
+from migrations.versions import MIGRATIONS
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Kept out of the models' metadata so create_all never touches it
+migration_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, default=datetime.utcnow),
+)
+
+# Arbitrary key so concurrent workers on Postgres apply migrations one at a time
+MIGRATION_LOCK_ID = 72610401
+
+
+def applied_versions(conn):
+    return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+
+def run_migrations(engine):
+    """Apply every migration newer than the database's recorded version"""
+    migration_metadata.create_all(bind=engine)
+    applied = []
+    for version, description, migrate in MIGRATIONS:
+        with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_ID})
+            if version in applied_versions(conn):
+                continue
+            logger.info(f"Applying migration {version}: {description}")
+            migrate(conn)
+            conn.execute(schema_migrations.insert().values(version=version, description=description))
+            applied.append(version)
+    return applied
+
+
+if __name__ == "__main__":
+    from config.database import engine
+
+    logging.basicConfig(level=logging.INFO)
+    done = run_migrations(engine)
+    print(f"Applied migrations: {done}" if done else "Database schema is up to date")
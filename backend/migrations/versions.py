@@ -0,0 +1,174 @@
+"""Ordered list of schema migrations.
+
+Each migration receives an open connection inside its own transaction.
+Migration 1 creates tables straight from the current models, so later
+migrations must be idempotent (create-if-missing) for fresh and existing
+databases to end up with the same schema.
+"""
+from datetime import datetime
+from sqlalchemy import MetaData, func, inspect, select, text, update
+from sqlalchemy.schema import CreateTable
+from models.sql_models import (
+    Base, User, Parcel, DeliveryAssignment, StatusHistory, ParcelStat, ParcelArchive, StatusHistoryArchive,
+    TrackingWorkerLease, JobRun,
+)
+
+
+def create_initial_tables(conn):
+    """Create the core tables on an empty database"""
+    Base.metadata.create_all(
+        bind=conn,
+        tables=[User.__table__, Parcel.__table__, DeliveryAssignment.__table__, StatusHistory.__table__],
+    )
+
+
+HOT_LOOKUP_INDEXES = {
+    "ix_users_role",
+    "ix_parcels_sender_booked",
+    "ix_parcels_status_booked",
+    "ix_parcels_booked_parcel",
+    "ix_assignments_rider_status",
+    "ix_status_history_parcel_updated",
+}
+
+
+def add_hot_lookup_indexes(conn):
+    """Index the columns used by the router filters on databases created before they existed"""
+    for table in (User.__table__, Parcel.__table__, DeliveryAssignment.__table__, StatusHistory.__table__):
+        for index in table.indexes:
+            if index.name in HOT_LOOKUP_INDEXES:
+                index.create(bind=conn, checkfirst=True)
+
+
+def add_status_history_operation_id(conn):
+    """Record the client operation behind each history row so rider retries are idempotent"""
+    columns = {column["name"] for column in inspect(conn).get_columns("status_history")}
+    if "operation_id" not in columns:
+        conn.execute(text("ALTER TABLE status_history ADD COLUMN operation_id VARCHAR"))
+    for index in StatusHistory.__table__.indexes:
+        if index.name == "ux_status_history_operation":
+            index.create(bind=conn, checkfirst=True)
+
+
+def add_parcel_service_level(conn):
+    """Store the service level a parcel was priced at"""
+    columns = {column["name"] for column in inspect(conn).get_columns("parcels")}
+    if "service_level" not in columns:
+        conn.execute(text("ALTER TABLE parcels ADD COLUMN service_level VARCHAR DEFAULT 'standard'"))
+
+
+def add_parcel_stats(conn):
+    """Dashboard counters, backfilled from the existing parcels"""
+    from utils.stats import counted_from_base_tables
+
+    columns = {column["name"] for column in inspect(conn).get_columns("parcels")}
+    if "previous_status" not in columns:
+        conn.execute(text("ALTER TABLE parcels ADD COLUMN previous_status VARCHAR"))
+    ParcelStat.__table__.create(bind=conn, checkfirst=True)
+    # The archive tables do not exist yet at this point
+    rebuild_parcel_stats(conn, counted_from_base_tables(include_archive=False))
+
+
+def rebuild_parcel_stats(conn, counted):
+    conn.execute(ParcelStat.__table__.delete())
+    conn.execute(ParcelStat.__table__.insert().from_select(
+        ["dimension", "bucket", "status", "parcels", "revenue"], counted
+    ))
+
+
+def add_search_indexes(conn):
+    """Trigram and prefix indexes behind parcel search (Postgres only; see utils/search.py)"""
+    if conn.dialect.name != "postgresql":
+        return
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_parcels_search_trgm ON parcels USING gin "
+        "(lower(receiver_name || ' ' || receiver_phone || ' ' || receiver_address) gin_trgm_ops)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_parcels_tracking_prefix ON parcels (tracking_number varchar_pattern_ops)"
+    ))
+
+
+def add_archive_tables(conn):
+    """Cold storage for old final parcels and their history (see utils/archive.py)"""
+    ParcelArchive.__table__.create(bind=conn, checkfirst=True)
+    StatusHistoryArchive.__table__.create(bind=conn, checkfirst=True)
+
+
+def add_tracking_worker_leases(conn):
+    """Worker ids leased by processes that issue tracking numbers"""
+    TrackingWorkerLease.__table__.create(bind=conn, checkfirst=True)
+
+
+def add_job_runs(conn):
+    """Last completion time of scheduled jobs, so workers do not repeat each other's runs"""
+    JobRun.__table__.create(bind=conn, checkfirst=True)
+
+
+def backfill_parcel_booked_at(conn):
+    """Date legacy parcels that have no booked_at by their first status update.
+
+    The staff listing pages on (booked_at, parcel_id) and only seeks the
+    index if no row is NULL; new parcels always get booked_at on insert.
+    """
+    from utils.stats import counted_from_base_tables
+
+    now = datetime.utcnow()
+    for parcels, history in (
+        (Parcel.__table__, StatusHistory.__table__),
+        (ParcelArchive.__table__, StatusHistoryArchive.__table__),
+    ):
+        first_update = (
+            select(func.min(history.c.updated_at)).where(history.c.parcel_id == parcels.c.parcel_id).scalar_subquery()
+        )
+        conn.execute(
+            update(parcels).where(parcels.c.booked_at.is_(None)).values(booked_at=func.coalesce(first_update, now))
+        )
+    # Their counters move from the unknown day to the backfilled one
+    rebuild_parcel_stats(conn, counted_from_base_tables())
+
+
+def never_reuse_parcel_ids(conn):
+    """Rebuild an existing SQLite parcels table with AUTOINCREMENT.
+
+    Without it SQLite hands the id of a deleted newest parcel out again,
+    colliding with that parcel's archived copy. Postgres sequences never
+    reuse ids.
+    """
+    if conn.dialect.name != "sqlite":
+        return
+    ddl = conn.scalar(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'parcels'"))
+    if "AUTOINCREMENT" not in ddl.upper():
+        metadata = MetaData()
+        User.__table__.to_metadata(metadata)
+        rebuilt = Parcel.__table__.to_metadata(metadata, name="parcels_rebuilt")
+        columns = ", ".join(column.name for column in Parcel.__table__.columns)
+        conn.execute(CreateTable(rebuilt))
+        conn.execute(text(f"INSERT INTO parcels_rebuilt ({columns}) SELECT {columns} FROM parcels"))
+        conn.execute(text("DROP TABLE parcels"))
+        conn.execute(text("ALTER TABLE parcels_rebuilt RENAME TO parcels"))
+        for index in Parcel.__table__.indexes:
+            index.create(bind=conn)
+    # Continue after every id handed out so far, archived ones included
+    last_id = max(
+        conn.scalar(select(func.max(Parcel.parcel_id))) or 0,
+        conn.scalar(select(func.max(ParcelArchive.parcel_id))) or 0,
+    )
+    conn.execute(text("DELETE FROM sqlite_sequence WHERE name = 'parcels'"))
+    conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES ('parcels', :seq)"), {"seq": last_id})
+
+
+MIGRATIONS = [
+    (1, "initial tables", create_initial_tables),
+    (2, "hot lookup indexes", add_hot_lookup_indexes),
+    (3, "status history operation ids", add_status_history_operation_id),
+    (4, "parcel service level", add_parcel_service_level),
+    (5, "dashboard counters", add_parcel_stats),
+    (6, "parcel search indexes", add_search_indexes),
+    (7, "parcel archive tables", add_archive_tables),
+    (8, "tracking worker leases", add_tracking_worker_leases),
+    (9, "scheduled job runs", add_job_runs),
+    (10, "parcel booking time backfill", backfill_parcel_booked_at),
+    (11, "parcel ids never reused", never_reuse_parcel_ids),
+]
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Index
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
@@ -14,6 +14,10 @@ class User(Base):
     role = Column(String, nullable=False)  # customer, staff, rider
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_users_role", "role"),
+    )
+
 class Parcel(Base):
     __tablename__ = "parcels"
     parcel_id = Column(Integer, primary_key=True)
@@ -24,9 +28,19 @@ class Parcel(Base):
     receiver_address = Column(Text, nullable=False)
     weight_kg = Column(Float, nullable=False)
     charges = Column(Float, default=0.0)
+    service_level = Column(String, default="standard")
     current_status = Column(String, default="booked")
+    previous_status = Column(String)  # set by status updates, read back to adjust the stats counters
     booked_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_parcels_sender_booked", "sender_id", "booked_at"),
+        Index("ix_parcels_status_booked", "current_status", "booked_at"),
+        Index("ix_parcels_booked_parcel", "booked_at", "parcel_id"),
+        # SQLite would otherwise hand out a deleted (e.g. archived) newest parcel's id again
+        {"sqlite_autoincrement": True},
+    )
+
 class DeliveryAssignment(Base):
     __tablename__ = "delivery_assignments"
     assignment_id = Column(Integer, primary_key=True)
@@ -34,14 +48,81 @@ class DeliveryAssignment(Base):
     rider_id = Column(Integer, ForeignKey("users.user_id"))
     status = Column(String, default="assigned")
 
+    __table_args__ = (
+        Index("ix_assignments_rider_status", "rider_id", "status"),
+    )
+
 class StatusHistory(Base):
     __tablename__ = "status_history"
     history_id = Column(Integer, primary_key=True)
     parcel_id = Column(Integer, ForeignKey("parcels.parcel_id"))
     status = Column(String)
     updated_at = Column(DateTime, default=datetime.utcnow)
+    operation_id = Column(String)  # client-supplied id of an offline rider update
+
+    __table_args__ = (
+        Index("ix_status_history_parcel_updated", "parcel_id", "updated_at"),
+        Index("ux_status_history_operation", "operation_id", unique=True),
+    )
+
+class ParcelArchive(Base):
+    """Final parcels moved out of `parcels` by utils/archive.py"""
+    __tablename__ = "parcels_archive"
+    parcel_id = Column(Integer, primary_key=True)
+    tracking_number = Column(String, unique=True)
+    sender_id = Column(Integer, ForeignKey("users.user_id"))
+    receiver_name = Column(String, nullable=False)
+    receiver_phone = Column(String, nullable=False)
+    receiver_address = Column(Text, nullable=False)
+    weight_kg = Column(Float, nullable=False)
+    charges = Column(Float, default=0.0)
+    service_level = Column(String, default="standard")
+    current_status = Column(String)
+    booked_at = Column(DateTime)
+    rider_id = Column(Integer)  # from the dropped delivery assignment, kept for the rider counters
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_parcels_archive_booked", "booked_at"),
+    )
+
+class StatusHistoryArchive(Base):
+    __tablename__ = "status_history_archive"
+    # Own key: SQLite may hand an archived history_id out again
+    archive_id = Column(Integer, primary_key=True)
+    history_id = Column(Integer)
+    parcel_id = Column(Integer, ForeignKey("parcels_archive.parcel_id"))
+    status = Column(String)
+    updated_at = Column(DateTime)
+    operation_id = Column(String)
+
+    __table_args__ = (
+        Index("ix_status_history_archive_parcel_updated", "parcel_id", "updated_at"),
+    )
+
+class ParcelStat(Base):
+    """Dashboard counter bucket, kept up to date by the writers (see utils/stats.py)"""
+    __tablename__ = "parcel_stats"
+    dimension = Column(String, primary_key=True)  # "day" or "rider"
+    bucket = Column(String, primary_key=True)  # booking day (YYYY-MM-DD) or rider_id
+    status = Column(String, primary_key=True)
+    parcels = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+
+class TrackingWorkerLease(Base):
+    """Tracking number worker ids held by running processes (see utils/tracking.py)"""
+    __tablename__ = "tracking_worker_leases"
+    worker_id = Column(Integer, primary_key=True, autoincrement=False)
+    owner = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+class JobRun(Base):
+    """When a scheduled job shared by all workers last completed"""
+    __tablename__ = "job_runs"
+    name = Column(String, primary_key=True)
+    finished_at = Column(DateTime, nullable=False)
 
 # Avoid creating tables at import time. Table creation can fail during
 # module import if the DB is unavailable (causes app startup to crash).
-# Call `Base.metadata.create_all(bind=engine)` at application startup
-# instead (see `main.py`).
\ No newline at end of file
+# Schema changes are applied at application startup by the versioned
+# migrations in `migrations/` instead (see `main.py`).
\ No newline at end of file
@@ -1,23 +1,50 @@
 from fastapi import APIRouter, Depends, HTTPException
 from schemas.pydantic_schemas import UserCreate, LoginRequest, UserOut, Token
 from models.sql_models import User
-from utils.security import get_password_hash, create_access_token, verify_password
-from config.database import get_db
+from utils.security import create_access_token
+from utils.password_pool import password_hasher
+from config.database import get_db, run_db
 import logging
 import traceback
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
+def _user_by_email(db, email: str):
+    return db.query(User).filter(User.email == email).first()
+
+def _insert_user(db, user: UserCreate, hashed: str):
+    new_user = User(
+        name=user.name,
+        email=user.email,
+        phone=user.phone,
+        password_hash=hashed,
+        role=user.role
+    )
+    db.add(new_user)
+    db.commit()
+    db.refresh(new_user)
+    return new_user
+
+def _update_password_hash(db, user_id: int, new_hash: str):
+    db.query(User).filter(User.user_id == user_id).update({User.password_hash: new_hash})
+    db.commit()
+
+def _rollback(db):
+    db.rollback()
+
 @router.post("/register", response_model=UserOut)
-def register(user: UserCreate, db=Depends(get_db)):
+async def register(user: UserCreate, db=Depends(get_db)):
     try:
         # Log sanitized incoming registration attempt (do NOT log raw password)
         try:
             pw_len = len(user.password.encode('utf-8')) if user.password else 0
         except Exception:
             pw_len = -1
-        logger.info(f"Register attempt: email={user.email}, name={user.name}, role={user.role}, phone_present={bool(user.phone)}, pw_bytes={pw_len}")
+        logger.info(
+            "Register attempt: email=%s, name=%s, role=%s, phone_present=%s, pw_bytes=%s",
+            user.email, user.name, user.role, bool(user.phone), pw_len,
+        )
         
         # Validate inputs
         if not user.name or not user.name.strip():
@@ -30,23 +57,15 @@ def register(user: UserCreate, db=Depends(get_db)):
             raise HTTPException(400, "Invalid role. Must be customer, staff, or rider")
         
         # Check if email already exists
-        existing_user = db.query(User).filter(User.email == user.email).first()
+        existing_user = await run_db(db, _user_by_email, user.email)
         if existing_user:
             raise HTTPException(400, "Email already registered")
         
-        # Hash password (get_password_hash handles long passwords via SHA-256 hashing)
-        hashed = get_password_hash(user.password)
+        # Hash password (get_password_hash handles long passwords via SHA-256 hashing).
+        # Hashing is CPU-bound, so it runs on the bounded password worker pool.
+        hashed = await password_hasher.hash(user.password)
         
-        new_user = User(
-            name=user.name,
-            email=user.email,
-            phone=user.phone,
-            password_hash=hashed,
-            role=user.role
-        )
-        db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        new_user = await run_db(db, _insert_user, user, hashed)
         # Return a dict instead of ORM object to avoid Pydantic serialization issues
         return {
             "user_id": new_user.user_id,
@@ -59,11 +78,11 @@ def register(user: UserCreate, db=Depends(get_db)):
     except Exception as e:
         # Log full exception with traceback for debugging (server-side only)
         logger.exception("Registration error")
-        db.rollback()
+        await run_db(db, _rollback)
         raise HTTPException(500, "Registration failed — server error")
 
 @router.post("/login", response_model=Token)
-def login(user: LoginRequest, db=Depends(get_db)):
+async def login(user: LoginRequest, db=Depends(get_db)):
     try:
         # Validate inputs
         if not user.email or not user.email.strip():
@@ -71,14 +90,20 @@ def login(user: LoginRequest, db=Depends(get_db)):
         if not user.password:
             raise HTTPException(400, "Password is required")
         
-        db_user = db.query(User).filter(User.email == user.email).first()
-        if not db_user or not verify_password(user.password, db_user.password_hash):
+        db_user = await run_db(db, _user_by_email, user.email)
+        if not db_user:
+            raise HTTPException(401, "Invalid email or password")
+        valid, new_hash = await password_hasher.verify_and_update(user.password, db_user.password_hash)
+        if not valid:
             raise HTTPException(401, "Invalid email or password")
+        if new_hash:
+            # Stored hash uses an outdated bcrypt cost; upgrade it transparently
+            await run_db(db, _update_password_hash, db_user.user_id, new_hash)
         
-        token = create_access_token({"sub": db_user.email, "role": db_user.role})
+        token = create_access_token({"sub": db_user.email, "role": db_user.role, "user_id": db_user.user_id})
         return {"access_token": token, "token_type": "bearer"}
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Login error: {str(e)}")
+        logger.error("Login error: %s", e)
         raise HTTPException(500, "Login failed")
\ No newline at end of file
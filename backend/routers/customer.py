@@ -1,95 +1,196 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.security import OAuth2PasswordBearer
-from datetime import datetime
-from schemas.pydantic_schemas import ParcelCreate, ParcelOut
-from models.sql_models import Parcel, StatusHistory, User
-from utils.security import decode_token
-from config.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
+from email.utils import parsedate_to_datetime
+from schemas.pydantic_schemas import ParcelCreate, ParcelOut, ParcelTimelineOut, QuoteRequest
+from models.sql_models import Parcel
+from utils.tracking import is_valid_tracking_number
+from utils.tracking_cache import tracking_cache, entry_for_parcel
+from utils.events import event_bus, event_for_parcel
+from utils.timeline import parcel_history, history_row
+from utils.archive import TRACKING_TABLES
+from utils.auth import Principal, get_principal, require_customer
+from utils.pricing import rate_cards
+from utils.booking import book_parcel, validate_parcel
+from utils.search import SEARCH_MAX_OFFSET, SEARCH_MIN_LENGTH, index_parcels, normalize_query, search_parcels
+from utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from utils.serialization import FastJSONResponse, fetch_parcel_rows
+from config.database import get_db, get_read_db, run_db, stream_partitions, used_replica
+from typing import List
+import json
 import logging
 
 logger = logging.getLogger(__name__)
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 router = APIRouter(prefix="/customer", tags=["Customer"])
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
-    logger.info(f"Validating customer token (first 20 chars): {token[:20]}...")
-    payload = decode_token(token)
-    
-    if not payload:
-        logger.error("Token decode returned None")
-        raise HTTPException(401, "Invalid or expired token")
-    
-    user_role = payload.get("role")
-    logger.info(f"Token decoded, user role: {user_role}")
-    
-    if user_role != "customer":
-        logger.error(f"Access denied - user role is '{user_role}', expected 'customer'")
-        raise HTTPException(403, f"Customer access required. Your role: {user_role}")
-    
-    return payload
-
 @router.post("/parcel/create", response_model=ParcelOut)
-def create_parcel(
+async def create_parcel(
     parcel: ParcelCreate,
-    token: str = Depends(oauth2_scheme),
+    user: Principal = Depends(require_customer),
     db=Depends(get_db)
 ):
-    user_info = get_current_user(token)
-    
-    # Validate user exists
-    db_user = db.query(User).filter(User.email == user_info["sub"]).first()
-    if not db_user:
-        raise HTTPException(404, "User not found")
-    
-    # Validate weight
-    if parcel.weight_kg <= 0:
-        raise HTTPException(400, "Weight must be greater than 0")
-    
-    # Validate receiver details
-    if not parcel.receiver_name or not parcel.receiver_name.strip():
-        raise HTTPException(400, "Receiver name is required")
-    if not parcel.receiver_phone or not parcel.receiver_phone.strip():
-        raise HTTPException(400, "Receiver phone is required")
-    if not parcel.receiver_address or not parcel.receiver_address.strip():
-        raise HTTPException(400, "Receiver address is required")
-
-    charges = parcel.weight_kg * 50  # Rs.50 per kg
-
-    new_parcel = Parcel(
-        sender_id=db_user.user_id,
-        receiver_name=parcel.receiver_name,
-        receiver_phone=parcel.receiver_phone,
-        receiver_address=parcel.receiver_address,
-        weight_kg=parcel.weight_kg,
-        charges=charges,
-        tracking_number=f"TRK{datetime.now().strftime('%Y%m%d%H%M%S')}",
-        current_status="booked"
-    )
-    db.add(new_parcel)
-    db.commit()
-    db.refresh(new_parcel)
-
-    db.add(StatusHistory(parcel_id=new_parcel.parcel_id, status="booked"))
-    db.commit()
-
+    validate_parcel(parcel)
+    new_parcel = await run_db(db, book_parcel, parcel, user.user_id)
+    await tracking_cache.prime(new_parcel.tracking_number, entry_for_parcel(new_parcel))
+    index_parcels([new_parcel])
+    await event_bus.publish(event_for_parcel("parcel_created", new_parcel))
     return new_parcel
 
-@router.get("/my-parcels")
-def get_my_parcels(token: str = Depends(oauth2_scheme), db=Depends(get_db)):
+QUOTE_MAX_ITEMS = 5000
+
+@router.post("/quote")
+async def quote_parcels(request: QuoteRequest, user: Principal = Depends(get_principal)):
+    """Price up to 5000 prospective parcels in one call (merchant previews).
+
+    Items are priced in request order; items that cannot be priced get
+    `charges: null` and an `error`.
+    """
+    if len(request.items) > QUOTE_MAX_ITEMS:
+        raise HTTPException(400, f"At most {QUOTE_MAX_ITEMS} items per quote")
+    card = rate_cards.current()
+    quotes = []
+    for item in request.items:
+        # weight_kg is already a positive, finite, bounded number (QuoteItem)
+        if item.service_level not in card.services:
+            quotes.append({"charges": None, "error": f"Unknown service level '{item.service_level}'"})
+        else:
+            quotes.append({"charges": card.quote(item.weight_kg, item.receiver_address, item.service_level, request.origin_city)})
+    return {"rate_card": card.version, "quotes": quotes}
+
+def _parcels_for_sender(db, sender_id: int):
+    return fetch_parcel_rows(db, select(Parcel).where(Parcel.sender_id == sender_id))
+
+@router.get("/my-parcels", response_model=List[ParcelOut])
+async def get_my_parcels(user: Principal = Depends(require_customer), db=Depends(get_read_db)):
     """Get all parcels sent by the logged-in customer"""
-    user_info = get_current_user(token)
-    
-    db_user = db.query(User).filter(User.email == user_info["sub"]).first()
-    if not db_user:
-        raise HTTPException(404, "User not found")
-    
-    parcels = db.query(Parcel).filter(Parcel.sender_id == db_user.user_id).all()
+    return FastJSONResponse(await run_db(db, _parcels_for_sender, user.user_id))
+
+@router.get("/parcels/search", response_model=List[ParcelOut])
+async def search_my_parcels(
+    response: Response,
+    q: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0, le=SEARCH_MAX_OFFSET),
+    user: Principal = Depends(require_customer),
+    db=Depends(get_read_db)
+):
+    """Search the logged-in customer's parcels, best matches first.
+
+    Matches tracking number prefix, receiver name, phone or address. The
+    offset of the next page comes back in the `X-Next-Offset` header.
+    """
+    if len(normalize_query(q)) < SEARCH_MIN_LENGTH:
+        raise HTTPException(400, f"Search needs at least {SEARCH_MIN_LENGTH} characters")
+    parcels = await run_db(db, search_parcels, q, user.user_id, limit + 1, offset)
+    if len(parcels) > limit:
+        parcels = parcels[:limit]
+        response.headers["X-Next-Offset"] = str(offset + limit)
     return parcels
 
+def _tracking_entry(db, tracking_number: str):
+    # Live parcels first, then the archive
+    for parcels, history in TRACKING_TABLES:
+        # The parcel and the time of its latest history entry in one round trip
+        last_changed_at = (
+            select(func.max(history.updated_at))
+            .where(history.parcel_id == parcels.parcel_id)
+            .scalar_subquery()
+        )
+        row = db.execute(
+            select(parcels, last_changed_at).where(parcels.tracking_number == tracking_number)
+        ).first()
+        if row:
+            return entry_for_parcel(row[0], row[1])
+    return None
+
+def _not_modified(request: Request, entry) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return if_none_match.strip() == "*" or entry.etag in [tag.strip() for tag in if_none_match.split(",")]
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and entry.last_modified:
+        try:
+            return parsedate_to_datetime(entry.last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
 @router.get("/parcel/track/{tracking_number}", response_model=ParcelOut)
-def track_parcel(tracking_number: str, db=Depends(get_db)):
-    parcel = db.query(Parcel).filter(Parcel.tracking_number == tracking_number).first()
-    if not parcel:
+async def track_parcel(tracking_number: str, request: Request, db=Depends(get_read_db)):
+    # Reject malformed or mistyped numbers without touching the database
+    tracking_number = tracking_number.strip().upper()
+    if not is_valid_tracking_number(tracking_number):
+        raise HTTPException(404, "Parcel not found")
+
+    entry = await tracking_cache.get(tracking_number)
+    if entry is None:
+        # Taken before the read, so a write landing meanwhile keeps this copy out
+        version = await tracking_cache.version(tracking_number)
+        entry = await run_db(db, _tracking_entry, tracking_number)
+        if entry is None:
+            raise HTTPException(404, "Parcel not found")
+        # A lagging replica's copy must not outlive the short local TTL
+        await tracking_cache.prime(tracking_number, entry, shared=not used_replica(db), version=version)
+
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if entry.last_modified:
+        headers["Last-Modified"] = entry.last_modified
+    if _not_modified(request, entry):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+def _parcel_tables(db, tracking_number: str):
+    """The (parcels, history) tables holding the parcel, or None"""
+    for tables in TRACKING_TABLES:
+        parcels = tables[0]
+        if db.scalar(select(parcels.parcel_id).where(parcels.tracking_number == tracking_number)) is not None:
+            return tables
+    return None
+
+def _timeline(db, tracking_number: str):
+    for parcels, history in TRACKING_TABLES:
+        # The parcel and its full history in one query
+        rows = db.execute(
+            select(parcels, history)
+            .outerjoin(history, history.parcel_id == parcels.parcel_id)
+            .where(parcels.tracking_number == tracking_number)
+            .order_by(history.updated_at, history.history_id)
+        ).all()
+        if rows:
+            break
+    else:
+        return None
+    parcel = rows[0][0]
+    return {
+        "parcel_id": parcel.parcel_id,
+        "tracking_number": parcel.tracking_number,
+        "current_status": parcel.current_status,
+        "history": [history_row(entry) for _, entry in rows if entry is not None],
+    }
+
+@router.get("/parcel/{tracking_number}/timeline", response_model=ParcelTimelineOut)
+async def parcel_timeline(tracking_number: str, stream: bool = False, db=Depends(get_read_db)):
+    """Every status the parcel has been through, oldest first.
+
+    With `stream=true` the history entries are sent as NDJSON instead, for
+    parcels with very long histories.
+    """
+    tracking_number = tracking_number.strip().upper()
+    if not is_valid_tracking_number(tracking_number):
+        raise HTTPException(404, "Parcel not found")
+
+    if stream:
+        tables = await run_db(db, _parcel_tables, tracking_number)
+        if tables is None:
+            raise HTTPException(404, "Parcel not found")
+
+        async def generate():
+            async for entries in stream_partitions(parcel_history(tracking_number, tables)):
+                yield "".join(json.dumps(history_row(entry)) + "\n" for entry in entries)
+        return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+    timeline = await run_db(db, _timeline, tracking_number)
+    if timeline is None:
         raise HTTPException(404, "Parcel not found")
-    return parcel
\ No newline at end of file
+    return timeline
@@ -0,0 +1,116 @@
+from collections import Counter
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
+from dotenv import load_dotenv
+from config.database import SessionLocal
+from models.sql_models import Parcel
+from utils.auth import Principal, get_principal, require_stream_role
+from utils.events import event_bus
+from utils.security import STREAM_TICKET_EXPIRE_SECONDS, create_stream_ticket
+from utils.tracking import is_valid_tracking_number
+from utils.tracking_cache import tracking_cache
+import asyncio
+import json
+import logging
+import os
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/events", tags=["Events"])
+
+# Comment lines keep idle connections open through proxies
+KEEPALIVE_SECONDS = 15
+# Open streams per user (customer and staff streams) or per parcel (public
+# parcel streams), per worker. Not per address: behind a reverse proxy
+# every client shares one.
+EVENTS_MAX_STREAMS_PER_CLIENT = int(os.getenv("EVENTS_MAX_STREAMS_PER_CLIENT", "10"))
+
+open_streams = Counter()  # user or parcel -> open streams
+
+def _check_capacity(key: str):
+    if open_streams[key] >= EVENTS_MAX_STREAMS_PER_CLIENT:
+        raise HTTPException(429, "Too many open event streams", headers={"Retry-After": str(KEEPALIVE_SECONDS)})
+
+def _release_stream(key: str):
+    open_streams[key] -= 1
+    if open_streams[key] <= 0:
+        del open_streams[key]
+
+def _event_stream(key: str, topic: str):
+    """Stream `topic` as server-sent events.
+
+    The slot and the bus subscription are taken when the body starts, not
+    when the response is built, so a response that is never sent holds
+    neither.
+    """
+    _check_capacity(key)
+
+    async def generate():
+        if open_streams[key] >= EVENTS_MAX_STREAMS_PER_CLIENT:
+            # Filled up since the check above; the client reconnects later
+            yield f"retry: {KEEPALIVE_SECONDS * 1000}\n\n"
+            return
+        open_streams[key] += 1
+        subscription = event_bus.subscribe(topic)
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            # Runs when the client disconnects and the response is cancelled
+            subscription.close()
+            _release_stream(key)
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def _parcel_exists(tracking_number: str) -> bool:
+    # Its own short session: nothing is held for the life of the stream
+    with SessionLocal() as db:
+        return db.scalar(select(Parcel.parcel_id).where(Parcel.tracking_number == tracking_number)) is not None
+
+@router.post("/ticket")
+async def stream_ticket(user: Principal = Depends(get_principal)):
+    """Short-lived ticket for opening the customer or staff stream as `?ticket=`
+    (EventSource cannot send an Authorization header). Fetch a new one
+    before reconnecting."""
+    ticket = create_stream_ticket({"sub": user.email, "role": user.role, "user_id": user.user_id})
+    return {"ticket": ticket, "expires_in": STREAM_TICKET_EXPIRE_SECONDS}
+
+@router.get("/parcel/{tracking_number}")
+async def parcel_events(tracking_number: str):
+    """Server-sent events for one parcel (public, like tracking)"""
+    tracking_number = tracking_number.strip().upper()
+    if not is_valid_tracking_number(tracking_number):
+        raise HTTPException(404, "Parcel not found")
+    # A cached tracking entry means the parcel exists
+    if await tracking_cache.get(tracking_number) is None:
+        if not await run_in_threadpool(_parcel_exists, tracking_number):
+            raise HTTPException(404, "Parcel not found")
+    await event_bus.start()
+    topic = f"parcel:{tracking_number}"
+    return _event_stream(topic, topic)
+
+@router.get("/customer")
+async def customer_events(user: Principal = Depends(require_stream_role("customer"))):
+    """Server-sent events for every parcel the logged-in customer sent"""
+    await event_bus.start()
+    return _event_stream(f"user:{user.user_id}", f"customer:{user.user_id}")
+
+@router.get("/staff")
+async def staff_events(staff: Principal = Depends(require_stream_role("staff"))):
+    """Server-sent events for the staff board (all parcels)"""
+    await event_bus.start()
+    return _event_stream(f"user:{staff.user_id}", "staff")
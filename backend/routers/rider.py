@@ -1,79 +1,230 @@
 from fastapi import APIRouter, HTTPException, Depends
-from fastapi.security import OAuth2PasswordBearer
-from models.sql_models import DeliveryAssignment, Parcel, StatusHistory, User
-from utils.security import decode_token
-from config.database import get_db
+from sqlalchemy import case, insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from models.sql_models import DeliveryAssignment, Parcel, StatusHistory
+from schemas.pydantic_schemas import BatchStatusUpdateRequest, ParcelOut
+from utils.tracking_cache import tracking_cache
+from utils.events import event_bus, event_for_parcel
+from utils.auth import Principal, require_rider
+from utils.lifecycle import STATUSES, can_transition, sources_of
+from utils.stats import StatsDelta
+from utils.serialization import FastJSONResponse, fetch_parcel_rows
+from config.database import get_db, get_read_db, run_db
+from datetime import datetime, timezone
+from typing import List, Optional
 import logging
 
 logger = logging.getLogger(__name__)
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 router = APIRouter(prefix="/rider", tags=["Rider"])
 
-def require_rider(token: str):
-    logger.info(f"Validating rider token (first 20 chars): {token[:20]}...")
-    payload = decode_token(token)
-    
-    if not payload:
-        logger.error("Token decode returned None")
-        raise HTTPException(401, "Invalid or expired token")
-    
-    user_role = payload.get("role")
-    logger.info(f"Token decoded, user role: {user_role}")
-    
-    if user_role != "rider":
-        logger.error(f"Access denied - user role is '{user_role}', expected 'rider'")
-        raise HTTPException(403, f"Rider access required. Your role: {user_role}")
-    
-    return payload
-
-@router.get("/my-parcels")
-def my_parcels(token: str = Depends(oauth2_scheme), db=Depends(get_db)):
-    """Get all parcels assigned to the logged-in rider"""
-    user = require_rider(token)
-    db_user = db.query(User).filter(User.email == user["sub"]).first()
-    
-    assignments = (
-        db.query(DeliveryAssignment)
-        .filter(DeliveryAssignment.rider_id == db_user.user_id)
-        .all()
+BATCH_MAX_UPDATES = 500
+
+# What status updates read back: enough for the cache, events and stats
+_CHANGED_COLUMNS = (
+    Parcel.parcel_id, Parcel.tracking_number, Parcel.sender_id, Parcel.current_status,
+    Parcel.previous_status, Parcel.booked_at, Parcel.charges,
+)
+
+def _rider_parcels(db, rider_id: int, current_status: Optional[str]):
+    # Fetch the parcels through their assignments in a single joined query.
+    # Assignments are created in the order staff build the route, so
+    # assignment_id doubles as the route sequence.
+    query = (
+        select(Parcel)
+        .join(DeliveryAssignment, DeliveryAssignment.parcel_id == Parcel.parcel_id)
+        .where(DeliveryAssignment.rider_id == rider_id)
     )
-    
-    # Get full parcel details for each assignment
-    parcels = []
-    for assignment in assignments:
-        parcel = db.query(Parcel).filter(Parcel.parcel_id == assignment.parcel_id).first()
-        if parcel:
-            parcels.append(parcel)
-    
-    return parcels
+    if current_status:
+        query = query.where(Parcel.current_status == current_status)
 
-@router.put("/update-status/{parcel_id}")
-def update_status(parcel_id: int, new_status: str, token: str = Depends(oauth2_scheme), db=Depends(get_db)):
-    require_rider(token)
-    
-    # Validate parcel exists
-    parcel = db.query(Parcel).filter(Parcel.parcel_id == parcel_id).first()
-    if not parcel:
-        raise HTTPException(404, "Parcel not found")
-    
-    # Validate rider is assigned to this parcel
-    user = require_rider(token)
-    db_user = db.query(User).filter(User.email == user["sub"]).first()
-    assignment = db.query(DeliveryAssignment).filter(
-        DeliveryAssignment.parcel_id == parcel_id,
-        DeliveryAssignment.rider_id == db_user.user_id
-    ).first()
-    if not assignment:
-        raise HTTPException(403, "You are not assigned to this parcel")
-    
+    return fetch_parcel_rows(db, query.order_by(DeliveryAssignment.assignment_id))
+
+@router.get("/my-parcels", response_model=List[ParcelOut])
+async def my_parcels(current_status: Optional[str] = None, user: Principal = Depends(require_rider), db=Depends(get_read_db)):
+    """Get all parcels assigned to the logged-in rider, in route order"""
+    return FastJSONResponse(await run_db(db, _rider_parcels, user.user_id, current_status))
+
+def _update_status(db, parcel_id: int, new_status: str, rider_id: int, expected_status: Optional[str] = None):
     # Validate status value
-    valid_statuses = ["booked", "packed", "in transit", "out for delivery", "delivered"]
-    if new_status not in valid_statuses:
-        raise HTTPException(400, f"Invalid status. Must be one of: {', '.join(valid_statuses)}")
-    
-    parcel.current_status = new_status
-    db.add(parcel)
-    db.add(StatusHistory(parcel_id=parcel_id, status=new_status))
+    if new_status not in STATUSES:
+        raise HTTPException(400, f"Invalid status. Must be one of: {', '.join(STATUSES)}")
+    if expected_status is not None and not can_transition(expected_status, new_status):
+        raise HTTPException(409, f"Cannot move a parcel from {expected_status} to {new_status}")
+
+    # Compare-and-set: the lifecycle check, the assignment check and the write
+    # are one UPDATE, so concurrent writers cannot both move the same parcel.
+    # The parcel change and its history row commit together, so timeline
+    # reads never see one without the other.
+    assigned = (
+        select(DeliveryAssignment.assignment_id)
+        .where(DeliveryAssignment.parcel_id == parcel_id, DeliveryAssignment.rider_id == rider_id)
+        .exists()
+    )
+    expected = [expected_status] if expected_status is not None else sources_of(new_status)
+    parcel = db.execute(
+        update(Parcel)
+        .where(Parcel.parcel_id == parcel_id, Parcel.current_status.in_(expected), assigned)
+        # SET expressions see the row as it was, so previous_status gets the old status
+        .values(current_status=new_status, previous_status=Parcel.current_status)
+        .returning(*_CHANGED_COLUMNS)
+    ).first()
+    if parcel is None:
+        db.rollback()
+        # Only failed updates pay for working out why
+        row = db.execute(select(Parcel.current_status, assigned).where(Parcel.parcel_id == parcel_id)).first()
+        if row is None:
+            raise HTTPException(404, "Parcel not found")
+        if not row[1]:
+            raise HTTPException(403, "You are not assigned to this parcel")
+        raise HTTPException(409, f"Parcel is {row[0]}; it cannot move to {new_status}")
+
+    db.execute(insert(StatusHistory).values(parcel_id=parcel_id, status=new_status))
+    stats = StatsDelta()
+    stats.moved(parcel.booked_at, parcel.charges, parcel.previous_status, new_status, rider_id)
+    stats.apply(db)
     db.commit()
-    return {"message": f"Status updated to {new_status}"}
\ No newline at end of file
+    return parcel
+
+@router.put("/update-status/{parcel_id}")
+async def update_status(
+    parcel_id: int,
+    new_status: str,
+    expected_status: Optional[str] = None,
+    user: Principal = Depends(require_rider),
+    db=Depends(get_db)
+):
+    """Move a parcel to its next lifecycle status.
+
+    Pass `expected_status` to only apply the change if the parcel is still
+    in that status. Illegal transitions and lost races return 409.
+    """
+    parcel = await run_db(db, _update_status, parcel_id, new_status, user.user_id, expected_status)
+    await tracking_cache.invalidate(parcel.tracking_number)
+    await event_bus.publish(event_for_parcel("status_changed", parcel, rider_id=user.user_id))
+    return {"message": f"Status updated to {new_status}"}
+
+def _client_time(client_timestamp: datetime, now: datetime):
+    if client_timestamp.tzinfo is not None:
+        client_timestamp = client_timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    # A skewed device clock must not put history in the future
+    return min(client_timestamp, now)
+
+def _batch_update_status(db, updates, rider_id: int, retry: bool = True):
+    now = datetime.utcnow()
+    operation_ids = [u.operation_id for u in updates]
+    parcel_ids = {u.parcel_id for u in updates}
+
+    # One query for operations already applied by an earlier attempt, one
+    # for the current status of every parcel in the batch assigned to the rider
+    applied_before = set(db.scalars(
+        select(StatusHistory.operation_id).where(StatusHistory.operation_id.in_(operation_ids))
+    ))
+    assigned = dict(db.execute(
+        select(Parcel.parcel_id, Parcel.current_status)
+        .join(DeliveryAssignment, DeliveryAssignment.parcel_id == Parcel.parcel_id)
+        .where(DeliveryAssignment.rider_id == rider_id, DeliveryAssignment.parcel_id.in_(parcel_ids))
+    ).all())
+
+    results = []
+    scans = {}  # parcel_id -> [(updated_at, update, result)]
+    seen = set()
+    for u in updates:
+        result = {"operation_id": u.operation_id, "parcel_id": u.parcel_id}
+        if u.operation_id in applied_before or u.operation_id in seen:
+            result["result"] = "duplicate"
+        elif u.status not in STATUSES:
+            result.update(result="rejected", detail=f"Invalid status. Must be one of: {', '.join(STATUSES)}")
+        elif u.parcel_id not in assigned:
+            result.update(result="rejected", detail="You are not assigned to this parcel")
+        else:
+            scans.setdefault(u.parcel_id, []).append((_client_time(u.client_timestamp, now), u, result))
+        seen.add(u.operation_id)
+        results.append(result)
+
+    # Replay each parcel's scans in the order the rider made them
+    history = []
+    moves = {}  # parcel_id -> (expected current status, final status)
+    for parcel_id, parcel_scans in scans.items():
+        status = assigned[parcel_id]
+        applied_any = False
+        for updated_at, u, result in sorted(parcel_scans, key=lambda scan: scan[0]):
+            if not can_transition(status, u.status):
+                result.update(result="conflict", detail=f"Cannot move a parcel from {status} to {u.status}")
+                continue
+            result["result"] = "applied"
+            applied_any = True
+            status = u.status
+            history.append({
+                "parcel_id": parcel_id,
+                "status": u.status,
+                "updated_at": updated_at,
+                "operation_id": u.operation_id,
+            })
+        if applied_any:
+            moves[parcel_id] = (assigned[parcel_id], status)
+
+    if not history:
+        return results, []
+
+    # One compare-and-set UPDATE for the whole batch: a parcel only moves if
+    # it is still in the status the scans were replayed from
+    try:
+        changed = db.execute(
+            update(Parcel)
+            .where(tuple_(Parcel.parcel_id, Parcel.current_status).in_(
+                [(parcel_id, expected) for parcel_id, (expected, _) in moves.items()]
+            ))
+            .values(
+                current_status=case(
+                    {parcel_id: status for parcel_id, (_, status) in moves.items()}, value=Parcel.parcel_id
+                ),
+                previous_status=Parcel.current_status,
+            )
+            .returning(*_CHANGED_COLUMNS)
+            .execution_options(synchronize_session=False)
+        ).all()
+        if len(changed) == len(moves):
+            db.execute(insert(StatusHistory), history)
+            stats = StatsDelta()
+            for parcel in changed:
+                stats.moved(parcel.booked_at, parcel.charges, parcel.previous_status, parcel.current_status, rider_id)
+            stats.apply(db)
+            db.commit()
+            return results, changed
+    except IntegrityError:
+        # A concurrent retry of this batch committed the same operations
+        pass
+
+    # Another writer got in first; run again against the new state
+    db.rollback()
+    if not retry:
+        raise HTTPException(409, "Parcels changed while applying the batch, please retry")
+    return _batch_update_status(db, updates, rider_id, retry=False)
+
+@router.post("/update-status/batch")
+async def update_status_batch(
+    request: BatchStatusUpdateRequest,
+    user: Principal = Depends(require_rider),
+    db=Depends(get_db)
+):
+    """Apply a batch of status scans queued by an offline rider app.
+
+    Each parcel's scans are replayed in client timestamp order through the
+    lifecycle; scans that are not a legal next step come back as
+    `conflict`. Accepted updates are committed in one transaction and
+    recorded in the history with their client timestamps. Each update carries a client
+    generated `operation_id`, so resending a batch after a dropped response
+    reports the already applied updates as `duplicate` instead of writing
+    them twice.
+    """
+    if not request.updates:
+        return {"results": []}
+    if len(request.updates) > BATCH_MAX_UPDATES:
+        raise HTTPException(400, f"At most {BATCH_MAX_UPDATES} updates per batch")
+
+    results, changed = await run_db(db, _batch_update_status, request.updates, user.user_id)
+    for parcel in changed:
+        await tracking_cache.invalidate(parcel.tracking_number)
+        await event_bus.publish(event_for_parcel("status_changed", parcel, rider_id=user.user_id))
+    return {"results": results}
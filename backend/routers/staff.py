@@ -1,58 +1,185 @@
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.security import OAuth2PasswordBearer
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import select, tuple_, update
 from models.sql_models import Parcel, DeliveryAssignment, User, StatusHistory
-from schemas.pydantic_schemas import ParcelCreate, ParcelOut
-from utils.security import decode_token
-from config.database import get_db
-from datetime import datetime
+from schemas.pydantic_schemas import BulkParcelRow, ParcelCreate, ParcelOut, TimelineRequest
+from utils.tracking_cache import tracking_cache, entry_for_parcel
+from utils.events import event_bus, event_for_parcel, parcel_event
+from utils.dispatch import auto_assign, publish_assignments
+from utils.pricing import quote_charges, rate_cards
+from utils.stats import StatsDelta, dashboard
+from utils.booking import book_parcel, booking_values, insert_bookings, validate_parcel
+from utils.search import SEARCH_MAX_OFFSET, SEARCH_MIN_LENGTH, index_parcels, normalize_query, search_parcels
+from utils.timeline import TIMELINE_MAX_PARCELS, parcels_history, history_row
+from utils.auth import Principal, require_staff
+from utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor, decode_cursor
+from utils.serialization import FastJSONResponse, fetch_parcel_rows
+from config.database import get_db, get_read_db, run_db, stream_partitions
+from datetime import date, datetime
+from typing import List, Optional
+import csv
+import io
+import json
 import logging
 
 logger = logging.getLogger(__name__)
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 router = APIRouter(prefix="/staff", tags=["Staff"])
 
-def require_staff(token: str):
-    logger.info(f"Validating staff token (first 20 chars): {token[:20]}...")
-    payload = decode_token(token)
-    
-    if not payload:
-        logger.error("Token decode returned None")
-        raise HTTPException(401, "Invalid or expired token")
-    
-    user_role = payload.get("role")
-    logger.info(f"Token decoded, user role: {user_role}")
-    
-    if user_role != "staff":
-        logger.error(f"Access denied - user role is '{user_role}', expected 'staff'")
-        raise HTTPException(403, f"Staff access required. Your role: {user_role}")
-    
-    return payload
+BULK_MAX_ROWS = 20000
+BULK_CHUNK_SIZE = 500
+
+def _filtered_parcels(current_status, sender_id, rider_id, booked_from, booked_to, cursor):
+    """Build the parcel listing statement in keyset order (newest first)"""
+    query = select(Parcel)
+    if current_status:
+        query = query.where(Parcel.current_status == current_status)
+    if sender_id is not None:
+        query = query.where(Parcel.sender_id == sender_id)
+    if rider_id is not None:
+        query = query.join(DeliveryAssignment, DeliveryAssignment.parcel_id == Parcel.parcel_id).where(
+            DeliveryAssignment.rider_id == rider_id
+        )
+    if booked_from:
+        query = query.where(Parcel.booked_at >= booked_from)
+    if booked_to:
+        query = query.where(Parcel.booked_at < booked_to)
+    if cursor:
+        # A single row-value comparison, so the next page seeks ix_parcels_booked_parcel.
+        # booked_at is never NULL (legacy rows were backfilled by migration 10).
+        last_booked_at, last_parcel_id = decode_cursor(cursor)
+        query = query.where(tuple_(Parcel.booked_at, Parcel.parcel_id) < tuple_(last_booked_at, last_parcel_id))
+    return query.order_by(Parcel.booked_at.desc(), Parcel.parcel_id.desc())
+
+def _fetch_all(db, statement):
+    return db.scalars(statement).all()
+
+def _parcel_row(parcel: Parcel):
+    return {
+        "parcel_id": parcel.parcel_id,
+        "tracking_number": parcel.tracking_number,
+        "sender_id": parcel.sender_id,
+        "receiver_name": parcel.receiver_name,
+        "receiver_phone": parcel.receiver_phone,
+        "receiver_address": parcel.receiver_address,
+        "weight_kg": parcel.weight_kg,
+        "charges": parcel.charges,
+        "service_level": parcel.service_level,
+        "current_status": parcel.current_status,
+        "booked_at": parcel.booked_at.isoformat() if parcel.booked_at else None,
+    }
+
+@router.get("/parcels", response_model=List[ParcelOut])
+async def get_all_parcels(
+    current_status: Optional[str] = None,
+    sender_id: Optional[int] = None,
+    rider_id: Optional[int] = None,
+    booked_from: Optional[datetime] = None,
+    booked_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    stream: bool = False,
+    staff: Principal = Depends(require_staff),
+    db=Depends(get_read_db)
+):
+    """List parcels one keyset page at a time.
+
+    The continuation token for the next page is returned in the
+    `X-Next-Cursor` header. With `stream=true` every matching row from the
+    cursor onwards is sent as NDJSON instead of a single page.
+    """
+    statement = _filtered_parcels(current_status, sender_id, rider_id, booked_from, booked_to, cursor)
+
+    if stream:
+        async def generate():
+            # Rows are fetched in small batches so memory stays flat
+            async for parcels in stream_partitions(statement, MAX_PAGE_SIZE):
+                yield "".join(json.dumps(_parcel_row(parcel)) + "\n" for parcel in parcels)
+        return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+    # Fetch one extra row to know whether another page exists
+    parcels = await run_db(db, fetch_parcel_rows, statement.limit(limit + 1))
+    headers = {}
+    if len(parcels) > limit:
+        parcels = parcels[:limit]
+        last = parcels[-1]
+        headers["X-Next-Cursor"] = encode_cursor(last["booked_at"], last["parcel_id"])
+    return FastJSONResponse(parcels, headers=headers)
+
+@router.post("/parcels/timelines")
+async def get_parcel_timelines(
+    request: TimelineRequest,
+    stream: bool = False,
+    staff: Principal = Depends(require_staff),
+    db=Depends(get_db)
+):
+    """Status history for many parcels, fetched in a single query.
+
+    Returns `{"parcel_id": ..., "history": [...]}` per requested parcel, in
+    request order. With `stream=true` each history entry is sent as an
+    NDJSON line carrying its parcel_id instead.
+    """
+    parcel_ids = list(dict.fromkeys(request.parcel_ids))
+    if len(parcel_ids) > TIMELINE_MAX_PARCELS:
+        raise HTTPException(400, f"At most {TIMELINE_MAX_PARCELS} parcels per request")
+    statement = parcels_history(parcel_ids)
+
+    if stream:
+        async def generate():
+            async for entries in stream_partitions(statement):
+                yield "".join(
+                    json.dumps({"parcel_id": entry.parcel_id, **history_row(entry)}) + "\n" for entry in entries
+                )
+        return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+    timelines = {parcel_id: [] for parcel_id in parcel_ids}
+    for entry in await run_db(db, _fetch_all, statement):
+        timelines[entry.parcel_id].append(history_row(entry))
+    return [{"parcel_id": parcel_id, "history": history} for parcel_id, history in timelines.items()]
+
+@router.get("/parcels/search", response_model=List[ParcelOut])
+async def search_all_parcels(
+    response: Response,
+    q: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0, le=SEARCH_MAX_OFFSET),
+    staff: Principal = Depends(require_staff),
+    db=Depends(get_read_db)
+):
+    """Search every parcel by tracking number prefix, receiver name, phone or address.
 
-@router.get("/parcels")
-def get_all_parcels(token: str = Depends(oauth2_scheme), db=Depends(get_db)):
-    require_staff(token)
-    return db.query(Parcel).all()
+    Best matches come first. When more results exist, the offset of the
+    next page is returned in the `X-Next-Offset` header.
+    """
+    if len(normalize_query(q)) < SEARCH_MIN_LENGTH:
+        raise HTTPException(400, f"Search needs at least {SEARCH_MIN_LENGTH} characters")
+    parcels = await run_db(db, search_parcels, q, None, limit + 1, offset)
+    if len(parcels) > limit:
+        parcels = parcels[:limit]
+        response.headers["X-Next-Offset"] = str(offset + limit)
+    return parcels
+
+def _parcel_by_id(db, parcel_id: int):
+    return db.query(Parcel).filter(Parcel.parcel_id == parcel_id).first()
 
 @router.get("/parcel/{parcel_id}")
-def get_parcel_by_id(parcel_id: int, token: str = Depends(oauth2_scheme), db=Depends(get_db)):
-    require_staff(token)
-    parcel = db.query(Parcel).filter(Parcel.parcel_id == parcel_id).first()
+async def get_parcel_by_id(parcel_id: int, staff: Principal = Depends(require_staff), db=Depends(get_read_db)):
+    parcel = await run_db(db, _parcel_by_id, parcel_id)
     if not parcel:
         raise HTTPException(404, "Parcel not found")
     return parcel
 
-@router.get("/riders")
-def get_all_riders(token: str = Depends(oauth2_scheme), db=Depends(get_db)):
-    """Get list of all riders for assignment"""
-    require_staff(token)
+def _riders(db):
     riders = db.query(User).filter(User.role == "rider").all()
     return [{"user_id": r.user_id, "name": r.name, "email": r.email, "phone": r.phone} for r in riders]
 
-@router.post("/assign-rider")
-def assign_rider(parcel_id: int, rider_id: int, token: str = Depends(oauth2_scheme), db=Depends(get_db)):
-    require_staff(token)
-    
+@router.get("/riders")
+async def get_all_riders(staff: Principal = Depends(require_staff), db=Depends(get_read_db)):
+    """Get list of all riders for assignment"""
+    return await run_db(db, _riders)
+
+def _assign_rider(db, parcel_id: int, rider_id: int):
     # Validate parcel exists
     parcel = db.query(Parcel).filter(Parcel.parcel_id == parcel_id).first()
     if not parcel:
@@ -70,105 +197,228 @@ def assign_rider(parcel_id: int, rider_id: int, token: str = Depends(oauth2_sche
     
     assignment = DeliveryAssignment(parcel_id=parcel_id, rider_id=rider_id)
     db.add(assignment)
+    stats = StatsDelta()
+    stats.assigned(rider_id, parcel.current_status)
+    stats.apply(db)
     db.commit()
+    return parcel
+
+@router.post("/assign-rider")
+async def assign_rider(parcel_id: int, rider_id: int, staff: Principal = Depends(require_staff), db=Depends(get_db)):
+    parcel = await run_db(db, _assign_rider, parcel_id, rider_id)
+    await event_bus.publish(event_for_parcel("rider_assigned", parcel, rider_id=rider_id))
     return {"message": "Rider assigned successfully!"}
 
+@router.get("/stats")
+async def get_stats(
+    from_day: Optional[date] = None,
+    to_day: Optional[date] = None,
+    staff: Principal = Depends(require_staff),
+    db=Depends(get_read_db)
+):
+    """Dashboard counts per status, per booking day (with revenue) and per rider.
+
+    Served from the parcel_stats counters, so the cost depends on the number
+    of buckets, not parcels. `from_day` / `to_day` (YYYY-MM-DD, inclusive)
+    narrow the per-day figures.
+    """
+    return await run_db(
+        db, dashboard, from_day.isoformat() if from_day else None, to_day.isoformat() if to_day else None
+    )
+
+@router.post("/auto-assign")
+async def auto_assign_riders(dry_run: bool = False, staff: Principal = Depends(require_staff), db=Depends(get_db)):
+    """Assign every unassigned booked/packed parcel to a rider in one batch.
+
+    With `dry_run=true` the plan is computed and summarized but not saved.
+    """
+    summary, plan = await run_db(db, auto_assign, dry_run)
+    if not dry_run:
+        await publish_assignments(plan)
+    return summary
+
 @router.post("/parcel/create", response_model=ParcelOut)
-def create_parcel_as_staff(
+async def create_parcel_as_staff(
     parcel: ParcelCreate,
     customer_email: str,
-    token: str = Depends(oauth2_scheme),
+    staff: Principal = Depends(require_staff),
     db=Depends(get_db)
 ):
     """Staff can create parcels on behalf of customers"""
-    require_staff(token)
-    
-    # Find the customer by email
-    customer = db.query(User).filter(User.email == customer_email, User.role == "customer").first()
-    if not customer:
-        raise HTTPException(404, f"Customer with email '{customer_email}' not found")
-    
-    # Validate weight
-    if parcel.weight_kg <= 0:
-        raise HTTPException(400, "Weight must be greater than 0")
-    
-    # Validate receiver details
-    if not parcel.receiver_name or not parcel.receiver_name.strip():
-        raise HTTPException(400, "Receiver name is required")
-    if not parcel.receiver_phone or not parcel.receiver_phone.strip():
-        raise HTTPException(400, "Receiver phone is required")
-    if not parcel.receiver_address or not parcel.receiver_address.strip():
-        raise HTTPException(400, "Receiver address is required")
-
-    charges = parcel.weight_kg * 50  # Rs.50 per kg
-
-    new_parcel = Parcel(
-        sender_id=customer.user_id,
-        receiver_name=parcel.receiver_name,
-        receiver_phone=parcel.receiver_phone,
-        receiver_address=parcel.receiver_address,
-        weight_kg=parcel.weight_kg,
-        charges=charges,
-        tracking_number=f"TRK{datetime.now().strftime('%Y%m%d%H%M%S')}",
-        current_status="booked"
-    )
-    db.add(new_parcel)
-    db.commit()
-    db.refresh(new_parcel)
-    
-    # Add status history
-    status_entry = StatusHistory(
-        parcel_id=new_parcel.parcel_id,
-        status="booked"
-    )
-    db.add(status_entry)
-    db.commit()
-    
+    validate_parcel(parcel)
+    new_parcel = await run_db(db, book_parcel, parcel, customer_email=customer_email)
+    await tracking_cache.prime(new_parcel.tracking_number, entry_for_parcel(new_parcel))
+    index_parcels([new_parcel])
+    await event_bus.publish(event_for_parcel("parcel_created", new_parcel))
     return new_parcel
 
+def _parse_bulk_rows(raw_rows):
+    """Validate raw manifest rows; returns [(row_number, BulkParcelRow or None, errors)]"""
+    parsed = []
+    for number, raw in enumerate(raw_rows, start=1):
+        try:
+            row = BulkParcelRow.model_validate(raw)
+            validate_parcel(row)
+            parsed.append((number, row, []))
+        except ValidationError as e:
+            errors = [f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()]
+            parsed.append((number, None, errors))
+        except HTTPException as e:
+            parsed.append((number, None, [e.detail]))
+    return parsed
+
+def _bulk_create_parcels(db, parsed, dry_run: bool):
+    emails = {row.customer_email for _, row, _ in parsed if row is not None}
+    customers = dict(
+        db.query(User.email, User.user_id).filter(User.email.in_(emails), User.role == "customer").all()
+    ) if emails else {}
+
+    card = rate_cards.current()
+    results = []
+    pending = []
+    for number, row, errors in parsed:
+        if row is not None and row.customer_email not in customers:
+            errors = [f"Customer with email '{row.customer_email}' not found"]
+        if errors:
+            results.append({"row": number, "status": "invalid", "errors": errors})
+        elif dry_run:
+            results.append({
+                "row": number,
+                "status": "valid",
+                "charges": card.quote(row.weight_kg, row.receiver_address, row.service_level),
+            })
+        else:
+            pending.append((number, row))
+
+    for start in range(0, len(pending), BULK_CHUNK_SIZE):
+        chunk = pending[start:start + BULK_CHUNK_SIZE]
+        booked_at = datetime.utcnow()
+        values = [
+            dict(booking_values(row, card, booked_at), sender_id=customers[row.customer_email])
+            for _, row in chunk
+        ]
+        try:
+            # One transaction per chunk: parcels, their initial history and the counters
+            inserted = insert_bookings(db, values)
+            db.commit()
+            index_parcels(inserted)
+        except Exception:
+            db.rollback()
+            logger.exception(f"Bulk booking chunk starting at row {chunk[0][0]} failed")
+            results.extend({"row": number, "status": "failed", "errors": ["Database error"]} for number, _ in chunk)
+            continue
+        results.extend(
+            {
+                "row": number,
+                "status": "created",
+                "parcel_id": parcel.parcel_id,
+                "tracking_number": parcel.tracking_number,
+                "sender_id": parcel.sender_id,
+                "charges": parcel.charges,
+            }
+            for (number, _), parcel in zip(chunk, inserted)
+        )
+
+    results.sort(key=lambda r: r["row"])
+    return results
+
+@router.post("/parcels/bulk")
+async def bulk_create_parcels(
+    request: Request,
+    dry_run: bool = False,
+    staff: Principal = Depends(require_staff),
+    db=Depends(get_db)
+):
+    """Book a manifest of parcels from a JSON array or a CSV upload (`file` field).
+
+    Each row needs customer_email, receiver_name, receiver_phone,
+    receiver_address and weight_kg. Rows are validated individually and
+    the response reports the outcome of every row; with `dry_run=true`
+    nothing is written.
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(400, "Upload the manifest as a CSV file in the 'file' field")
+        text = (await upload.read()).decode("utf-8-sig")
+        raw_rows = list(csv.DictReader(io.StringIO(text)))
+    else:
+        try:
+            raw_rows = await request.json()
+        except ValueError:
+            raise HTTPException(400, "Body must be a JSON array of parcels")
+        if not isinstance(raw_rows, list):
+            raise HTTPException(400, "Body must be a JSON array of parcels")
+
+    if not raw_rows:
+        raise HTTPException(400, "Manifest is empty")
+    if len(raw_rows) > BULK_MAX_ROWS:
+        raise HTTPException(400, f"Manifest has {len(raw_rows)} rows; the limit is {BULK_MAX_ROWS}")
+
+    results = await run_db(db, _bulk_create_parcels, _parse_bulk_rows(raw_rows), dry_run)
+    for r in results:
+        if r["status"] == "created":
+            await event_bus.publish(
+                parcel_event("parcel_created", r["parcel_id"], r["tracking_number"], r["sender_id"], "booked")
+            )
+    return {
+        "dry_run": dry_run,
+        "total": len(results),
+        "created": sum(1 for r in results if r["status"] == "created"),
+        "failed": sum(1 for r in results if r["status"] in ("invalid", "failed")),
+        "results": results,
+    }
+
+def _update_parcel(db, parcel_id: int, parcel: ParcelCreate):
+    validate_parcel(parcel)
+
+    # Lock the row and read what the stats counters need, then update the
+    # details. Staff edits never write current_status, so they cannot undo
+    # a status change a rider made at the same time.
+    current = db.execute(
+        select(Parcel.charges, Parcel.current_status, Parcel.booked_at)
+        .where(Parcel.parcel_id == parcel_id)
+        .with_for_update()
+    ).first()
+    if current is None:
+        raise HTTPException(404, "Parcel not found")
+
+    db_parcel = db.execute(
+        update(Parcel)
+        .where(Parcel.parcel_id == parcel_id)
+        .values(
+            receiver_name=parcel.receiver_name,
+            receiver_phone=parcel.receiver_phone,
+            receiver_address=parcel.receiver_address,
+            weight_kg=parcel.weight_kg,
+            service_level=parcel.service_level,
+            charges=quote_charges(parcel.weight_kg, parcel.receiver_address, parcel.service_level),  # Recalculate charges
+        )
+        .returning(Parcel)
+        .execution_options(synchronize_session=False)
+    ).scalar_one()
+
+    # Add status history for the update
+    db.add(StatusHistory(parcel_id=db_parcel.parcel_id, status=db_parcel.current_status))
+    stats = StatsDelta()
+    stats.repriced(current.booked_at, current.current_status, current.charges, db_parcel.charges)
+    stats.apply(db)
+    db.commit()
+
+    return db_parcel
+
 @router.put("/parcel/{parcel_id}", response_model=ParcelOut)
-def update_parcel(
+async def update_parcel(
     parcel_id: int,
     parcel: ParcelCreate,
-    token: str = Depends(oauth2_scheme),
+    staff: Principal = Depends(require_staff),
     db=Depends(get_db)
 ):
     """Staff can update/edit parcel details"""
-    require_staff(token)
-    
-    # Find the parcel
-    db_parcel = db.query(Parcel).filter(Parcel.parcel_id == parcel_id).first()
-    if not db_parcel:
-        raise HTTPException(404, "Parcel not found")
-    
-    # Validate weight
-    if parcel.weight_kg <= 0:
-        raise HTTPException(400, "Weight must be greater than 0")
-    
-    # Validate receiver details
-    if not parcel.receiver_name or not parcel.receiver_name.strip():
-        raise HTTPException(400, "Receiver name is required")
-    if not parcel.receiver_phone or not parcel.receiver_phone.strip():
-        raise HTTPException(400, "Receiver phone is required")
-    if not parcel.receiver_address or not parcel.receiver_address.strip():
-        raise HTTPException(400, "Receiver address is required")
-    
-    # Update parcel details
-    db_parcel.receiver_name = parcel.receiver_name
-    db_parcel.receiver_phone = parcel.receiver_phone
-    db_parcel.receiver_address = parcel.receiver_address
-    db_parcel.weight_kg = parcel.weight_kg
-    db_parcel.charges = parcel.weight_kg * 50  # Recalculate charges
-    
-    db.commit()
-    db.refresh(db_parcel)
-    
-    # Add status history for the update
-    status_entry = StatusHistory(
-        parcel_id=db_parcel.parcel_id,
-        status=db_parcel.current_status
-    )
-    db.add(status_entry)
-    db.commit()
-    
+    db_parcel = await run_db(db, _update_parcel, parcel_id, parcel)
+    await tracking_cache.invalidate(db_parcel.tracking_number)
+    index_parcels([db_parcel])
+    await event_bus.publish(event_for_parcel("parcel_updated", db_parcel))
     return db_parcel
\ No newline at end of file
@@ -1,7 +1,10 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from datetime import datetime
 
+# Heaviest single parcel accepted; also keeps inf/nan out of pricing
+MAX_PARCEL_WEIGHT_KG = 1000.0
+
 class UserCreate(BaseModel):
     name: str
     email: str
@@ -31,7 +34,12 @@ class ParcelCreate(BaseModel):
     receiver_name: str
     receiver_phone: str
     receiver_address: str
-    weight_kg: float
+    # Positive weights are checked by validate_parcel (400 with its own message)
+    weight_kg: float = Field(le=MAX_PARCEL_WEIGHT_KG, allow_inf_nan=False)
+    service_level: str = "standard"
+
+class BulkParcelRow(ParcelCreate):
+    customer_email: str
 
 class AssignRiderRequest(BaseModel):
     parcel_id: int
@@ -40,6 +48,37 @@ class AssignRiderRequest(BaseModel):
 class UpdateStatusRequest(BaseModel):
     new_status: str
 
+class StatusUpdateOperation(BaseModel):
+    operation_id: str
+    parcel_id: int
+    status: str
+    client_timestamp: datetime
+
+class BatchStatusUpdateRequest(BaseModel):
+    updates: List[StatusUpdateOperation]
+
+class StatusHistoryOut(BaseModel):
+    status: str
+    updated_at: Optional[datetime] = None
+
+class ParcelTimelineOut(BaseModel):
+    parcel_id: int
+    tracking_number: str
+    current_status: str
+    history: List[StatusHistoryOut]
+
+class TimelineRequest(BaseModel):
+    parcel_ids: List[int]
+
+class QuoteItem(BaseModel):
+    weight_kg: float = Field(gt=0, le=MAX_PARCEL_WEIGHT_KG, allow_inf_nan=False)
+    receiver_address: str
+    service_level: str = "standard"
+
+class QuoteRequest(BaseModel):
+    items: List[QuoteItem]
+    origin_city: Optional[str] = None
+
 class ParcelOut(BaseModel):
     parcel_id: int
     tracking_number: str
@@ -50,6 +89,7 @@ class ParcelOut(BaseModel):
     weight_kg: float
     current_status: str
     charges: float
+    service_level: Optional[str] = None
     booked_at: Optional[datetime] = None
     
     class Config:
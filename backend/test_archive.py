@@ -0,0 +1,104 @@
+"""Tests for archiving old final parcels out of the hot tables"""
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import MetaData, create_engine, func, insert, inspect, select, text
+from migrations.versions import never_reuse_parcel_ids
+from models.sql_models import Base, DeliveryAssignment, Parcel, ParcelArchive, StatusHistory, StatusHistoryArchive, User
+from utils.archive import archive_parcels
+from utils.stats import reconcile
+from utils.tracking import new_tracking_number
+
+
+def add_parcel(db, sender, status, days_ago, rider=None):
+    booked_at = datetime.utcnow() - timedelta(days=days_ago)
+    parcel = Parcel(
+        tracking_number=new_tracking_number(), sender_id=sender.user_id, receiver_name="R",
+        receiver_phone="0300", receiver_address="House 1, Lahore", weight_kg=1, charges=150.0,
+        current_status=status, booked_at=booked_at,
+    )
+    db.add(parcel)
+    db.flush()
+    db.add(StatusHistory(parcel_id=parcel.parcel_id, status="booked", updated_at=booked_at))
+    if status != "booked":
+        db.add(StatusHistory(parcel_id=parcel.parcel_id, status=status, updated_at=booked_at + timedelta(days=1)))
+    if rider is not None:
+        db.add(DeliveryAssignment(parcel_id=parcel.parcel_id, rider_id=rider.user_id, status=status))
+    return parcel
+
+
+def test_archives_old_final_parcels_and_tracking_falls_back(db, client, auth_header):
+    customer = User(name="Customer", email="customer@test.com", password_hash="x", role="customer")
+    staff = User(name="Staff", email="staff@test.com", password_hash="x", role="staff")
+    rider = User(name="Rider", email="rider@test.com", password_hash="x", role="rider")
+    db.add_all([customer, staff, rider])
+    db.flush()
+    old_delivered = add_parcel(db, customer, "delivered", 200, rider)
+    old_cancelled = add_parcel(db, customer, "cancelled", 150)
+    old_in_transit = add_parcel(db, customer, "in transit", 200, rider)
+    recent_delivered = add_parcel(db, customer, "delivered", 10, rider)
+    db.commit()
+    reconcile(db)
+    stats = client.get("/staff/stats", headers=auth_header(staff)).json()
+
+    assert archive_parcels(db, older_than_days=90, batch_size=1) == 2
+
+    assert set(db.scalars(select(Parcel.parcel_id))) == {old_in_transit.parcel_id, recent_delivered.parcel_id}
+    assert db.scalar(select(func.count()).select_from(StatusHistory)) == 4
+    assert db.scalar(select(func.count()).select_from(DeliveryAssignment)) == 2
+    archived = db.get(ParcelArchive, old_delivered.parcel_id)
+    assert archived.rider_id == rider.user_id and archived.tracking_number == old_delivered.tracking_number
+    assert db.scalar(select(func.count()).select_from(StatusHistoryArchive)) == 4
+
+    # The counters count archived parcels too, so nothing drifted
+    assert reconcile(db) == 0
+    assert client.get("/staff/stats", headers=auth_header(staff)).json() == stats
+
+    res = client.get(f"/customer/parcel/track/{old_delivered.tracking_number}")
+    assert res.status_code == 200
+    assert res.json()["current_status"] == "delivered"
+    assert res.json()["parcel_id"] == old_delivered.parcel_id
+
+    timeline = client.get(f"/customer/parcel/{old_delivered.tracking_number}/timeline").json()
+    assert [entry["status"] for entry in timeline["history"]] == ["booked", "delivered"]
+    res = client.get(f"/customer/parcel/{old_cancelled.tracking_number}/timeline", params={"stream": "true"})
+    assert [json.loads(line)["status"] for line in res.text.splitlines()] == ["booked", "cancelled"]
+
+    assert archive_parcels(db, older_than_days=90) == 0
+
+
+def test_archived_parcel_ids_are_never_handed_out_again(db):
+    customer = User(name="Customer", email="customer@test.com", password_hash="x", role="customer")
+    db.add(customer)
+    db.flush()
+    add_parcel(db, customer, "delivered", 200)
+    newest = add_parcel(db, customer, "delivered", 200)
+    db.commit()
+
+    assert archive_parcels(db, older_than_days=90) == 2
+    assert db.get(ParcelArchive, newest.parcel_id) is not None
+    assert add_parcel(db, customer, "booked", 0).parcel_id > newest.parcel_id
+
+
+def test_migration_rebuilds_existing_sqlite_parcels_with_autoincrement(tmp_path):
+    legacy = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    metadata = MetaData()
+    for table in Base.metadata.sorted_tables:
+        table.to_metadata(metadata)
+    # As created before parcels declared sqlite_autoincrement
+    metadata.tables["parcels"].dialect_options["sqlite"]["autoincrement"] = False
+    metadata.create_all(legacy)
+    columns = dict(receiver_name="R", receiver_phone="0300", receiver_address="Lahore", weight_kg=1, booked_at=datetime(2025, 1, 1))
+    with legacy.begin() as conn:
+        conn.execute(insert(Parcel), [dict(columns, parcel_id=i, tracking_number=f"TRK{i}") for i in (1, 2)])
+        # Parcel 3 was the newest and has been archived
+        conn.execute(insert(ParcelArchive).values(dict(columns, parcel_id=3, tracking_number="TRK3")))
+
+    with legacy.begin() as conn:
+        never_reuse_parcel_ids(conn)
+
+    with legacy.begin() as conn:
+        assert "AUTOINCREMENT" in conn.scalar(text("SELECT sql FROM sqlite_master WHERE name = 'parcels'"))
+        assert {i["name"] for i in inspect(conn).get_indexes("parcels")} >= {index.name for index in Parcel.__table__.indexes}
+        assert list(conn.scalars(select(Parcel.tracking_number).order_by(Parcel.parcel_id))) == ["TRK1", "TRK2"]
+        assert conn.execute(insert(Parcel).values(dict(columns, tracking_number="TRK4"))).inserted_primary_key[0] == 4
+    legacy.dispose()
@@ -0,0 +1,77 @@
+"""Tests for the verified-token cache behind every authenticated request"""
+import asyncio
+import time
+import pytest
+from fastapi import HTTPException
+from models.sql_models import User
+from utils import auth
+from utils.auth import Principal, PrincipalCache, authenticate, invalidate_user, principal_cache
+from utils.security import create_access_token
+
+
+def principal(user_id, expires_in=3600):
+    now = time.time()
+    return Principal(user_id=user_id, email=f"user{user_id}@test.com", role="customer", issued_at=now, expires_at=now + expires_in)
+
+
+def test_cache_hit_skips_verification_and_user_lookup(db, client, monkeypatch):
+    customer = User(name="Customer", email="customer@test.com", password_hash="x", role="customer")
+    db.add(customer)
+    db.commit()
+    # Issued before user_id was embedded, so the first request looks the user up
+    token = create_access_token({"sub": customer.email, "role": "customer"})
+    lookups = []
+    lookup = auth._user_id_for_email
+    monkeypatch.setattr(auth, "_user_id_for_email", lambda db, email: lookups.append(email) or lookup(db, email))
+
+    assert asyncio.run(authenticate(token, db)).user_id == customer.user_id
+    assert lookups == [customer.email]
+
+    monkeypatch.setattr(auth, "decode_token", lambda token: pytest.fail("cached token was verified again"))
+    assert asyncio.run(authenticate(token, db)).user_id == customer.user_id
+    assert lookups == [customer.email]
+
+
+def test_entries_expire_and_least_recently_used_are_evicted(monkeypatch):
+    cache = PrincipalCache(max_size=2, ttl_seconds=60)
+    cache.put("a", principal(1))
+    cache.put("b", principal(2))
+    assert cache.get("a").user_id == 1  # "b" is now least recently used
+    cache.put("c", principal(3))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+    # Whichever comes first: the cache TTL or the token's own exp
+    cache.put("short", principal(4, expires_in=10))
+    now = time.time()
+    monkeypatch.setattr(auth.time, "time", lambda: now + 30)
+    assert cache.get("short") is None
+    assert cache.get("c") is not None
+    monkeypatch.setattr(auth.time, "time", lambda: now + 61)
+    assert cache.get("c") is None
+
+
+def test_invalidate_user_revokes_tokens_issued_before_the_cutoff(db, client, auth_header, monkeypatch):
+    customer = User(name="Customer", email="customer@test.com", password_hash="x", role="customer")
+    db.add(customer)
+    db.commit()
+    headers = auth_header(customer)
+    token = headers["Authorization"].split()[1]
+    assert client.get("/customer/my-parcels", headers=headers).status_code == 200
+    assert principal_cache.get(token) is not None
+
+    invalidate_user(customer.user_id)
+    assert principal_cache.get(token) is None
+    assert client.get("/customer/my-parcels", headers=headers).status_code == 401
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(authenticate(token, db))
+    assert raised.value.status_code == 401
+
+    # Tokens issued after the cutoff (e.g. on the next login) work again
+    now = time.time()
+    monkeypatch.setattr(auth.time, "time", lambda: now - 5)
+    invalidate_user(customer.user_id)
+    monkeypatch.undo()
+    assert asyncio.run(authenticate(create_access_token(
+        {"sub": customer.email, "role": "customer", "user_id": customer.user_id}
+    ), db)).user_id == customer.user_id
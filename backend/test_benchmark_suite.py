@@ -0,0 +1,46 @@
+"""Tests for the benchmark suite's seeding, metrics parsing and baseline comparison"""
+import os
+from sqlalchemy import func, select
+from benchmarks.suite import compare, parse_query_counts, seed
+from models.sql_models import Parcel, TrackingWorkerLease
+from utils import tracking
+
+
+def endpoint(**overrides):
+    return dict(
+        {"requests": 100, "throughput": 50.0, "p50_ms": 10.0, "p95_ms": 20.0, "p99_ms": 30.0,
+         "errors": 0, "rejected": 0, "queries_per_request": 2.0},
+        **overrides,
+    )
+
+
+def test_parse_query_counts_reads_the_request_metrics(client):
+    client.get("/customer/parcel/track/TRK20250101093000")
+    counts = parse_query_counts(client.get("/metrics").text)
+    queries, requests = counts["GET /customer/parcel/track/{tracking_number}"]
+    assert requests >= 1 and queries >= 1
+
+
+def test_compare_flags_only_real_regressions():
+    baseline = {"endpoints": {"GET /a": endpoint(), "GET /b": endpoint()}}
+    within = {"endpoints": {"GET /a": endpoint(throughput=45.0, p95_ms=23.0), "GET /b": endpoint(rejected=5)}}
+    assert compare(baseline, within, 0.2) == []
+
+    worse = {"endpoints": {"GET /a": endpoint(throughput=30.0, p95_ms=40.0, queries_per_request=12.0, errors=2)}}
+    problems = compare(baseline, worse, 0.2)
+    assert len(problems) == 5
+    assert any("GET /b: not exercised" in p for p in problems)
+
+
+def test_seed_leases_a_worker_id_without_a_configured_one(db, monkeypatch):
+    # The lease is written on its own connection, so it must not wait on the seed transaction
+    monkeypatch.delenv("TRACKING_WORKER_ID")
+    monkeypatch.setattr(tracking, "_generator", None)
+    monkeypatch.setattr(tracking, "_lease", None)
+    try:
+        data = seed(os.environ["DATABASE_URL"], customers=2, riders=1, parcels=5, assigned=0.5, history=1)
+        assert len(data["tracking_numbers"]) == 5
+        assert db.scalar(select(func.count()).select_from(TrackingWorkerLease)) == 1
+    finally:
+        tracking.release_worker_lease()
+    assert db.scalar(select(func.count()).select_from(Parcel)) == 5
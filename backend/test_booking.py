@@ -0,0 +1,56 @@
+"""Tests for the shared booking service"""
+from models.sql_models import User, Parcel, StatusHistory
+from utils.stats import reconcile
+
+PARCEL = {"receiver_name": "R", "receiver_phone": "0300", "receiver_address": "House 1, Lahore", "weight_kg": 2}
+
+
+def seed(db):
+    customer = User(name="Cust", email="cust@test.com", password_hash="x", role="customer")
+    staff = User(name="Staff", email="staff@test.com", password_hash="x", role="staff")
+    db.add_all([customer, staff])
+    db.commit()
+    return customer, staff
+
+
+def test_customer_booking_writes_parcel_history_and_counters_in_one_transaction(db, client, auth_header, count_queries):
+    customer, _ = seed(db)
+    count_queries.clear()
+    res = client.post("/customer/parcel/create", json=PARCEL, headers=auth_header(customer))
+    assert res.status_code == 200
+    body = res.json()
+    assert body["sender_id"] == customer.user_id and body["current_status"] == "booked"
+
+    # parcel INSERT ... RETURNING, history INSERT, counter upsert; no re-reads
+    writes = [s for s in count_queries if not s.lstrip().upper().startswith(("BEGIN", "COMMIT"))]
+    assert len(writes) == 3
+    assert all(s.lstrip().upper().startswith("INSERT") for s in writes)
+
+    history = db.query(StatusHistory).filter(StatusHistory.parcel_id == body["parcel_id"]).one()
+    parcel = db.get(Parcel, body["parcel_id"])
+    assert history.status == "booked" and history.updated_at == parcel.booked_at
+    assert reconcile(db) == 0
+
+
+def test_staff_booking_by_email(db, client, auth_header):
+    customer, staff = seed(db)
+    res = client.post(
+        "/staff/parcel/create", params={"customer_email": "nobody@test.com"}, json=PARCEL, headers=auth_header(staff)
+    )
+    assert res.status_code == 404
+    assert db.query(Parcel).count() == 0 and db.query(StatusHistory).count() == 0
+
+    res = client.post(
+        "/staff/parcel/create", params={"customer_email": customer.email}, json=PARCEL, headers=auth_header(staff)
+    )
+    assert res.status_code == 200
+    assert res.json()["sender_id"] == customer.user_id
+
+    manifest = [dict(PARCEL, customer_email=customer.email, receiver_name=f"R{i}") for i in range(3)]
+    res = client.post("/staff/parcels/bulk", json=manifest, headers=auth_header(staff))
+    results = res.json()["results"]
+    assert [r["status"] for r in results] == ["created"] * 3
+    for r, row in zip(results, manifest):
+        assert db.get(Parcel, r["parcel_id"]).receiver_name == row["receiver_name"]
+    assert db.query(StatusHistory).count() == 4
+    assert reconcile(db) == 0
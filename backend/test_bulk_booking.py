@@ -0,0 +1,99 @@
+"""Tests for the staff bulk manifest import"""
+from sqlalchemy import func, select
+from models.sql_models import Parcel, ParcelStat, StatusHistory, User
+from utils import booking
+from utils.stats import reconcile
+
+ROWS = [
+    {"customer_email": "cust@test.com", "receiver_name": "A", "receiver_phone": "0300", "receiver_address": "House 1, Lahore", "weight_kg": 1},
+    {"customer_email": "cust@test.com", "receiver_name": "B", "receiver_phone": "0301", "receiver_address": "House 2, Karachi", "weight_kg": 2.5},
+]
+CSV = (
+    "customer_email,receiver_name,receiver_phone,receiver_address,weight_kg\n"
+    "cust@test.com,A,0300,\"House 1, Lahore\",1\n"
+    "cust@test.com,B,0301,\"House 2, Karachi\",2.5\n"
+)
+
+
+def seed(db):
+    customer = User(name="Cust", email="cust@test.com", password_hash="x", role="customer")
+    staff = User(name="Staff", email="staff@test.com", password_hash="x", role="staff")
+    db.add_all([customer, staff])
+    db.commit()
+    return customer, staff
+
+
+def count(db, model):
+    return db.scalar(select(func.count()).select_from(model))
+
+
+def summary(body):
+    return [(r["row"], r["status"], r.get("charges")) for r in body["results"]]
+
+
+def test_csv_and_json_manifests_book_the_same_parcels(db, client, auth_header):
+    customer, staff = seed(db)
+    from_json = client.post("/staff/parcels/bulk", json=ROWS, headers=auth_header(staff)).json()
+    from_csv = client.post(
+        "/staff/parcels/bulk", files={"file": ("manifest.csv", CSV, "text/csv")}, headers=auth_header(staff)
+    ).json()
+
+    assert from_json["created"] == from_csv["created"] == 2
+    assert summary(from_json) == summary(from_csv)
+    assert all(r["sender_id"] == customer.user_id for r in from_json["results"] + from_csv["results"])
+    assert count(db, Parcel) == 4 and count(db, StatusHistory) == 4
+    assert reconcile(db) == 0
+
+
+def test_dry_run_commits_nothing(db, client, auth_header):
+    _, staff = seed(db)
+    res = client.post("/staff/parcels/bulk", params={"dry_run": "true"}, json=ROWS, headers=auth_header(staff))
+    body = res.json()
+    assert body["dry_run"] and body["created"] == 0 and body["failed"] == 0
+    assert [r["status"] for r in body["results"]] == ["valid", "valid"]
+    assert all(r["charges"] > 0 for r in body["results"])
+    assert count(db, Parcel) == count(db, StatusHistory) == count(db, ParcelStat) == 0
+
+
+def test_invalid_rows_are_reported_per_row(db, client, auth_header):
+    _, staff = seed(db)
+    rows = [
+        ROWS[0],
+        dict(ROWS[1], weight_kg=0),
+        dict(ROWS[1], customer_email="nobody@test.com"),
+        {k: v for k, v in ROWS[1].items() if k != "receiver_phone"},
+    ]
+    body = client.post("/staff/parcels/bulk", json=rows, headers=auth_header(staff)).json()
+
+    assert body["created"] == 1 and body["failed"] == 3
+    results = body["results"]
+    assert [r["status"] for r in results] == ["created", "invalid", "invalid", "invalid"]
+    assert results[1]["errors"] == ["Weight must be greater than 0"]
+    assert results[2]["errors"] == ["Customer with email 'nobody@test.com' not found"]
+    assert results[3]["errors"][0].startswith("receiver_phone")
+    assert count(db, Parcel) == 1
+
+
+def test_a_failing_chunk_writes_nothing_and_later_chunks_still_commit(db, client, auth_header, monkeypatch):
+    _, staff = seed(db)
+    monkeypatch.setattr("routers.staff.BULK_CHUNK_SIZE", 2)
+    values = booking.booking_values
+    issued = []
+
+    def clashing_values(parcel, card=None, booked_at=None):
+        row = values(parcel, card, booked_at)
+        issued.append(row["tracking_number"])
+        if len(issued) == 4:
+            # Row 4 reuses row 3's number: the second chunk fails on the unique constraint
+            row["tracking_number"] = issued[2]
+        return row
+
+    monkeypatch.setattr("routers.staff.booking_values", clashing_values)
+    rows = [dict(ROWS[0], receiver_name=f"R{i}") for i in range(5)]
+    body = client.post("/staff/parcels/bulk", json=rows, headers=auth_header(staff)).json()
+
+    assert [r["status"] for r in body["results"]] == ["created", "created", "failed", "failed", "created"]
+    # Neither row 3's parcel, nor its history, nor its counters survived the rollback
+    assert sorted(db.scalars(select(Parcel.receiver_name))) == ["R0", "R1", "R4"]
+    assert count(db, StatusHistory) == 3
+    assert reconcile(db) == 0
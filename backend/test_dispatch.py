@@ -0,0 +1,67 @@
+"""Tests for automatic rider assignment"""
+from types import SimpleNamespace
+from models.sql_models import User, Parcel, DeliveryAssignment
+from utils.dispatch import RiderLoad, address_area, plan_assignments
+from utils.stats import reconcile
+
+
+def test_plan_balances_riders_and_keeps_areas_together():
+    parcels = [
+        SimpleNamespace(parcel_id=i, weight_kg=1.0, receiver_address=f"House {i}, {area}, Lahore")
+        for i, area in enumerate(["Gulberg"] * 4 + ["Model Town"] * 4)
+    ]
+    riders = {1: RiderLoad(1), 2: RiderLoad(2, parcels=2, weight_kg=2.0)}
+
+    plan = plan_assignments(parcels, riders, max_parcels=10, max_weight_kg=100)
+
+    assert len(plan) == 8
+    assert riders[1].parcels == riders[2].parcels == 5
+    by_area = {}
+    for parcel, rider_id in plan:
+        by_area.setdefault(address_area(parcel.receiver_address), set()).add(rider_id)
+    # Each area is split across at most two riders
+    assert all(len(rider_ids) <= 2 for rider_ids in by_area.values())
+
+
+def test_plan_respects_capacity():
+    parcels = [SimpleNamespace(parcel_id=i, weight_kg=w, receiver_address="A, B") for i, w in enumerate([30, 30, 50, 200])]
+    riders = {1: RiderLoad(1)}
+
+    plan = plan_assignments(parcels, riders, max_parcels=10, max_weight_kg=100)
+
+    assert [parcel.parcel_id for parcel, _ in plan] == [0, 1]
+    assert riders[1].weight_kg == 60
+
+
+def test_auto_assign_endpoint_writes_assignments(db, client, auth_header):
+    staff = User(name="Staff", email="staff@test.com", password_hash="x", role="staff")
+    customer = User(name="Customer", email="customer@test.com", password_hash="x", role="customer")
+    riders = [User(name=f"Rider {i}", email=f"rider{i}@test.com", password_hash="x", role="rider") for i in range(3)]
+    db.add_all([staff, customer, *riders])
+    db.flush()
+    for i in range(9):
+        db.add(Parcel(
+            tracking_number=f"TRK{i:06d}",
+            sender_id=customer.user_id,
+            receiver_name="Receiver",
+            receiver_phone="0300",
+            receiver_address=f"House {i}, Area {i % 3}, Lahore",
+            weight_kg=1.0,
+            current_status="delivered" if i == 0 else "booked",
+        ))
+    db.commit()
+    reconcile(db)
+
+    dry = client.post("/staff/auto-assign", params={"dry_run": "true"}, headers=auth_header(staff))
+    assert dry.status_code == 200
+    assert dry.json()["assigned"] == 8
+    assert db.query(DeliveryAssignment).count() == 0
+
+    res = client.post("/staff/auto-assign", headers=auth_header(staff))
+    assert res.json()["assigned"] == 8
+    assert sorted(r["parcels"] for r in res.json()["riders"]) == [2, 3, 3]
+    assert db.query(DeliveryAssignment).count() == 8
+    assert reconcile(db) == 0
+
+    again = client.post("/staff/auto-assign", headers=auth_header(staff))
+    assert again.json()["assigned"] == 0
@@ -0,0 +1,99 @@
+"""Tests for parcel event fan-out"""
+import asyncio
+from models.sql_models import Parcel, User
+from routers.events import EVENTS_MAX_STREAMS_PER_CLIENT, _event_stream, open_streams
+from test_tracking_cache import seed_parcel
+from utils.auth import authenticate_ticket
+from utils.events import event_bus
+from utils.tracking import new_tracking_number
+
+
+def test_status_change_reaches_parcel_customer_and_staff_topics(db, client, auth_header):
+    parcel, rider = seed_parcel(db)
+    watchers = [
+        event_bus.subscribe(f"parcel:{parcel.tracking_number}"),
+        event_bus.subscribe(f"customer:{parcel.sender_id}"),
+        event_bus.subscribe("staff"),
+    ]
+    other_customer = event_bus.subscribe(f"customer:{parcel.sender_id + 100}")
+    try:
+        res = client.put(
+            f"/rider/update-status/{parcel.parcel_id}",
+            params={"new_status": "packed"},
+            headers=auth_header(rider),
+        )
+        assert res.status_code == 200
+
+        for watcher in watchers:
+            event = watcher.queue.get_nowait()
+            assert event["event"] == "status_changed"
+            assert event["tracking_number"] == parcel.tracking_number
+            assert event["current_status"] == "packed"
+        assert other_customer.queue.empty()
+    finally:
+        for subscription in watchers + [other_customer]:
+            subscription.close()
+    assert event_bus.subscriber_count() == 0
+
+
+def test_stream_rejects_wrong_role(db, client, auth_header):
+    _, rider = seed_parcel(db)
+    res = client.get("/events/staff", headers=auth_header(rider))
+    assert res.status_code == 403
+
+
+def test_streams_take_short_lived_tickets_not_access_tokens(db, client, auth_header):
+    _, rider = seed_parcel(db)
+    staff = User(name="Staff", email="staff@test.com", password_hash="x", role="staff")
+    db.add(staff)
+    db.commit()
+
+    # Access tokens in the URL would end up in access logs
+    token = auth_header(staff)["Authorization"].split()[1]
+    assert client.get("/events/staff", params={"token": token}).status_code == 401
+    assert client.get("/events/staff", params={"ticket": token}).status_code == 401
+
+    ticket = client.post("/events/ticket", headers=auth_header(staff)).json()["ticket"]
+    assert authenticate_ticket(ticket).user_id == staff.user_id
+    # A ticket is not an access token
+    assert client.get("/staff/stats", headers={"Authorization": f"Bearer {ticket}"}).status_code == 401
+
+    rider_ticket = client.post("/events/ticket", headers=auth_header(rider)).json()["ticket"]
+    assert client.get("/events/staff", params={"ticket": rider_ticket}).status_code == 403
+
+
+def test_parcel_stream_needs_an_existing_parcel_and_is_capped(db, client, monkeypatch):
+    seed_parcel(db)
+    assert client.get(f"/events/parcel/{new_tracking_number()}").status_code == 404
+
+    parcel = db.query(Parcel).first()
+    # Capped per parcel, not per client address (one address behind a proxy)
+    monkeypatch.setitem(open_streams, f"parcel:{parcel.tracking_number}", EVENTS_MAX_STREAMS_PER_CLIENT)
+    res = client.get(f"/events/parcel/{parcel.tracking_number}")
+    assert res.status_code == 429
+    assert "retry-after" in res.headers
+    assert event_bus.subscriber_count() == 0
+
+
+def test_staff_streams_are_capped_per_user(db, client, auth_header, monkeypatch):
+    staff = User(name="Staff", email="staff@test.com", password_hash="x", role="staff")
+    db.add(staff)
+    db.commit()
+    monkeypatch.setitem(open_streams, f"user:{staff.user_id}", EVENTS_MAX_STREAMS_PER_CLIENT)
+    assert client.get("/events/staff", headers=auth_header(staff)).status_code == 429
+
+
+def test_streams_hold_a_slot_and_subscription_only_while_sending():
+    async def scenario():
+        unsent = _event_stream("user:1", "staff")
+        # A response whose body never starts (e.g. the client left first) holds nothing
+        assert "user:1" not in open_streams and event_bus.subscriber_count() == 0
+        del unsent
+
+        body = _event_stream("user:1", "staff").body_iterator
+        assert await body.__anext__() == "retry: 5000\n\n"
+        assert open_streams["user:1"] == 1 and event_bus.subscriber_count() == 1
+        await body.aclose()
+        assert "user:1" not in open_streams and event_bus.subscriber_count() == 0
+
+    asyncio.run(scenario())
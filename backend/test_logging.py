@@ -0,0 +1,46 @@
+"""Tests for log redaction, auth log rate limiting and decode_token's logging"""
+import logging
+from config.log_config import RateLimitFilter, RedactingFormatter, TEXT_FORMAT
+from utils.security import create_access_token, decode_token
+
+
+def record(msg, *args, level=logging.INFO):
+    return logging.LogRecord("utils.auth", level, __file__, 1, msg, args, None)
+
+
+def test_tokens_and_secrets_are_redacted():
+    token = create_access_token({"sub": "a@test.com", "role": "customer", "user_id": 1})
+    formatter = RedactingFormatter(TEXT_FORMAT)
+    line = formatter.format(record("Rejected %s with header Bearer %s, password=hunter2", token, "abc.def"))
+    assert token not in line
+    assert "hunter2" not in line and "abc.def" not in line
+    assert "[redacted token]" in line
+
+
+def test_rate_limit_drops_excess_and_reports_the_count():
+    limiter = RateLimitFilter(rate=0, burst=3)
+    allowed = [limiter.filter(record("Invalid token: %s", i)) for i in range(10)]
+    assert allowed == [True] * 3 + [False] * 7
+
+    limiter.tokens = 1
+    late = record("Invalid token: %s", "x")
+    assert limiter.filter(late)
+    assert "7 similar records suppressed" in late.getMessage()
+
+
+def test_rate_limit_never_drops_warnings_or_errors():
+    limiter = RateLimitFilter(rate=0, burst=1)
+    assert limiter.filter(record("Invalid token: %s", 1))
+    assert not limiter.filter(record("Invalid token: %s", 2))
+    for level in (logging.WARNING, logging.ERROR, logging.CRITICAL):
+        assert all(limiter.filter(record("SECRET_KEY is not configured!", level=level)) for _ in range(50))
+
+
+def test_decode_token_does_not_log_token_material(caplog):
+    token = create_access_token({"sub": "secret-user@test.com", "role": "staff", "user_id": 5})
+    with caplog.at_level(logging.DEBUG, logger="utils.security"):
+        assert decode_token(token)["user_id"] == 5
+        assert decode_token(token[:-4] + "abcd") is None
+    logged = " ".join(r.getMessage() for r in caplog.records)
+    assert token[:20] not in logged
+    assert "secret-user" not in logged
@@ -0,0 +1,72 @@
+"""Tests for request metrics and the /metrics endpoint"""
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from sqlalchemy import create_engine, exc
+from sqlalchemy.pool import QueuePool
+from config.database import _timed_pool, pool_metrics
+from models.sql_models import User, Parcel
+from utils import request_metrics
+from utils.metrics import PoolMetrics
+
+
+def seed(db):
+    customer = User(name="Cust", email="cust@test.com", password_hash="x", role="customer")
+    db.add(customer)
+    db.flush()
+    db.add(Parcel(
+        tracking_number="TRK20250101093000", sender_id=customer.user_id, receiver_name="R",
+        receiver_phone="0300", receiver_address="Lahore", weight_kg=1.0, current_status="booked",
+    ))
+    db.commit()
+    return customer
+
+
+def test_metrics_labels_by_route_and_counts_queries(db, client, auth_header):
+    customer = seed(db)
+    res = client.get("/customer/parcel/TRK20250101093000/timeline", headers=auth_header(customer))
+    assert res.status_code == 200
+    client.get("/no/such/path")
+
+    body = client.get("/metrics").text
+    route = 'method="GET",route="/customer/parcel/{tracking_number}/timeline"'
+    assert f'http_request_duration_seconds_count{{{route},status="200"}}' in body
+    assert 'route="unmatched",status="404"' in body
+    queries = next(line for line in body.splitlines() if line.startswith(f"http_request_db_queries_sum{{{route}}}"))
+    assert float(queries.split()[-1]) >= 1
+    assert "db_pool_checkout_wait_seconds_count" in body
+    assert "/metrics" not in body
+
+
+def test_repeated_statements_are_flagged_and_slow_requests_traced(db, client, auth_header, monkeypatch):
+    customer = seed(db)
+    monkeypatch.setattr(request_metrics, "N_PLUS_ONE_THRESHOLD", 0)
+    monkeypatch.setattr(request_metrics, "SLOW_REQUEST_SECONDS", 0)
+    monkeypatch.setattr(request_metrics, "SLOW_REQUEST_SAMPLE_RATE", 1.0)
+    request_metrics.slow_traces.clear()
+
+    client.get("/customer/parcel/TRK20250101093000/timeline", headers=auth_header(customer))
+
+    body = client.get("/metrics").text
+    assert 'http_request_n_plus_one_total{method="GET",route="/customer/parcel/{tracking_number}/timeline"}' in body
+    trace = client.get("/health/slow-requests").json()[0]
+    assert trace["route"] == "/customer/parcel/{tracking_number}/timeline"
+    assert trace["queries"] == len(trace["statements"]) >= 1
+    assert "parcels" in trace["statements"][0]["sql"]
+
+
+def test_pool_timeouts_are_counted_exactly_across_threads(tmp_path):
+
+    metrics = PoolMetrics()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: metrics.record_timeout(), range(20000)))
+    assert metrics.timeouts == 20000
+
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}", poolclass=_timed_pool(QueuePool), pool_size=1, max_overflow=0, pool_timeout=0.01
+    )
+    before = pool_metrics.timeouts
+    with engine.connect():
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+    assert pool_metrics.timeouts == before + 1
+    engine.dispose()
@@ -0,0 +1,74 @@
+"""Tests for the bounded bcrypt worker pool"""
+import asyncio
+import threading
+import pytest
+from fastapi import HTTPException
+from passlib.hash import bcrypt
+from models.sql_models import User
+from utils.password_pool import PasswordHasher, password_hasher
+from utils.security import BCRYPT_ROUNDS, verify_password
+
+
+def test_full_queue_answers_429_with_retry_after():
+    hasher = PasswordHasher(workers=0, queue_size=1)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.create_task(hasher._run(release.wait))
+        while hasher.pending == 0:
+            await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as raised:
+            await hasher.hash("secret")
+        release.set()
+        await running
+        return raised.value
+
+    rejected = asyncio.run(scenario())
+    assert rejected.status_code == 429
+    assert rejected.headers == {"Retry-After": "1"}
+    assert hasher.pending == 0
+
+
+def test_login_backs_off_when_the_pool_is_full(db, client, monkeypatch):
+    db.add(User(name="Customer", email="customer@test.com", password_hash=bcrypt.using(rounds=4).hash("secret"), role="customer"))
+    db.commit()
+    monkeypatch.setattr(password_hasher, "queue_size", 0)
+    res = client.post("/auth/login", json={"email": "customer@test.com", "password": "secret"})
+    assert res.status_code == 429
+    assert res.headers["retry-after"] == "1"
+
+
+def test_login_rehashes_passwords_stored_at_an_old_cost(db, client):
+    old_hash = bcrypt.using(rounds=4).hash("secret")
+    customer = User(name="Customer", email="customer@test.com", password_hash=old_hash, role="customer")
+    db.add(customer)
+    db.commit()
+
+    res = client.post("/auth/login", json={"email": "customer@test.com", "password": "secret"})
+    assert res.status_code == 200
+    db.expire_all()
+    new_hash = db.get(User, customer.user_id).password_hash
+    assert new_hash != old_hash
+    assert new_hash.startswith(f"$2b${BCRYPT_ROUNDS:02d}$")
+    assert verify_password("secret", new_hash)
+
+    # Current-cost hashes are left alone
+    client.post("/auth/login", json={"email": "customer@test.com", "password": "secret"})
+    db.expire_all()
+    assert db.get(User, customer.user_id).password_hash == new_hash
+
+
+def test_process_pool_hashes_and_verifies():
+    # conftest runs the app with PASSWORD_HASH_WORKERS=0; exercise the real pool here
+    hasher = PasswordHasher(workers=1, queue_size=2)
+    try:
+        async def scenario():
+            hashed = await hasher.hash("secret")
+            return hashed, await hasher.verify_and_update("secret", hashed), await hasher.verify_and_update("wrong", hashed)
+
+        hashed, (valid, new_hash), (invalid, _) = asyncio.run(scenario())
+    finally:
+        hasher.shutdown()
+    assert hashed.startswith(f"$2b${BCRYPT_ROUNDS:02d}$")
+    assert valid and new_hash is None
+    assert not invalid
@@ -0,0 +1,67 @@
+"""Tests for rate card pricing"""
+import json
+import os
+from models.sql_models import User
+from utils.pricing import PRICING_RATE_CARD_PATH, RateCardStore, rate_cards
+
+
+def test_slabs_zones_and_services():
+    card = rate_cards.current()
+    # Inside the origin city, on a slab boundary and just above it
+    assert card.quote(0.5, "House 1, Gulberg, Lahore") == 120
+    assert card.quote(0.6, "House 1, Gulberg, Lahore") == 150
+    # Past the largest slab every started kg is charged
+    assert card.quote(12.2, "House 1, Quetta") == 1200 + 3 * 110
+    assert card.quote(1, "House 1, Karachi", "express") == 280 * 1.5
+    # Unknown cities fall back to the default region
+    assert card.quote(1, "House 1, Nowhere") == card.quote(1, "House 1, Multan")
+
+
+def test_changed_rate_card_is_reloaded(tmp_path):
+    with open(PRICING_RATE_CARD_PATH) as f:
+        raw = json.load(f)
+    path = tmp_path / "rate_card.json"
+    path.write_text(json.dumps(raw))
+    store = RateCardStore(str(path), reload_seconds=0)
+    assert store.current().quote(1, "Lahore") == 150
+
+    raw["version"] = "next"
+    raw["zones"]["same_city"]["slabs"][1][1] = 175
+    path.write_text(json.dumps(raw))
+    os.utime(path, (1, 1))
+    assert store.current().quote(1, "Lahore") == 175
+
+    # A broken card keeps the last good one in service
+    path.write_text("{not json")
+    os.utime(path, (2, 2))
+    assert store.current().version == "next"
+
+
+def test_quote_endpoint_prices_many_parcels(db, client, auth_header):
+    customer = User(name="Customer", email="customer@test.com", password_hash="x", role="customer")
+    db.add(customer)
+    db.commit()
+
+    items = [{"weight_kg": 1, "receiver_address": "House 1, Karachi"}] * 3000
+    items.append({"weight_kg": 1, "receiver_address": "House 1, Karachi", "service_level": "teleport"})
+    res = client.post("/customer/quote", json={"items": items}, headers=auth_header(customer))
+    assert res.status_code == 200
+    quotes = res.json()["quotes"]
+    assert len(quotes) == 3001
+    assert quotes[0] == {"charges": 280.0}
+    assert quotes[-1]["charges"] is None
+
+
+def test_non_finite_zero_and_oversized_weights_are_rejected(db, client, auth_header):
+    customer = User(name="Customer", email="customer@test.com", password_hash="x", role="customer")
+    db.add(customer)
+    db.commit()
+    headers = dict(auth_header(customer), **{"Content-Type": "application/json"})
+
+    # Python's JSON parser accepts these tokens, so they used to reach math.ceil
+    for weight in ("Infinity", "-Infinity", "NaN", "1e309", "0", "-1", "1000.5"):
+        body = '{"items": [{"weight_kg": %s, "receiver_address": "House 1, Karachi"}]}' % weight
+        assert client.post("/customer/quote", content=body, headers=headers).status_code == 422, weight
+
+    parcel = '{"receiver_name": "R", "receiver_phone": "0300", "receiver_address": "Lahore", "weight_kg": Infinity}'
+    assert client.post("/customer/parcel/create", content=parcel, headers=headers).status_code == 422
@@ -0,0 +1,85 @@
+"""Tests for read-replica routing, using a second SQLite database as the replica"""
+import asyncio
+import os
+import tempfile
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from config import database
+from models.sql_models import Base, User, Parcel
+
+PARCEL = {"receiver_name": "R", "receiver_phone": "0300", "receiver_address": "House 1, Lahore", "weight_kg": 1}
+
+
+def add_parcel(session, sender_id, tracking_number):
+    session.add(Parcel(
+        tracking_number=tracking_number, sender_id=sender_id, receiver_name="R", receiver_phone="0300",
+        receiver_address="Lahore", weight_kg=1.0, current_status="booked",
+    ))
+    session.commit()
+
+
+@pytest.fixture
+def replica(db, monkeypatch):
+    """A replica database holding the same users but a different parcel, so
+    responses show which database served them"""
+    url = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "replica.db")
+    setup = create_engine(url)
+    Base.metadata.create_all(bind=setup)
+    with Session(setup) as replica_db:
+        for user in db.query(User).all():
+            replica_db.add(User(user_id=user.user_id, name=user.name, email=user.email, password_hash="x", role=user.role))
+        replica_db.commit()
+        add_parcel(replica_db, db.query(User).filter(User.role == "customer").one().user_id, "TRK20250101000002")
+    setup.dispose()
+
+    replica_set = database.ReplicaSet([database._replica_engine(url)])
+    monkeypatch.setattr(database, "replicas", replica_set)
+    yield replica_set
+    for r in replica_set.replicas:
+        if hasattr(r.engine, "sync_engine"):
+            r.engine.sync_engine.dispose()
+        else:
+            r.engine.dispose()
+
+
+@pytest.fixture
+def users(db):
+    customer = User(name="Cust", email="cust@test.com", password_hash="x", role="customer")
+    staff = User(name="Staff", email="staff@test.com", password_hash="x", role="staff")
+    db.add_all([customer, staff])
+    db.commit()
+    add_parcel(db, customer.user_id, "TRK20250101000001")
+    return customer, staff
+
+
+def tracking_numbers(res):
+    assert res.status_code == 200
+    return sorted(p["tracking_number"] for p in res.json())
+
+
+def test_reads_go_to_the_replica_until_the_user_writes(users, replica, client, auth_header):
+    customer, staff = users
+    assert tracking_numbers(client.get("/customer/my-parcels", headers=auth_header(customer))) == ["TRK20250101000002"]
+
+    created = client.post("/customer/parcel/create", json=PARCEL, headers=auth_header(customer)).json()
+    # Read-your-writes: the customer now reads from the primary
+    assert tracking_numbers(client.get("/customer/my-parcels", headers=auth_header(customer))) == sorted(
+        ["TRK20250101000001", created["tracking_number"]]
+    )
+    # Other users keep reading from the replica
+    assert tracking_numbers(client.get("/staff/parcels", headers=auth_header(staff))) == ["TRK20250101000002"]
+
+
+def test_unhealthy_replicas_fail_over_to_the_primary(users, client, auth_header, monkeypatch):
+    customer, _ = users
+    missing = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "missing", "replica.db")
+    replica_set = database.ReplicaSet([database._replica_engine(missing)])
+    monkeypatch.setattr(database, "replicas", replica_set)
+
+    if database.DB_ASYNC:
+        asyncio.run(replica_set.check_async())
+    else:
+        replica_set.check()
+    assert not replica_set.replicas[0].healthy
+    assert tracking_numbers(client.get("/customer/my-parcels", headers=auth_header(customer))) == ["TRK20250101000001"]
@@ -0,0 +1,56 @@
+"""Tests for POST /rider/update-status/batch"""
+from datetime import datetime, timedelta
+from test_tracking_cache import seed_parcel
+from utils.stats import reconcile
+import time
+
+
+def scan(operation_id, parcel_id, status, ms_ago):
+    return {
+        "operation_id": operation_id,
+        "parcel_id": parcel_id,
+        "status": status,
+        "client_timestamp": (datetime.utcnow() - timedelta(milliseconds=ms_ago)).isoformat(),
+    }
+
+
+def test_batch_applies_in_client_order_and_is_idempotent(db, client, auth_header):
+    parcel, rider = seed_parcel(db)
+    reconcile(db)  # seed_parcel bypasses the counters
+    time.sleep(0.05)  # the scans happen after booking
+    batch = {"updates": [
+        # Sent out of order; the latest client timestamp decides the status
+        scan("op-2", parcel.parcel_id, "in transit", 10),
+        scan("op-1", parcel.parcel_id, "packed", 20),
+        scan("op-3", 999999, "packed", 0),
+    ]}
+
+    res = client.post("/rider/update-status/batch", json=batch, headers=auth_header(rider))
+    assert res.status_code == 200
+    assert [r["result"] for r in res.json()["results"]] == ["applied", "applied", "rejected"]
+
+    retry = client.post("/rider/update-status/batch", json=batch, headers=auth_header(rider))
+    assert [r["result"] for r in retry.json()["results"]] == ["duplicate", "duplicate", "rejected"]
+
+    timeline = client.get(f"/customer/parcel/{parcel.tracking_number}/timeline").json()
+    assert timeline["current_status"] == "in transit"
+    assert [entry["status"] for entry in timeline["history"]] == ["booked", "packed", "in transit"]
+    assert reconcile(db) == 0
+
+
+def test_stale_scan_does_not_overwrite_newer_status(db, client, auth_header):
+    parcel, rider = seed_parcel(db)
+    for status in ("packed", "in transit", "out for delivery"):
+        res = client.put(
+            f"/rider/update-status/{parcel.parcel_id}",
+            params={"new_status": status},
+            headers=auth_header(rider),
+        )
+        assert res.status_code == 200
+
+    late = {"updates": [scan("late-1", parcel.parcel_id, "in transit", 60 * 1000)]}
+    res = client.post("/rider/update-status/batch", json=late, headers=auth_header(rider))
+    assert res.json()["results"][0]["result"] == "conflict"
+
+    timeline = client.get(f"/customer/parcel/{parcel.tracking_number}/timeline").json()
+    assert timeline["current_status"] == "out for delivery"
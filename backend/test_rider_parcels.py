@@ -0,0 +1,58 @@
+"""Regression tests for GET /rider/my-parcels"""
+from models.sql_models import User, Parcel, DeliveryAssignment
+
+
+def seed_rider(db):
+    rider = User(name="Rider", email="rider@test.com", password_hash="x", role="rider")
+    customer = User(name="Customer", email="customer@test.com", password_hash="x", role="customer")
+    db.add_all([rider, customer])
+    db.commit()
+    return rider, customer
+
+
+def assign_stops(db, rider, customer, start, count):
+    for i in range(start, start + count):
+        parcel = Parcel(
+            tracking_number=f"TRK{i:06d}",
+            sender_id=customer.user_id,
+            receiver_name=f"Receiver {i}",
+            receiver_phone="0300",
+            receiver_address="Street",
+            weight_kg=1.0,
+            current_status="delivered" if i % 4 == 0 else "out for delivery",
+        )
+        db.add(parcel)
+        db.flush()
+        db.add(DeliveryAssignment(parcel_id=parcel.parcel_id, rider_id=rider.user_id))
+    db.commit()
+
+
+def test_query_count_is_constant(db, client, auth_header, count_queries):
+    rider, customer = seed_rider(db)
+    headers = auth_header(rider)
+
+    assign_stops(db, rider, customer, 0, 5)
+    count_queries.clear()
+    res = client.get("/rider/my-parcels", headers=headers)
+    assert res.status_code == 200
+    assert len(res.json()) == 5
+    few_stops = len(count_queries)
+
+    assign_stops(db, rider, customer, 5, 195)
+    count_queries.clear()
+    res = client.get("/rider/my-parcels", headers=headers)
+    assert res.status_code == 200
+    assert len(res.json()) == 200
+    assert len(count_queries) == few_stops
+
+
+def test_status_filter_and_route_order(db, client, auth_header):
+    rider, customer = seed_rider(db)
+    assign_stops(db, rider, customer, 0, 8)
+
+    res = client.get("/rider/my-parcels", params={"current_status": "delivered"}, headers=auth_header(rider))
+    assert res.status_code == 200
+    assert [p["tracking_number"] for p in res.json()] == ["TRK000000", "TRK000004"]
+
+    res = client.get("/rider/my-parcels", headers=auth_header(rider))
+    assert [p["tracking_number"] for p in res.json()] == [f"TRK{i:06d}" for i in range(8)]
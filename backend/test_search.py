@@ -0,0 +1,95 @@
+"""Tests for parcel search"""
+from models.sql_models import User, Parcel
+
+
+def seed(db):
+    alice = User(name="Alice", email="alice@test.com", password_hash="x", role="customer")
+    bob = User(name="Bob", email="bob@test.com", password_hash="x", role="customer")
+    staff = User(name="Staff", email="staff@test.com", password_hash="x", role="staff")
+    db.add_all([alice, bob, staff])
+    db.flush()
+    rows = [
+        (alice, "TRKAAA0000000001", "Ayesha Khan", "0300-1111111", "12 Mall Road, Lahore"),
+        (alice, "TRKAAA0000000002", "Bilal Ahmed", "0321-2222222", "5 Khan Street, Karachi"),
+        (bob, "TRKBBB0000000003", "Khan Traders", "0333-3333333", "Blue Area, Islamabad"),
+    ]
+    for sender, tracking_number, name, phone, address in rows:
+        db.add(Parcel(
+            tracking_number=tracking_number, sender_id=sender.user_id, receiver_name=name,
+            receiver_phone=phone, receiver_address=address, weight_kg=1.0, current_status="booked",
+        ))
+    db.commit()
+    return alice, staff
+
+
+def test_staff_search_ranks_and_pages(db, client, auth_header):
+    _, staff = seed(db)
+
+    res = client.get("/staff/parcels/search", params={"q": "khan"}, headers=auth_header(staff))
+    assert res.status_code == 200
+    # Name matches outrank address matches; among names, prefix matches win
+    assert [p["receiver_name"] for p in res.json()] == ["Khan Traders", "Ayesha Khan", "Bilal Ahmed"]
+
+    page = client.get("/staff/parcels/search", params={"q": "khan", "limit": 2}, headers=auth_header(staff))
+    assert len(page.json()) == 2
+    assert page.headers["X-Next-Offset"] == "2"
+
+    by_phone = client.get("/staff/parcels/search", params={"q": "03001111111"}, headers=auth_header(staff))
+    assert [p["tracking_number"] for p in by_phone.json()] == ["TRKAAA0000000001"]
+
+    by_prefix = client.get("/staff/parcels/search", params={"q": "trkbbb"}, headers=auth_header(staff))
+    assert [p["tracking_number"] for p in by_prefix.json()] == ["TRKBBB0000000003"]
+
+
+def test_customer_search_only_sees_own_parcels_and_new_bookings(db, client, auth_header):
+    alice, _ = seed(db)
+
+    res = client.get("/customer/parcels/search", params={"q": "khan"}, headers=auth_header(alice))
+    assert {p["receiver_name"] for p in res.json()} == {"Ayesha Khan", "Bilal Ahmed"}
+
+    client.post(
+        "/customer/parcel/create",
+        json={"receiver_name": "Zara Khan", "receiver_phone": "0345", "receiver_address": "Gulberg, Lahore", "weight_kg": 1},
+        headers=auth_header(alice),
+    )
+    res = client.get("/customer/parcels/search", params={"q": "zara"}, headers=auth_header(alice))
+    assert [p["receiver_name"] for p in res.json()] == ["Zara Khan"]
+
+
+def test_like_wildcards_in_the_query_match_literally():
+    from sqlalchemy.dialects import postgresql
+    from utils.search import _postgres_search, escape_like
+
+    assert escape_like("50%_off\\") == "50\\%\\_off\\\\"
+
+    class Capture:
+        def scalars(self, query):
+            self.compiled = query.compile(dialect=postgresql.dialect())
+            return []
+
+    db = Capture()
+    _postgres_search(db, "%", None, 20, 0)
+    params = set(db.compiled.params.values())
+    assert {"\\%%", "%\\%%"} <= params  # a literal "%", as prefix and as substring
+    assert "%%" not in params and "%%%" not in params
+    assert str(db.compiled).count("ESCAPE") == 3
+
+
+def test_parcels_booked_during_the_index_load_are_kept(db):
+    from utils.search import InvertedIndex
+
+    seed(db)
+    index = InvertedIndex()
+    late = Parcel(parcel_id=99, tracking_number="TRKLATE000000099", sender_id=1, receiver_name="Zara Late",
+                  receiver_phone="0345-9999999", receiver_address="Gulberg, Lahore")
+
+    class Racing:
+        """The booking commits after the load's SELECT has taken its snapshot"""
+        def execute(self, statement):
+            result = db.execute(statement).all()
+            index.update([late])
+            return result
+
+    index.load(Racing())
+    assert index.search(db, "zara", None, 20, 0) == [99]
+    assert len(index.docs) == 4
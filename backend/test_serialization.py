@@ -0,0 +1,38 @@
+"""Tests for the fast parcel list serialization path"""
+import json
+from models.sql_models import User, Parcel
+from schemas.pydantic_schemas import ParcelOut
+from utils.serialization import dumps
+
+
+def test_fast_lists_match_parcel_out(db, client, auth_header):
+    customer = User(name="Cust", email="cust@test.com", password_hash="x", role="customer")
+    staff = User(name="Staff", email="staff@test.com", password_hash="x", role="staff")
+    db.add_all([customer, staff])
+    db.flush()
+    for i in range(3):
+        db.add(Parcel(
+            tracking_number=f"TRKSERIAL{i:07d}", sender_id=customer.user_id, receiver_name="Räceiver \"Q\"",
+            receiver_phone="0300", receiver_address="Lahore", weight_kg=1.25 * (i + 1),
+            current_status="booked", charges=62.5 * (i + 1),
+        ))
+    db.commit()
+    expected = {
+        p.parcel_id: json.loads(ParcelOut.model_validate(p).model_dump_json())
+        for p in db.query(Parcel).all()
+    }
+
+    mine = client.get("/customer/my-parcels", headers=auth_header(customer))
+    assert mine.headers["content-type"] == "application/json"
+    assert {p["parcel_id"]: p for p in mine.json()} == expected
+
+    page = client.get("/staff/parcels", params={"limit": 2}, headers=auth_header(staff))
+    assert [p["parcel_id"] for p in page.json()] == sorted(expected, reverse=True)[:2]
+    assert page.json() == [expected[p["parcel_id"]] for p in page.json()]
+    assert "X-Next-Cursor" in page.headers
+
+
+def test_dumps_formats_datetimes_like_isoformat():
+    from datetime import datetime
+    when = datetime(2025, 1, 2, 3, 4, 5, 600)
+    assert json.loads(dumps({"at": when})) == {"at": when.isoformat()}
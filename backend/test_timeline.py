@@ -0,0 +1,81 @@
+"""Tests for the status timeline read path"""
+from models.sql_models import User
+from test_tracking_cache import seed_parcel
+
+
+def test_timeline_follows_status_updates(db, client, auth_header):
+    parcel, rider = seed_parcel(db)
+    for status in ("packed", "in transit"):
+        res = client.put(
+            f"/rider/update-status/{parcel.parcel_id}",
+            params={"new_status": status},
+            headers=auth_header(rider),
+        )
+        assert res.status_code == 200
+
+    res = client.get(f"/customer/parcel/{parcel.tracking_number}/timeline")
+    assert res.status_code == 200
+    body = res.json()
+    assert body["current_status"] == "in transit"
+    assert [entry["status"] for entry in body["history"]] == ["booked", "packed", "in transit"]
+
+    streamed = client.get(f"/customer/parcel/{parcel.tracking_number}/timeline", params={"stream": "true"})
+    assert len(streamed.text.splitlines()) == 3
+
+
+def test_update_status_rejects_unassigned_rider_without_writing(db, client, auth_header):
+    parcel, _ = seed_parcel(db)
+    stranger = User(name="Other", email="other@test.com", password_hash="x", role="rider")
+    db.add(stranger)
+    db.commit()
+
+    res = client.put(
+        f"/rider/update-status/{parcel.parcel_id}",
+        params={"new_status": "packed"},
+        headers=auth_header(stranger),
+    )
+    assert res.status_code == 403
+    res = client.put("/rider/update-status/999999", params={"new_status": "packed"}, headers=auth_header(stranger))
+    assert res.status_code == 404
+
+    body = client.get(f"/customer/parcel/{parcel.tracking_number}/timeline").json()
+    assert body["current_status"] == "booked"
+    assert [entry["status"] for entry in body["history"]] == ["booked"]
+
+
+def test_bulk_timelines_use_one_query(db, client, auth_header, count_queries):
+    parcel, _ = seed_parcel(db)
+    staff = User(name="Staff", email="staff@test.com", password_hash="x", role="staff")
+    db.add(staff)
+    db.commit()
+
+    count_queries.clear()
+    res = client.post(
+        "/staff/parcels/timelines",
+        json={"parcel_ids": [parcel.parcel_id, 424242]},
+        headers=auth_header(staff),
+    )
+    assert res.status_code == 200
+    assert len(count_queries) == 1
+    timelines = res.json()
+    assert [t["parcel_id"] for t in timelines] == [parcel.parcel_id, 424242]
+    assert [entry["status"] for entry in timelines[0]["history"]] == ["booked"]
+    assert timelines[1]["history"] == []
+
+
+def test_illegal_or_stale_transitions_conflict(db, client, auth_header):
+    parcel, rider = seed_parcel(db)
+    url = f"/rider/update-status/{parcel.parcel_id}"
+
+    # Skipping ahead in the lifecycle is not allowed
+    assert client.put(url, params={"new_status": "delivered"}, headers=auth_header(rider)).status_code == 409
+
+    res = client.put(url, params={"new_status": "packed", "expected_status": "booked"}, headers=auth_header(rider))
+    assert res.status_code == 200
+    # A second writer that still believes the parcel is booked loses the race
+    res = client.put(url, params={"new_status": "cancelled", "expected_status": "booked"}, headers=auth_header(rider))
+    assert res.status_code == 409
+
+    body = client.get(f"/customer/parcel/{parcel.tracking_number}/timeline").json()
+    assert body["current_status"] == "packed"
+    assert [entry["status"] for entry in body["history"]] == ["booked", "packed"]
@@ -0,0 +1,82 @@
+"""Tests for tracking number generation and the tracking endpoint's pre-check"""
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import update
+from config.database import engine
+from models.sql_models import TrackingWorkerLease
+from utils.tracking import TrackingNumberGenerator, WorkerLease, is_valid_tracking_number
+import utils.tracking as tracking
+
+
+def test_ids_are_unique_and_time_ordered():
+    generator = TrackingNumberGenerator(worker_id=7)
+    ids = [generator.next() for _ in range(20000)]
+    assert len(set(ids)) == len(ids)
+    assert ids == sorted(ids)
+    assert all(is_valid_tracking_number(i) for i in ids)
+
+
+def test_workers_never_collide():
+    first = TrackingNumberGenerator(worker_id=1)
+    second = TrackingNumberGenerator(worker_id=2)
+    ids = [g.next() for _ in range(5000) for g in (first, second)]
+    assert len(set(ids)) == len(ids)
+
+
+def test_mistyped_numbers_fail_the_check_character():
+    number = TrackingNumberGenerator(worker_id=3).next()
+    body = number[3:]
+    swapped = "TRK" + body[1] + body[0] + body[2:]
+    changed = "TRK" + ("1" if body[0] != "1" else "2") + body[1:]
+    assert not is_valid_tracking_number(swapped)
+    assert not is_valid_tracking_number(changed)
+    assert not is_valid_tracking_number("TRK123")
+    # Numbers issued before the generator existed still validate
+    assert is_valid_tracking_number("TRK20250101093000")
+
+
+def test_track_rejects_invalid_numbers_without_querying(db, client, count_queries):
+    count_queries.clear()
+    res = client.get("/customer/parcel/track/TRKNOTAREALNUMBER")
+    assert res.status_code == 404
+    assert count_queries == []
+
+
+def test_workers_lease_distinct_ids_and_lose_expired_ones(db, monkeypatch):
+    monkeypatch.setattr("utils.tracking.WORKER_BITS", 1)  # only ids 0 and 1
+    first, second, third = WorkerLease(engine), WorkerLease(engine), WorkerLease(engine)
+    assert {first.acquire(), second.acquire()} == {0, 1}
+    with pytest.raises(RuntimeError):
+        third.acquire()
+
+    # The first worker stalls past its lease and another process takes the id over
+    db.execute(
+        update(TrackingWorkerLease)
+        .where(TrackingWorkerLease.worker_id == first.worker_id)
+        .values(expires_at=datetime.utcnow() - timedelta(seconds=1))
+    )
+    db.commit()
+    assert third.acquire() == first.worker_id
+    # The stalled worker must not go on issuing numbers with the id it lost
+    with pytest.raises(RuntimeError):
+        first.renew()
+
+    assert second.renew() == second.worker_id
+    released = second.worker_id
+    second.release()
+    assert db.get(TrackingWorkerLease, released) is None
+
+
+def test_generator_is_created_per_process(monkeypatch):
+    monkeypatch.setenv("TRACKING_WORKER_ID", "5")
+    monkeypatch.setattr(tracking, "_generator", None)
+    inherited = tracking.tracking_generator()
+    inherited.pid = -1  # as if forked from a preloaded master
+    assert tracking.tracking_generator() is not inherited
+    assert tracking.tracking_generator().worker_id == 5
+
+    monkeypatch.setenv("TRACKING_WORKER_ID", "4096")
+    monkeypatch.setattr(tracking, "_generator", None)
+    with pytest.raises(ValueError):
+        tracking.tracking_generator()
+    monkeypatch.setattr(tracking, "_generator", None)
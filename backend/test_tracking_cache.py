@@ -0,0 +1,104 @@
+"""Tests for the public tracking read-through cache"""
+import asyncio
+from models.sql_models import User, Parcel, DeliveryAssignment, StatusHistory
+from utils.cache import InMemorySharedCache
+from utils.tracking import new_tracking_number
+from utils.tracking_cache import entry_for_parcel, tracking_cache
+
+
+def seed_parcel(db):
+    customer = User(name="Customer", email="customer@test.com", password_hash="x", role="customer")
+    rider = User(name="Rider", email="rider@test.com", password_hash="x", role="rider")
+    db.add_all([customer, rider])
+    db.flush()
+    parcel = Parcel(
+        tracking_number=new_tracking_number(),
+        sender_id=customer.user_id,
+        receiver_name="Receiver",
+        receiver_phone="0300",
+        receiver_address="Street",
+        weight_kg=1.0,
+        current_status="booked",
+    )
+    db.add(parcel)
+    db.flush()
+    db.add(StatusHistory(parcel_id=parcel.parcel_id, status="booked"))
+    db.add(DeliveryAssignment(parcel_id=parcel.parcel_id, rider_id=rider.user_id))
+    db.commit()
+    return parcel, rider
+
+
+def test_repeat_lookups_are_served_from_cache(db, client, count_queries):
+    parcel, _ = seed_parcel(db)
+    url = f"/customer/parcel/track/{parcel.tracking_number}"
+
+    count_queries.clear()
+    first = client.get(url)
+    assert first.status_code == 200
+    assert first.json()["current_status"] == "booked"
+    assert len(count_queries) == 1
+
+    count_queries.clear()
+    second = client.get(url)
+    assert second.json() == first.json()
+    assert count_queries == []
+
+
+def test_conditional_requests_get_304(db, client):
+    parcel, _ = seed_parcel(db)
+    url = f"/customer/parcel/track/{parcel.tracking_number}"
+    res = client.get(url)
+    etag, last_modified = res.headers["etag"], res.headers["last-modified"]
+
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(url, headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get(url, headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_status_update_invalidates_entry(db, client, auth_header):
+    parcel, rider = seed_parcel(db)
+    url = f"/customer/parcel/track/{parcel.tracking_number}"
+    etag = client.get(url).headers["etag"]
+
+    res = client.put(f"/rider/update-status/{parcel.parcel_id}", params={"new_status": "packed"}, headers=auth_header(rider))
+    assert res.status_code == 200
+
+    res = client.get(url, headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.json()["current_status"] == "packed"
+
+
+def test_shared_tier_serves_other_workers(db, client, count_queries):
+    parcel, _ = seed_parcel(db)
+    url = f"/customer/parcel/track/{parcel.tracking_number}"
+    tracking_cache.shared = InMemorySharedCache()
+    try:
+        client.get(url)
+        # Simulate another worker: empty local tier, warm shared tier
+        tracking_cache.local.clear()
+        count_queries.clear()
+        res = client.get(url)
+        assert res.status_code == 200
+        assert count_queries == []
+    finally:
+        tracking_cache.shared = None
+
+
+def test_read_racing_an_invalidation_is_not_cached(db, client, auth_header):
+    parcel, rider = seed_parcel(db)
+    url = f"/customer/parcel/track/{parcel.tracking_number}"
+    tracking_cache.shared = InMemorySharedCache()
+    try:
+        # A reader misses and reads the row before the rider's update commits...
+        version = asyncio.run(tracking_cache.version(parcel.tracking_number))
+        stale = entry_for_parcel(parcel)
+        res = client.put(f"/rider/update-status/{parcel.parcel_id}", params={"new_status": "packed"}, headers=auth_header(rider))
+        assert res.status_code == 200
+        # ...and primes the cache only after the writer invalidated it
+        asyncio.run(tracking_cache.prime(parcel.tracking_number, stale, version=version))
+
+        assert client.get(url).json()["current_status"] == "packed"
+        tracking_cache.local.clear()
+        assert client.get(url).json()["current_status"] == "packed"
+    finally:
+        tracking_cache.shared = None
@@ -0,0 +1,136 @@
+"""
+Archival of old final parcels.
+
+Parcels that reached a final status (delivered, returned, cancelled) stop
+changing, yet they pile up in `parcels` and `status_history` and every
+index on them. `archive_parcels()` moves those booked and last updated
+more than ARCHIVE_AFTER_DAYS ago, with their history, into
+`parcels_archive` and `status_history_archive`, oldest first and
+ARCHIVE_BATCH_SIZE parcels per transaction. The hot tables then only hold
+recent and in-flight parcels, so their indexes stay small enough to stay
+in memory.
+
+The parcel's delivery assignment is dropped and its rider kept on the
+archived row, so the dashboard counters (see utils/stats.py) keep
+counting archived parcels and archiving never moves them. Tracking
+lookups fall back to the archive tables (TRACKING_TABLES), so a customer
+can still track an archived parcel by its number.
+
+It runs every ARCHIVE_INTERVAL_SECONDS in the background (see `main.py`)
+or once with `python -m utils.archive`.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, insert, literal, select, text
+from starlette.concurrency import run_in_threadpool
+from dotenv import load_dotenv
+from config.database import SessionLocal
+from models.sql_models import DeliveryAssignment, Parcel, ParcelArchive, StatusHistory, StatusHistoryArchive
+from utils.search import unindex_parcels
+import asyncio
+import logging
+import os
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+# 0 disables the scheduled archival
+ARCHIVE_INTERVAL_SECONDS = int(os.getenv("ARCHIVE_INTERVAL_SECONDS", "0"))
+
+ARCHIVED_STATUSES = ("delivered", "returned", "cancelled")
+
+# Arbitrary key so only one worker archives at a time on Postgres
+ARCHIVE_LOCK_ID = 72610404
+
+# (parcels, history) models, in the order tracking lookups try them
+LIVE_TABLES = (Parcel, StatusHistory)
+ARCHIVE_TABLES = (ParcelArchive, StatusHistoryArchive)
+TRACKING_TABLES = (LIVE_TABLES, ARCHIVE_TABLES)
+
+PARCEL_COLUMNS = [c.name for c in ParcelArchive.__table__.columns if c.name in Parcel.__table__.columns]
+HISTORY_COLUMNS = ["history_id", "parcel_id", "status", "updated_at", "operation_id"]
+
+def archivable(cutoff: datetime):
+    """SELECT of the parcel ids due for archiving, oldest first"""
+    last_changed_at = (
+        select(func.max(StatusHistory.updated_at))
+        .where(StatusHistory.parcel_id == Parcel.parcel_id)
+        .scalar_subquery()
+    )
+    return (
+        select(Parcel.parcel_id)
+        .where(
+            Parcel.current_status.in_(ARCHIVED_STATUSES),
+            Parcel.booked_at < cutoff,
+            func.coalesce(last_changed_at, Parcel.booked_at) < cutoff,
+        )
+        .order_by(Parcel.booked_at, Parcel.parcel_id)
+    )
+
+def archive_batch(db, cutoff: datetime, batch_size: int = ARCHIVE_BATCH_SIZE):
+    """Move up to `batch_size` parcels in one transaction; returns their ids"""
+    if db.get_bind().dialect.name == "postgresql":
+        if not db.scalar(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": ARCHIVE_LOCK_ID}):
+            return []
+    # Row locks wait out a staff edit still in flight on a final parcel
+    parcel_ids = list(db.scalars(archivable(cutoff).limit(batch_size).with_for_update(of=Parcel)))
+    if not parcel_ids:
+        db.rollback()
+        return []
+
+    rider_id = (
+        select(DeliveryAssignment.rider_id)
+        .where(DeliveryAssignment.parcel_id == Parcel.parcel_id)
+        .scalar_subquery()
+    )
+    db.execute(insert(ParcelArchive).from_select(
+        [*PARCEL_COLUMNS, "rider_id", "archived_at"],
+        select(*(getattr(Parcel, name) for name in PARCEL_COLUMNS), rider_id, literal(datetime.utcnow()))
+        .where(Parcel.parcel_id.in_(parcel_ids)),
+    ))
+    db.execute(insert(StatusHistoryArchive).from_select(
+        HISTORY_COLUMNS,
+        select(*(getattr(StatusHistory, name) for name in HISTORY_COLUMNS))
+        .where(StatusHistory.parcel_id.in_(parcel_ids))
+        .order_by(StatusHistory.parcel_id, StatusHistory.updated_at, StatusHistory.history_id),
+    ))
+    db.execute(delete(StatusHistory).where(StatusHistory.parcel_id.in_(parcel_ids)))
+    db.execute(delete(DeliveryAssignment).where(DeliveryAssignment.parcel_id.in_(parcel_ids)))
+    db.execute(delete(Parcel).where(Parcel.parcel_id.in_(parcel_ids)))
+    db.commit()
+    return parcel_ids
+
+def archive_parcels(db, older_than_days: int = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Archive every parcel due, batch by batch; returns how many were moved"""
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    archived = 0
+    while True:
+        parcel_ids = archive_batch(db, cutoff, batch_size)
+        if not parcel_ids:
+            return archived
+        unindex_parcels(parcel_ids)
+        archived += len(parcel_ids)
+        if len(parcel_ids) < batch_size:
+            return archived
+
+async def archive_job(interval_seconds: int):
+    """Run archive_parcels every `interval_seconds` until cancelled"""
+    def run():
+        with SessionLocal() as db:
+            return archive_parcels(db)
+
+    while True:
+        try:
+            archived = await run_in_threadpool(run)
+            if archived:
+                logger.info(f"Archived {archived} parcels older than {ARCHIVE_AFTER_DAYS} days")
+        except Exception:
+            logger.exception("Parcel archival failed")
+        await asyncio.sleep(interval_seconds)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    with SessionLocal() as db:
+        logger.info(f"Archived {archive_parcels(db)} parcels older than {ARCHIVE_AFTER_DAYS} days")
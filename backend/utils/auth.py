@@ -0,0 +1,188 @@
+"""
+Shared authentication dependencies.
+
+Verified tokens are cached in-process (token -> Principal) so repeat
+requests skip both JWT signature verification and the user lookup.
+Entries expire with the token's `exp` (or the cache TTL, whichever is
+sooner) and the cache is bounded in size with LRU eviction.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+from fastapi import Depends, HTTPException
+from fastapi.security import OAuth2PasswordBearer
+from dotenv import load_dotenv
+from typing import Optional
+from models.sql_models import User
+from utils.security import STREAM_TICKET_PURPOSE, decode_token
+from config.database import current_user_id, get_db, run_db
+import os
+import threading
+import time
+import logging
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
+
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL_SECONDS = int(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "300"))
+
+@dataclass(frozen=True)
+class Principal:
+    user_id: int
+    email: str
+    role: str
+    issued_at: float
+    expires_at: float
+
+class PrincipalCache:
+    """Thread-safe LRU of verified token -> Principal with per-entry expiry"""
+
+    def __init__(self, max_size: int = PRINCIPAL_CACHE_SIZE, ttl_seconds: int = PRINCIPAL_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # token -> (principal, valid_until)
+        self._revoked_before = {}  # user_id -> tokens issued earlier are rejected
+        self._lock = threading.Lock()
+
+    def get(self, token: str):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            principal, valid_until = entry
+            if valid_until <= now:
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return principal
+
+    def put(self, token: str, principal: Principal):
+        valid_until = min(principal.expires_at, time.time() + self.ttl_seconds)
+        with self._lock:
+            self._entries[token] = (principal, valid_until)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def is_revoked(self, principal: Principal) -> bool:
+        with self._lock:
+            return principal.issued_at <= self._revoked_before.get(principal.user_id, -1)
+
+    def invalidate_user(self, user_id: int):
+        """Drop cached tokens for a user and reject any token issued before now"""
+        with self._lock:
+            # Token `iat` has one-second resolution, so tokens from this same
+            # second are rejected too
+            self._revoked_before[user_id] = int(time.time())
+            for token in [t for t, (p, _) in self._entries.items() if p.user_id == user_id]:
+                del self._entries[token]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._revoked_before.clear()
+
+principal_cache = PrincipalCache()
+
+def invalidate_user(user_id: int):
+    """Call after changing a user's role (or deleting them) so old tokens stop working"""
+    principal_cache.invalidate_user(user_id)
+
+def _user_id_for_email(db, email: str):
+    db_user = db.query(User.user_id).filter(User.email == email).first()
+    return db_user.user_id if db_user else None
+
+async def authenticate(token: str, db=None) -> Principal:
+    """Resolve a bearer token to a Principal, from the cache when possible.
+
+    `db` is only needed for tokens issued before user_id was embedded.
+    """
+    principal = principal_cache.get(token)
+    if principal is not None:
+        current_user_id.set(principal.user_id)
+        return principal
+
+    payload = decode_token(token)
+    # Stream tickets only open event streams (see authenticate_ticket)
+    if not payload or payload.get("purpose"):
+        raise HTTPException(401, "Invalid or expired token")
+
+    user_id = payload.get("user_id")
+    if user_id is None:
+        # Tokens issued before user_id was embedded: resolve it once, then cache
+        if db is None:
+            raise HTTPException(401, "Token is outdated, please log in again")
+        user_id = await run_db(db, _user_id_for_email, payload.get("sub"))
+        if user_id is None:
+            raise HTTPException(404, "User not found")
+
+    principal = Principal(
+        user_id=user_id,
+        email=payload.get("sub"),
+        role=payload.get("role"),
+        issued_at=payload.get("iat", 0),
+        expires_at=payload.get("exp", 0),
+    )
+    if principal_cache.is_revoked(principal):
+        raise HTTPException(401, "Invalid or expired token")
+    principal_cache.put(token, principal)
+    current_user_id.set(principal.user_id)
+    return principal
+
+async def get_principal(token: str = Depends(oauth2_scheme), db=Depends(get_db)) -> Principal:
+    return await authenticate(token, db)
+
+def _check_role(principal: Principal, role: str) -> Principal:
+    if principal.role != role:
+        logger.info("Access denied - user role is '%s', expected '%s'", principal.role, role)
+        raise HTTPException(403, f"{role.capitalize()} access required. Your role: {principal.role}")
+    return principal
+
+def require_role(role: str):
+    """Build a dependency that only lets `role` through"""
+    async def dependency(principal: Principal = Depends(get_principal)) -> Principal:
+        return _check_role(principal, role)
+    return dependency
+
+def authenticate_ticket(ticket: str) -> Principal:
+    """Resolve an event stream ticket (see POST /events/ticket) to a Principal"""
+    payload = decode_token(ticket)
+    if not payload or payload.get("purpose") != STREAM_TICKET_PURPOSE or payload.get("user_id") is None:
+        raise HTTPException(401, "Invalid or expired stream ticket")
+    principal = Principal(
+        user_id=payload["user_id"],
+        email=payload.get("sub"),
+        role=payload.get("role"),
+        issued_at=payload.get("iat", 0),
+        expires_at=payload.get("exp", 0),
+    )
+    if principal_cache.is_revoked(principal):
+        raise HTTPException(401, "Invalid or expired stream ticket")
+    return principal
+
+def require_stream_role(role: str):
+    """Like require_role, for long-lived event streams.
+
+    Browsers' EventSource cannot send an Authorization header, so a
+    short-lived stream ticket may come as `?ticket=` instead. Access tokens
+    are never accepted in the URL, where access logs would keep them. No
+    database session is held for the life of the stream.
+    """
+    async def dependency(
+        header_token: Optional[str] = Depends(optional_oauth2_scheme),
+        ticket: Optional[str] = None,
+    ) -> Principal:
+        if header_token:
+            return _check_role(await authenticate(header_token), role)
+        if ticket:
+            return _check_role(authenticate_ticket(ticket), role)
+        raise HTTPException(401, "Not authenticated")
+    return dependency
+
+require_customer = require_role("customer")
+require_staff = require_role("staff")
+require_rider = require_role("rider")
@@ -0,0 +1,97 @@
+"""
+Parcel booking shared by the customer, staff and bulk endpoints.
+
+A booking is written in one transaction with one commit: the parcel
+INSERT ... RETURNING hands back every ParcelOut column (so nothing is
+re-read or refreshed), the initial "booked" history row is inserted with
+the parcel's own booked_at, and the dashboard counters are adjusted.
+When booking on behalf of a customer by email, the customer lookup is
+folded into the parcel insert as INSERT ... SELECT, so an unknown email
+simply inserts nothing.
+
+Callers validate the parcel first (see `validate_parcel`) and do the
+after-commit work (tracking cache, search index, events) themselves.
+"""
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy import insert, literal, select
+from models.sql_models import Parcel, StatusHistory, User
+from utils.pricing import rate_cards
+from utils.serialization import PARCEL_OUT_COLUMNS
+from utils.stats import StatsDelta
+from utils.tracking import new_tracking_number
+
+def validate_parcel(parcel):
+    # Validate weight
+    if parcel.weight_kg <= 0:
+        raise HTTPException(400, "Weight must be greater than 0")
+
+    # Validate receiver details
+    if not parcel.receiver_name or not parcel.receiver_name.strip():
+        raise HTTPException(400, "Receiver name is required")
+    if not parcel.receiver_phone or not parcel.receiver_phone.strip():
+        raise HTTPException(400, "Receiver phone is required")
+    if not parcel.receiver_address or not parcel.receiver_address.strip():
+        raise HTTPException(400, "Receiver address is required")
+    services = rate_cards.current().services
+    if parcel.service_level not in services:
+        raise HTTPException(400, f"Invalid service level. Must be one of: {', '.join(services)}")
+
+def booking_values(parcel, card=None, booked_at=None) -> dict:
+    """Column values for a new parcel, without sender_id"""
+    card = card or rate_cards.current()
+    return {
+        "tracking_number": new_tracking_number(),
+        "receiver_name": parcel.receiver_name,
+        "receiver_phone": parcel.receiver_phone,
+        "receiver_address": parcel.receiver_address,
+        "weight_kg": parcel.weight_kg,
+        "charges": card.quote(parcel.weight_kg, parcel.receiver_address, parcel.service_level),
+        "service_level": parcel.service_level,
+        "current_status": "booked",
+        "booked_at": booked_at or datetime.utcnow(),
+    }
+
+def _record_bookings(db, parcels):
+    """History rows and counters for freshly inserted parcels; the caller commits"""
+    if not parcels:
+        return
+    db.execute(
+        insert(StatusHistory),
+        [{"parcel_id": p.parcel_id, "status": "booked", "updated_at": p.booked_at} for p in parcels],
+    )
+    stats = StatsDelta()
+    for p in parcels:
+        stats.booked(p.booked_at, p.charges)
+    stats.apply(db)
+
+def insert_bookings(db, values):
+    """Insert parcels from `booking_values` dicts (with sender_id set).
+
+    Returns the new rows (ParcelOut columns) in the order of `values`.
+    Does not commit, so bulk callers can commit per chunk.
+    """
+    parcels = db.execute(
+        insert(Parcel).returning(*PARCEL_OUT_COLUMNS, sort_by_parameter_order=True),
+        values,
+    ).all()
+    _record_bookings(db, parcels)
+    return parcels
+
+def book_parcel(db, parcel, sender_id: int = None, customer_email: str = None):
+    """Book one parcel for `sender_id`, or for the customer with `customer_email`"""
+    values = booking_values(parcel)
+    if customer_email is None:
+        statement = insert(Parcel).values(sender_id=sender_id, **values)
+    else:
+        source = select(User.user_id, *(literal(value) for value in values.values())).where(
+            User.email == customer_email, User.role == "customer"
+        )
+        statement = insert(Parcel).from_select(["sender_id", *values], source)
+    new_parcel = db.execute(statement.returning(*PARCEL_OUT_COLUMNS)).first()
+    if new_parcel is None:
+        db.rollback()
+        raise HTTPException(404, f"Customer with email '{customer_email}' not found")
+    _record_bookings(db, [new_parcel])
+    db.commit()
+    return new_parcel
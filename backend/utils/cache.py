@@ -0,0 +1,119 @@
+"""
+Cache building blocks: a thread-safe in-process LRU with per-entry expiry,
+and shared (cross-worker) tiers with a common async interface.
+
+Shared tiers also keep a version counter per entry so a reader can cache
+what it read only if no writer invalidated the entry in the meantime:
+`invalidate` bumps the version and drops the value, `set_if_version`
+stores a value only while the version is still the one the reader saw.
+"""
+from collections import OrderedDict
+import threading
+import time
+
+class LRUCache:
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl_seconds: float = None):
+        expires_at = time.monotonic() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+class InMemorySharedCache:
+    """Stand-in for a shared cache server, for tests and single-process runs"""
+
+    def __init__(self):
+        self._cache = LRUCache(max_size=1_000_000, ttl_seconds=3600)
+
+    async def get(self, key: str):
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: str, ttl_seconds: int):
+        self._cache.set(key, value, ttl_seconds)
+
+    async def delete(self, key: str):
+        self._cache.delete(key)
+
+    async def invalidate(self, key: str, version_key: str, ttl_seconds: int):
+        # Single event loop: nothing runs between these steps
+        version = int(self._cache.get(version_key) or 0) + 1
+        self._cache.set(version_key, str(version), ttl_seconds)
+        self._cache.delete(key)
+
+    async def set_if_version(self, key: str, value: str, ttl_seconds: int, version_key: str, version: str):
+        if (self._cache.get(version_key) or "0") != version:
+            return False
+        self._cache.set(key, value, ttl_seconds)
+        return True
+
+class RedisSharedCache:
+    """Shared tier on Redis (needs the optional `redis` package)"""
+
+    # KEYS: value, version; ARGV: ttl
+    _INVALIDATE = """
+        redis.call('incr', KEYS[2])
+        redis.call('expire', KEYS[2], ARGV[1])
+        redis.call('del', KEYS[1])
+    """
+    # KEYS: value, version; ARGV: value, ttl, expected version
+    _SET_IF_VERSION = """
+        if (redis.call('get', KEYS[2]) or '0') ~= ARGV[3] then
+            return 0
+        end
+        redis.call('set', KEYS[1], ARGV[1], 'EX', ARGV[2])
+        return 1
+    """
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError("A shared cache URL is configured but the 'redis' package is not installed") from exc
+        self._client = redis.from_url(url)
+
+    async def get(self, key: str):
+        value = await self._client.get(key)
+        return value.decode("utf-8") if value is not None else None
+
+    async def set(self, key: str, value: str, ttl_seconds: int):
+        await self._client.set(key, value, ex=ttl_seconds)
+
+    async def delete(self, key: str):
+        await self._client.delete(key)
+
+    async def invalidate(self, key: str, version_key: str, ttl_seconds: int):
+        await self._client.eval(self._INVALIDATE, 2, key, version_key, ttl_seconds)
+
+    async def set_if_version(self, key: str, value: str, ttl_seconds: int, version_key: str, version: str):
+        return bool(await self._client.eval(self._SET_IF_VERSION, 2, key, version_key, value, ttl_seconds, version))
@@ -0,0 +1,207 @@
+"""
+Automatic rider assignment for staff dispatch.
+
+Takes every unassigned booked/packed parcel and spreads it across riders.
+Parcels are grouped by delivery area (the last two parts of the receiver
+address), and each area is handed out in runs to the least loaded rider
+that still has room, so riders get compact routes while loads stay even.
+A rider's load counts the parcels they already carry that are not yet
+delivered, returned or cancelled. Loads are capped by
+DISPATCH_MAX_PARCELS_PER_RIDER and DISPATCH_MAX_WEIGHT_KG. Parcels that fit
+nowhere stay unassigned for the next run.
+
+Runs from POST /staff/auto-assign, and every AUTO_ASSIGN_INTERVAL_SECONDS
+in the background when that is set (see `main.py`).
+"""
+from dataclasses import dataclass
+from heapq import heapify, heappop, heappush
+from fastapi import HTTPException
+from sqlalchemy import func, select, text
+from starlette.concurrency import run_in_threadpool
+from dotenv import load_dotenv
+from config.database import SessionLocal, dialect_insert
+from models.sql_models import DeliveryAssignment, Parcel, User
+from utils.events import event_bus, event_for_parcel
+from utils.stats import StatsDelta
+import asyncio
+import logging
+import os
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_MAX_PARCELS_PER_RIDER = int(os.getenv("DISPATCH_MAX_PARCELS_PER_RIDER", "40"))
+DISPATCH_MAX_WEIGHT_KG = float(os.getenv("DISPATCH_MAX_WEIGHT_KG", "150"))
+# 0 disables the scheduled job
+AUTO_ASSIGN_INTERVAL_SECONDS = int(os.getenv("AUTO_ASSIGN_INTERVAL_SECONDS", "0"))
+DISPATCH_CHUNK_SIZE = 1000
+
+ASSIGNABLE_STATUSES = ("booked", "packed")
+FINAL_STATUSES = ("delivered", "returned", "cancelled")
+
+# Arbitrary key so only one worker dispatches at a time on Postgres
+DISPATCH_LOCK_ID = 72610402
+
+@dataclass
+class RiderLoad:
+    rider_id: int
+    parcels: int = 0
+    weight_kg: float = 0.0
+
+def address_area(address: str) -> str:
+    """Area key for grouping deliveries, e.g. "gulberg, lahore" """
+    parts = [part.strip().lower() for part in (address or "").split(",")]
+    # Drop empty parts and postal codes
+    parts = [part for part in parts if part and not part.replace(" ", "").isdigit()]
+    return ", ".join(parts[-2:])
+
+def plan_assignments(parcels, riders, max_parcels: int = None, max_weight_kg: float = None):
+    """Pick a rider for each parcel.
+
+    `parcels` need `weight_kg` and `receiver_address`; `riders` maps
+    rider_id to its current RiderLoad, which is updated in place. Returns
+    a list of (parcel, rider_id).
+    """
+    max_parcels = max_parcels or DISPATCH_MAX_PARCELS_PER_RIDER
+    max_weight_kg = max_weight_kg or DISPATCH_MAX_WEIGHT_KG
+    if not riders:
+        return []
+
+    areas = {}
+    for parcel in parcels:
+        areas.setdefault(address_area(parcel.receiver_address), []).append(parcel)
+
+    # Stay on one rider per area until they reach an even share of the work
+    total = sum(r.parcels for r in riders.values()) + len(parcels)
+    fair_share = min(max_parcels, -(-total // len(riders)))
+
+    heap = [(r.parcels, r.weight_kg, r.rider_id) for r in riders.values() if r.parcels < max_parcels]
+    heapify(heap)
+
+    def least_loaded(weight_kg):
+        # Riders that cannot carry this parcel's weight go back for lighter ones
+        too_heavy = []
+        rider = None
+        while heap:
+            entry = heappop(heap)
+            if riders[entry[2]].weight_kg + weight_kg <= max_weight_kg:
+                rider = riders[entry[2]]
+                break
+            too_heavy.append(entry)
+        for entry in too_heavy:
+            heappush(heap, entry)
+        return rider
+
+    def release(rider):
+        if rider is not None and rider.parcels < max_parcels:
+            heappush(heap, (rider.parcels, rider.weight_kg, rider.rider_id))
+
+    plan = []
+    # Largest areas first, while every rider still has room
+    for area_parcels in sorted(areas.values(), key=len, reverse=True):
+        rider = None
+        for parcel in area_parcels:
+            if parcel.weight_kg > max_weight_kg:
+                continue
+            if rider is None or rider.parcels >= fair_share or rider.weight_kg + parcel.weight_kg > max_weight_kg:
+                release(rider)
+                rider = least_loaded(parcel.weight_kg)
+                if rider is None:
+                    continue
+            rider.parcels += 1
+            rider.weight_kg += parcel.weight_kg
+            plan.append((parcel, rider.rider_id))
+        release(rider)
+        if not heap:
+            break
+    return plan
+
+def _dispatch_inputs(db):
+    riders = {rider_id: RiderLoad(rider_id) for rider_id in db.scalars(select(User.user_id).where(User.role == "rider"))}
+    load = db.execute(
+        select(DeliveryAssignment.rider_id, func.count(), func.coalesce(func.sum(Parcel.weight_kg), 0.0))
+        .join(Parcel, Parcel.parcel_id == DeliveryAssignment.parcel_id)
+        .where(Parcel.current_status.not_in(FINAL_STATUSES))
+        .group_by(DeliveryAssignment.rider_id)
+    )
+    for rider_id, parcels, weight_kg in load:
+        if rider_id in riders:
+            riders[rider_id].parcels = parcels
+            riders[rider_id].weight_kg = weight_kg
+
+    assigned = select(DeliveryAssignment.parcel_id).where(DeliveryAssignment.parcel_id == Parcel.parcel_id).exists()
+    parcels = db.execute(
+        select(
+            Parcel.parcel_id, Parcel.tracking_number, Parcel.sender_id, Parcel.current_status,
+            Parcel.weight_kg, Parcel.receiver_address,
+        )
+        .where(Parcel.current_status.in_(ASSIGNABLE_STATUSES), ~assigned)
+        .order_by(Parcel.booked_at, Parcel.parcel_id)
+    ).all()
+    return riders, parcels
+
+def auto_assign(db, dry_run: bool = False, max_parcels: int = None, max_weight_kg: float = None):
+    """Plan and (unless `dry_run`) write assignments in one transaction.
+
+    Returns (summary, assigned parcels as (parcel row, rider_id)).
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        if not db.scalar(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": DISPATCH_LOCK_ID}):
+            raise HTTPException(409, "Auto-assignment is already running")
+
+    riders, parcels = _dispatch_inputs(db)
+    plan = plan_assignments(parcels, riders, max_parcels, max_weight_kg)
+
+    if not dry_run and plan:
+        # Parcels a staff member assigned by hand since the plan was made are skipped
+        statement = (
+            dialect_insert(db, DeliveryAssignment)
+            .on_conflict_do_nothing(index_elements=["parcel_id"])
+            .returning(DeliveryAssignment.parcel_id)
+        )
+        written = set()
+        for start in range(0, len(plan), DISPATCH_CHUNK_SIZE):
+            chunk = plan[start:start + DISPATCH_CHUNK_SIZE]
+            written.update(db.scalars(
+                statement, [{"parcel_id": parcel.parcel_id, "rider_id": rider_id} for parcel, rider_id in chunk]
+            ))
+        plan = [(parcel, rider_id) for parcel, rider_id in plan if parcel.parcel_id in written]
+        stats = StatsDelta()
+        for parcel, rider_id in plan:
+            stats.assigned(rider_id, parcel.current_status)
+        stats.apply(db)
+        db.commit()
+
+    per_rider = {}
+    for _, rider_id in plan:
+        per_rider[rider_id] = per_rider.get(rider_id, 0) + 1
+    summary = {
+        "dry_run": dry_run,
+        "assigned": len(plan),
+        "unassigned": len(parcels) - len(plan),
+        "riders": [{"rider_id": rider_id, "parcels": count} for rider_id, count in sorted(per_rider.items())],
+    }
+    return summary, plan
+
+async def publish_assignments(plan):
+    for parcel, rider_id in plan:
+        await event_bus.publish(event_for_parcel("rider_assigned", parcel, rider_id=rider_id))
+
+async def auto_assign_job(interval_seconds: int):
+    """Run auto_assign every `interval_seconds` until cancelled"""
+    def run():
+        with SessionLocal() as db:
+            return auto_assign(db)
+
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            summary, plan = await run_in_threadpool(run)
+            if plan:
+                logger.info(f"Auto-assigned {summary['assigned']} parcels, {summary['unassigned']} left unassigned")
+                await publish_assignments(plan)
+        except HTTPException:
+            pass  # another worker is dispatching
+        except Exception:
+            logger.exception("Scheduled auto-assignment failed")
@@ -0,0 +1,159 @@
+"""
+In-process parcel event bus with pluggable cross-worker fan-out.
+
+Handlers publish an event after committing a change; subscribers (the SSE
+streams in routers/events.py) receive it on per-connection queues. Topics:
+
+    parcel:<tracking_number>   one parcel, for public tracking pages
+    customer:<user_id>         every parcel a customer sent
+    staff                      the staff board (all parcels)
+
+With EVENTS_REDIS_URL set, events go through Redis pub/sub so subscribers
+connected to any worker see them; otherwise delivery stays in-process.
+"""
+from datetime import datetime
+from dotenv import load_dotenv
+import asyncio
+import json
+import logging
+import os
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+EVENTS_REDIS_URL = os.getenv("EVENTS_REDIS_URL")
+EVENTS_REDIS_CHANNEL = os.getenv("EVENTS_REDIS_CHANNEL", "courier:parcel-events")
+SUBSCRIBER_QUEUE_SIZE = 256
+
+def parcel_event(event: str, parcel_id: int, tracking_number: str, sender_id: int, current_status: str, **extra) -> dict:
+    payload = {
+        "event": event,
+        "parcel_id": parcel_id,
+        "tracking_number": tracking_number,
+        "sender_id": sender_id,
+        "current_status": current_status,
+        "at": datetime.utcnow().isoformat(),
+    }
+    payload.update(extra)
+    return payload
+
+def event_for_parcel(event: str, parcel, **extra) -> dict:
+    return parcel_event(event, parcel.parcel_id, parcel.tracking_number, parcel.sender_id, parcel.current_status, **extra)
+
+def topics_for(event: dict):
+    return (f"parcel:{event['tracking_number']}", f"customer:{event['sender_id']}", "staff")
+
+class Subscription:
+    def __init__(self, bus, topics):
+        self.bus = bus
+        self.topics = tuple(topics)
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.dropped = 0
+
+    def deliver(self, event: dict):
+        if self.queue.full():
+            # A slow client loses its oldest events rather than stalling publishers
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+class LocalFanout:
+    """Deliver events only to subscribers in this process"""
+
+    async def start(self, dispatch):
+        self._dispatch = dispatch
+
+    async def publish(self, event: dict):
+        self._dispatch(event)
+
+    async def stop(self):
+        pass
+
+class RedisFanout:
+    """Relay events through Redis pub/sub so every worker's subscribers get them"""
+
+    def __init__(self, url: str, channel: str = EVENTS_REDIS_CHANNEL):
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError("EVENTS_REDIS_URL is set but the 'redis' package is not installed") from exc
+        self._client = redis.from_url(url)
+        self.channel = channel
+        self._listener = None
+
+    async def start(self, dispatch):
+        pubsub = self._client.pubsub()
+        await pubsub.subscribe(self.channel)
+
+        async def listen():
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    dispatch(json.loads(message["data"]))
+
+        self._listener = asyncio.create_task(listen())
+
+    async def publish(self, event: dict):
+        await self._client.publish(self.channel, json.dumps(event))
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+        await self._client.aclose()
+
+class EventBus:
+    def __init__(self, fanout=None):
+        self.fanout = fanout or LocalFanout()
+        self._subscribers = {}  # topic -> set of Subscription
+        self._started = False
+
+    async def start(self):
+        if not self._started:
+            await self.fanout.start(self._dispatch)
+            self._started = True
+
+    async def stop(self):
+        if self._started:
+            await self.fanout.stop()
+            self._started = False
+
+    def subscribe(self, *topics) -> Subscription:
+        subscription = Subscription(self, topics)
+        for topic in subscription.topics:
+            self._subscribers.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        for topic in subscription.topics:
+            subscribers = self._subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[topic]
+
+    def subscriber_count(self) -> int:
+        return len({s for subscribers in self._subscribers.values() for s in subscribers})
+
+    async def publish(self, event: dict):
+        await self.start()
+        try:
+            await self.fanout.publish(event)
+        except Exception as exc:
+            # Push is best effort; clients can still poll
+            logger.warning(f"Publishing {event.get('event')} event failed: {exc}")
+
+    def _dispatch(self, event: dict):
+        delivered = set()
+        for topic in topics_for(event):
+            for subscription in self._subscribers.get(topic, ()):
+                if subscription not in delivered:
+                    subscription.deliver(event)
+                    delivered.add(subscription)
+
+event_bus = EventBus(RedisFanout(EVENTS_REDIS_URL) if EVENTS_REDIS_URL else None)
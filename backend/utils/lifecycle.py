@@ -0,0 +1,29 @@
+"""
+Parcel lifecycle state machine shared by every status writer.
+
+    booked -> packed -> in transit -> out for delivery -> delivered
+
+plus the exception paths: a parcel can be cancelled before it ships, and a
+failed delivery attempt either goes back out for delivery or is returned
+to the sender. delivered, returned and cancelled are final.
+"""
+
+TRANSITIONS = {
+    "booked": ("packed", "cancelled"),
+    "packed": ("in transit", "cancelled"),
+    "in transit": ("out for delivery",),
+    "out for delivery": ("delivered", "failed delivery"),
+    "failed delivery": ("out for delivery", "returned"),
+    "delivered": (),
+    "returned": (),
+    "cancelled": (),
+}
+
+STATUSES = list(TRANSITIONS)
+
+def can_transition(current_status: str, new_status: str) -> bool:
+    return new_status in TRANSITIONS.get(current_status, ())
+
+def sources_of(new_status: str):
+    """Statuses a parcel may be in for `new_status` to be a legal next step"""
+    return [status for status, targets in TRANSITIONS.items() if new_status in targets]
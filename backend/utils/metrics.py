@@ -0,0 +1,157 @@
+"""
+Small in-process metric primitives.
+
+Values are plain counters and cumulative histograms so they can be
+rendered in Prometheus text format or returned as JSON.
+"""
+import math
+import threading
+
+# Seconds; tuned for database and HTTP latencies
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Queries per request
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 1000)
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+
+    def cumulative(self):
+        """Return [(upper_bound, count of observations <= bound), ...]"""
+        with self._lock:
+            total = 0
+            out = []
+            for bound, count in zip(self.buckets, self.counts):
+                total += count
+                out.append((bound, total))
+            return out
+
+    def snapshot(self):
+        with self._lock:
+            return {"count": self.count, "sum": round(self.sum, 6), "max": round(self.max, 6)}
+
+class PoolMetrics:
+    """Connection checkout wait times and timeouts for an engine's pool"""
+
+    def __init__(self):
+        self.checkout_wait = Histogram()
+        self._timeouts = 0
+        self._lock = threading.Lock()
+
+    def record_timeout(self):
+        # Called from threadpool threads; `+=` on an attribute is not atomic
+        with self._lock:
+            self._timeouts += 1
+
+    @property
+    def timeouts(self) -> int:
+        with self._lock:
+            return self._timeouts
+
+    def snapshot(self, pool):
+        stats = {
+            "pool": type(pool).__name__,
+            "checkout_wait_seconds": self.checkout_wait.snapshot(),
+            "checkout_timeouts": self.timeouts,
+        }
+        # NullPool keeps no connections, so it has no size/usage figures
+        for name in ("size", "checkedout", "checkedin", "overflow"):
+            if hasattr(pool, name):
+                stats[name] = getattr(pool, name)()
+        return stats
+
+class HistogramFamily:
+    """Histograms of one metric keyed by label values, e.g. (method, route, status)"""
+
+    def __init__(self, name: str, help_text: str, labels, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = buckets
+        self.children = {}
+        self._lock = threading.Lock()
+
+    def labels_for(self, *values) -> Histogram:
+        child = self.children.get(values)
+        if child is None:
+            with self._lock:
+                child = self.children.setdefault(values, Histogram(self.buckets))
+        return child
+
+    def observe(self, values, value: float):
+        self.labels_for(*values).observe(value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for values, histogram in sorted(self.children.items()):
+            labels = dict(zip(self.labels, values))
+            lines.extend(render_histogram(self.name, histogram, labels))
+        return lines
+
+class CounterFamily:
+    """Counters of one metric keyed by label values"""
+
+    def __init__(self, name: str, help_text: str, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, values, amount: float = 1):
+        with self._lock:
+            self.values[values] = self.values.get(values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self.values.items())
+        for values, value in items:
+            lines.append(f"{self.name}{format_labels(dict(zip(self.labels, values)))} {format_value(value)}")
+        return lines
+
+def format_value(value) -> str:
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+def render_histogram(name: str, histogram: Histogram, labels: dict = None):
+    """Prometheus text lines for one histogram (without HELP/TYPE)"""
+    labels = labels or {}
+    lines = []
+    for bound, count in histogram.cumulative():
+        lines.append(f"{name}_bucket{format_labels({**labels, 'le': format_value(float(bound))})} {count}")
+    snapshot = histogram.snapshot()
+    lines.append(f"{name}_bucket{format_labels({**labels, 'le': '+Inf'})} {snapshot['count']}")
+    lines.append(f"{name}_sum{format_labels(labels)} {format_value(float(snapshot['sum']))}")
+    lines.append(f"{name}_count{format_labels(labels)} {snapshot['count']}")
+    return lines
+
+def render_gauge(name: str, help_text: str, value, metric_type: str = "gauge"):
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}", f"{name} {format_value(value)}"]
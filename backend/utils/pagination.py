@@ -0,0 +1,21 @@
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(booked_at, parcel_id: int) -> str:
+    """Build an opaque continuation token from the last row of a page"""
+    raw = json.dumps([booked_at.isoformat(), parcel_id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str):
+    """Return the (booked_at, parcel_id) keyset position stored in a cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        booked_at, parcel_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(booked_at), int(parcel_id)
+    except Exception:
+        raise HTTPException(400, "Invalid cursor")
@@ -0,0 +1,68 @@
+"""
+Bounded worker pool for bcrypt hashing.
+
+bcrypt deliberately burns 100-300 ms of CPU per call. Running it on the
+request threadpool lets a login storm starve every other endpoint, so
+hashes are computed in a separate process pool. At most
+PASSWORD_HASH_QUEUE_SIZE jobs may be queued or running; beyond that login
+and register answer 429 so clients back off instead of piling up.
+
+PASSWORD_HASH_WORKERS=0 falls back to the request threadpool (useful for
+tests and platforms without process pools).
+"""
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from dotenv import load_dotenv
+from utils.security import get_password_hash, verify_and_update_password
+import asyncio
+import multiprocessing
+import os
+import logging
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", str(max(1, PASSWORD_HASH_WORKERS) * 8)))
+
+class PasswordHasher:
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, queue_size: int = PASSWORD_HASH_QUEUE_SIZE):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.pending = 0  # only touched from the event loop
+        self._executor = None
+
+    def start(self):
+        if self.workers > 0 and self._executor is None:
+            # spawn rather than fork: the server process already runs threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.queue_size:
+            logger.warning(f"Password hashing queue full ({self.pending} jobs), rejecting request")
+            raise HTTPException(429, "Too many login attempts in progress. Please retry shortly.", headers={"Retry-After": "1"})
+        self.pending += 1
+        try:
+            if self.workers <= 0:
+                return await run_in_threadpool(fn, *args)
+            self.start()
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def verify_and_update(self, password: str, hashed: str):
+        return await self._run(verify_and_update_password, password, hashed)
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,137 @@
+"""
+Parcel pricing from a rate card.
+
+The rate card (config/rate_card.json, or PRICING_RATE_CARD_PATH) maps
+destination cities to regions, origin/destination regions to a zone, and
+each zone to weight slabs: the price of the smallest slab the parcel fits
+in, plus `per_extra_kg` for every started kg above the largest slab.
+Deliveries inside the origin city use the `same_city` zone. A service
+level (standard, express, ...) multiplies the result.
+
+Cards are compiled once into index lookups (city -> region number, a
+region x region zone matrix, sorted slab bounds searched with bisect). The
+file's mtime is checked at most every PRICING_RELOAD_SECONDS and a changed
+card is swapped in without a restart; a card that fails to load is logged
+and the previous one stays in use.
+"""
+from bisect import bisect_left
+from dotenv import load_dotenv
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+PRICING_RATE_CARD_PATH = os.getenv(
+    "PRICING_RATE_CARD_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "rate_card.json"),
+)
+PRICING_RELOAD_SECONDS = float(os.getenv("PRICING_RELOAD_SECONDS", "30"))
+
+SAME_CITY_ZONE = "same_city"
+
+def destination_city(address: str) -> str:
+    """City of a receiver address: its last part that is not a postal code"""
+    for part in reversed((address or "").split(",")):
+        part = part.strip().lower()
+        if part and not part.replace(" ", "").isdigit():
+            return part
+    return ""
+
+class RateCard:
+    def __init__(self, raw: dict):
+        self.version = str(raw.get("version", ""))
+        self.origin_city = raw["origin_city"].lower()
+
+        regions = sorted({*raw["cities"].values(), *raw["zone_matrix"], raw["default_region"]})
+        region_index = {region: i for i, region in enumerate(regions)}
+        self._city_region = {city.lower(): region_index[region] for city, region in raw["cities"].items()}
+        self._default_region = region_index[raw["default_region"]]
+
+        zone_names = list(raw["zones"])
+        zone_index = {zone: i for i, zone in enumerate(zone_names)}
+        self.zones = zone_names
+        self._same_city = zone_index[SAME_CITY_ZONE]
+        self._matrix = [
+            [zone_index[raw["zone_matrix"][origin][destination]] for destination in regions]
+            for origin in regions
+        ]
+
+        self._bounds = []
+        self._prices = []
+        self._per_extra_kg = []
+        for zone in zone_names:
+            slabs = sorted(raw["zones"][zone]["slabs"])
+            self._bounds.append([float(max_kg) for max_kg, _ in slabs])
+            self._prices.append([float(price) for _, price in slabs])
+            self._per_extra_kg.append(float(raw["zones"][zone]["per_extra_kg"]))
+
+        self.services = {name: float(multiplier) for name, multiplier in raw["services"].items()}
+
+    def region_of(self, city: str) -> int:
+        return self._city_region.get(city, self._default_region)
+
+    def zone_for(self, destination: str, origin: str = None) -> int:
+        origin = (origin or self.origin_city).lower()
+        if destination == origin:
+            return self._same_city
+        return self._matrix[self.region_of(origin)][self.region_of(destination)]
+
+    def price(self, weight_kg: float, zone: int, service_level: str = "standard") -> float:
+        bounds = self._bounds[zone]
+        slab = bisect_left(bounds, weight_kg)
+        if slab < len(bounds):
+            base = self._prices[zone][slab]
+        else:
+            extra_kg = math.ceil(weight_kg - bounds[-1])
+            base = self._prices[zone][-1] + extra_kg * self._per_extra_kg[zone]
+        return round(base * self.services[service_level], 2)
+
+    def quote(self, weight_kg: float, receiver_address: str, service_level: str = "standard", origin_city: str = None) -> float:
+        """Charges for one parcel; raises KeyError for an unknown service level"""
+        return self.price(weight_kg, self.zone_for(destination_city(receiver_address), origin_city), service_level)
+
+def load_rate_card(path: str) -> RateCard:
+    with open(path) as f:
+        return RateCard(json.load(f))
+
+class RateCardStore:
+    """The current rate card, reloaded when the file on disk changes"""
+
+    def __init__(self, path: str, reload_seconds: float = PRICING_RELOAD_SECONDS):
+        self.path = path
+        self.reload_seconds = reload_seconds
+        self._card = None
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> RateCard:
+        if self._card is None or time.monotonic() - self._checked_at >= self.reload_seconds:
+            with self._lock:
+                self._refresh()
+        return self._card
+
+    def _refresh(self):
+        self._checked_at = time.monotonic()
+        try:
+            mtime = os.stat(self.path).st_mtime
+            if self._card is not None and mtime == self._mtime:
+                return
+            self._card = load_rate_card(self.path)
+            self._mtime = mtime
+            logger.info(f"Loaded rate card {self._card.version} from {self.path}")
+        except Exception as exc:
+            if self._card is None:
+                raise
+            logger.error(f"Keeping rate card {self._card.version}; reloading {self.path} failed: {exc}")
+
+rate_cards = RateCardStore(PRICING_RATE_CARD_PATH)
+
+def quote_charges(weight_kg: float, receiver_address: str, service_level: str = "standard") -> float:
+    return rate_cards.current().quote(weight_kg, receiver_address, service_level)
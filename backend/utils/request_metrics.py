@@ -0,0 +1,175 @@
+"""
+Per-request latency and database instrumentation, exposed on /metrics.
+
+`RequestMetricsMiddleware` times every request and labels it with the
+route template (e.g. /customer/parcel/{tracking_number}), never the raw
+path, so label cardinality stays bounded. SQLAlchemy cursor events on
+both engines add each query's count and time to the request that ran it;
+the request is found through a context variable, which follows handlers
+onto the threadpool and into `run_sync`.
+
+A request that runs the same SQL statement more than
+N_PLUS_ONE_THRESHOLD times is counted (and logged) as a likely N+1
+pattern. Requests slower than SLOW_REQUEST_SECONDS are traced with the
+SQL they ran, for a SLOW_REQUEST_SAMPLE_RATE fraction of them (0 turns
+tracing off). Recent traces are kept in memory for /health/slow-requests.
+"""
+from collections import Counter, deque
+from contextvars import ContextVar
+from sqlalchemy import event
+from dotenv import load_dotenv
+from utils.metrics import COUNT_BUCKETS, CounterFamily, HistogramFamily, render_gauge, render_histogram
+import logging
+import os
+import random
+import time
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "1.0"))
+SLOW_REQUEST_SAMPLE_RATE = float(os.getenv("SLOW_REQUEST_SAMPLE_RATE", "0"))
+SLOW_TRACE_MAX_STATEMENTS = 50
+SLOW_TRACES_KEPT = 50
+
+request_duration = HistogramFamily(
+    "http_request_duration_seconds", "Request latency by route and status", ("method", "route", "status")
+)
+request_db_seconds = HistogramFamily(
+    "http_request_db_seconds", "Database time spent per request", ("method", "route")
+)
+request_db_queries = HistogramFamily(
+    "http_request_db_queries", "SQL statements run per request", ("method", "route"), buckets=COUNT_BUCKETS
+)
+n_plus_one_requests = CounterFamily(
+    "http_request_n_plus_one_total", "Requests that repeated one SQL statement past the threshold", ("method", "route")
+)
+slow_traces = deque(maxlen=SLOW_TRACES_KEPT)
+
+class RequestStats:
+    """Database work done while serving one request"""
+
+    def __init__(self, trace: bool):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.by_statement = Counter()
+        self.trace = trace
+        self.statements = []
+
+    def record(self, statement: str, seconds: float):
+        self.queries += 1
+        self.db_seconds += seconds
+        self.by_statement[statement] += 1
+        if self.trace and len(self.statements) < SLOW_TRACE_MAX_STATEMENTS:
+            self.statements.append({"sql": statement, "ms": round(seconds * 1000, 3)})
+
+    def repeated(self):
+        statement, count = self.by_statement.most_common(1)[0] if self.by_statement else (None, 0)
+        return statement, count
+
+current_request: ContextVar = ContextVar("current_request", default=None)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_request.get() is not None and context is not None:
+        context.request_query_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_request.get()
+    if stats is None:
+        return
+    started = getattr(context, "request_query_started", None)
+    if started is not None:
+        stats.record(statement, time.perf_counter() - started)
+
+def instrument_engine(engine):
+    """Attach the query listeners to a sync Engine (or an AsyncEngine's sync_engine)"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    # Unmatched paths share one label so scanners cannot explode the series
+    return getattr(route, "path", None) or "unmatched"
+
+def _finish(scope, stats: RequestStats, status: int, elapsed: float):
+    method = scope.get("method", "")
+    route = _route_label(scope)
+    request_duration.observe((method, route, str(status)), elapsed)
+    request_db_seconds.observe((method, route), stats.db_seconds)
+    request_db_queries.observe((method, route), stats.queries)
+
+    statement, count = stats.repeated()
+    if count > N_PLUS_ONE_THRESHOLD:
+        n_plus_one_requests.inc((method, route))
+        logger.warning(f"Possible N+1 on {method} {route}: same statement ran {count} times: {statement[:200]}")
+
+    if stats.trace and elapsed >= SLOW_REQUEST_SECONDS:
+        slow_traces.append({
+            "method": method,
+            "route": route,
+            "status": status,
+            "seconds": round(elapsed, 4),
+            "db_seconds": round(stats.db_seconds, 4),
+            "queries": stats.queries,
+            "statements": stats.statements,
+        })
+        logger.warning(
+            f"Slow request {method} {route} took {elapsed:.3f}s "
+            f"({stats.queries} queries, {stats.db_seconds:.3f}s in the database)"
+        )
+
+class RequestMetricsMiddleware:
+    """Pure ASGI middleware, so streaming responses pass through untouched"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        trace = SLOW_REQUEST_SAMPLE_RATE > 0 and random.random() < SLOW_REQUEST_SAMPLE_RATE
+        stats = RequestStats(trace)
+        token = current_request.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(token)
+            _finish(scope, stats, status, time.perf_counter() - started)
+
+def render_metrics(pool, pool_metrics) -> str:
+    """All metrics in Prometheus text exposition format"""
+    lines = []
+    for family in (request_duration, request_db_seconds, request_db_queries, n_plus_one_requests):
+        lines.extend(family.render())
+
+    lines.extend(["# HELP db_pool_checkout_wait_seconds Time spent waiting for a pooled connection",
+                  "# TYPE db_pool_checkout_wait_seconds histogram"])
+    lines.extend(render_histogram("db_pool_checkout_wait_seconds", pool_metrics.checkout_wait))
+    lines.extend(render_gauge(
+        "db_pool_checkout_timeouts_total", "Checkouts that gave up waiting for a connection",
+        pool_metrics.timeouts, "counter",
+    ))
+    # NullPool keeps no connections, so it has no size/usage figures
+    for name, help_text in (
+        ("size", "Configured pool size"),
+        ("checkedout", "Connections currently in use"),
+        ("checkedin", "Idle connections in the pool"),
+        ("overflow", "Connections open beyond the pool size"),
+    ):
+        if hasattr(pool, name):
+            lines.extend(render_gauge(f"db_pool_{name}", help_text, getattr(pool, name)()))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,237 @@
+"""
+Parcel search over tracking number prefix, receiver name, phone and address.
+
+On Postgres the search runs in the database. Migration 6 adds a pg_trgm GIN
+index on lower(receiver_name || ' ' || receiver_phone || ' ' ||
+receiver_address), which makes substring matches index scans, and a
+varchar_pattern_ops index for tracking number prefixes. Results are ranked
+by trigram similarity.
+
+Other databases (SQLite in tests and local runs) use an in-process
+trigram inverted index instead. It is built from the table on first use,
+and the booking/edit handlers keep it current through `index_parcels()`;
+changes that land while the table is being read are buffered and applied
+once the load finishes. It is per process and holds every parcel, so it
+is only meant for single-worker setups and small tables (tests, local
+runs); production search runs on Postgres.
+
+Matches rank as: tracking number prefix, then phone, then name, then
+address. Ties go to the newest parcel.
+"""
+from sqlalchemy import case, func, literal_column, or_, select
+from models.sql_models import Parcel
+import re
+import threading
+
+SEARCH_MIN_LENGTH = 2
+SEARCH_MAX_OFFSET = 1000
+
+TRACKING_WEIGHT = 4.0
+PHONE_WEIGHT = 3.0
+NAME_WEIGHT = 2.0
+ADDRESS_WEIGHT = 1.0
+
+def normalize_query(q: str) -> str:
+    return " ".join((q or "").lower().split())
+
+def _digits(value: str) -> str:
+    return re.sub(r"\D", "", value or "")
+
+def _trigrams(text: str):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def escape_like(value: str) -> str:
+    """Make `%`, `_` and `\\` in user input match literally in LIKE (with escape="\\")"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def search_document():
+    """The expression the Postgres trigram index is built on"""
+    space = literal_column("' '")
+    return func.lower(Parcel.receiver_name + space + Parcel.receiver_phone + space + Parcel.receiver_address)
+
+def _postgres_search(db, q: str, sender_id, limit: int, offset: int):
+    document = search_document()
+    # User input is escaped so "%" or "_" cannot widen the match
+    prefix = escape_like(q.upper().replace(" ", "")) + "%"
+    contains = f"%{escape_like(q)}%"
+    score = (
+        case((Parcel.tracking_number.like(prefix, escape="\\"), TRACKING_WEIGHT), else_=0.0)
+        + func.similarity(func.lower(Parcel.receiver_name), q) * NAME_WEIGHT
+        + func.similarity(func.lower(Parcel.receiver_address), q) * ADDRESS_WEIGHT
+    )
+    matches = [Parcel.tracking_number.like(prefix, escape="\\"), document.like(contains, escape="\\")]
+    digits = _digits(q)
+    if len(digits) >= SEARCH_MIN_LENGTH:
+        score = score + case((Parcel.receiver_phone.like(f"%{digits}%"), PHONE_WEIGHT), else_=0.0)
+        if digits != q:
+            # "0300-1234567" should also find phones stored without the dash
+            matches.append(document.like(f"%{digits}%"))
+    query = select(Parcel.parcel_id).where(or_(*matches))
+    if sender_id is not None:
+        query = query.where(Parcel.sender_id == sender_id)
+    query = query.order_by(score.desc(), Parcel.parcel_id.desc()).offset(offset).limit(limit)
+    return list(db.scalars(query))
+
+class InvertedIndex:
+    """Trigram postings for parcels, for databases without pg_trgm"""
+
+    def __init__(self):
+        self.docs = {}  # parcel_id -> (tracking_number, name, phone, address, sender_id)
+        self.postings = {}  # trigram -> set of parcel_ids
+        self.loaded = False
+        self._pending = None  # (parcel_id, doc or None to remove) arriving while a load reads the table
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def _text(self, doc):
+        tracking_number, name, phone, address, _ = doc
+        return f"{tracking_number.lower()} {name} {phone} {_digits(phone)} {address}"
+
+    def _add(self, parcel_id, doc):
+        self._remove(parcel_id)
+        self.docs[parcel_id] = doc
+        for gram in _trigrams(self._text(doc)):
+            self.postings.setdefault(gram, set()).add(parcel_id)
+
+    def _remove(self, parcel_id):
+        doc = self.docs.pop(parcel_id, None)
+        if doc is None:
+            return
+        for gram in _trigrams(self._text(doc)):
+            postings = self.postings.get(gram)
+            if postings is not None:
+                postings.discard(parcel_id)
+                if not postings:
+                    del self.postings[gram]
+
+    def update(self, rows):
+        """Add or replace parcels; rows need the searched columns and sender_id"""
+        with self._lock:
+            if self._pending is not None:
+                self._pending.extend((row.parcel_id, self._doc(row)) for row in rows)
+            elif self.loaded:
+                for row in rows:
+                    self._add(row.parcel_id, self._doc(row))
+            # Otherwise the first load will read them from the table
+
+    def remove(self, parcel_ids):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.extend((parcel_id, None) for parcel_id in parcel_ids)
+            elif self.loaded:
+                for parcel_id in parcel_ids:
+                    self._remove(parcel_id)
+
+    def _doc(self, row):
+        return (
+            row.tracking_number or "",
+            (row.receiver_name or "").lower(),
+            (row.receiver_phone or "").lower(),
+            (row.receiver_address or "").lower(),
+            row.sender_id,
+        )
+
+    def load(self, db):
+        # One load at a time; changes committed while it reads the table are
+        # buffered and replayed on top, so none are lost
+        with self._load_lock:
+            if self.loaded:
+                return
+            with self._lock:
+                self._pending = []
+            try:
+                docs = {
+                    row.parcel_id: self._doc(row)
+                    for row in db.execute(select(
+                        Parcel.parcel_id, Parcel.tracking_number, Parcel.receiver_name,
+                        Parcel.receiver_phone, Parcel.receiver_address, Parcel.sender_id,
+                    ))
+                }
+            except Exception:
+                with self._lock:
+                    self._pending = None
+                raise
+            with self._lock:
+                self.docs.clear()
+                self.postings.clear()
+                for parcel_id, doc in docs.items():
+                    self._add(parcel_id, doc)
+                for parcel_id, doc in self._pending:
+                    if doc is None:
+                        self._remove(parcel_id)
+                    else:
+                        self._add(parcel_id, doc)
+                self._pending = None
+                self.loaded = True
+
+    def clear(self):
+        with self._lock:
+            self.docs.clear()
+            self.postings.clear()
+            self.loaded = False
+
+    def _containing(self, text):
+        # Parcels whose text has every trigram of `text`; start from the rarest
+        postings = sorted((self.postings.get(gram, set()) for gram in _trigrams(text)), key=len)
+        return set(postings[0]).intersection(*postings[1:])
+
+    def _score(self, doc, q, prefix, digits):
+        tracking_number, name, phone, address, _ = doc
+        score = 0.0
+        if tracking_number.startswith(prefix):
+            score += TRACKING_WEIGHT
+        if digits and digits in _digits(phone):
+            score += PHONE_WEIGHT
+        if q in name:
+            score += NAME_WEIGHT * (1.5 if name.startswith(q) else 1.0)
+        if q in address:
+            score += ADDRESS_WEIGHT
+        return score
+
+    def search(self, db, q: str, sender_id, limit: int, offset: int):
+        if not self.loaded:
+            self.load(db)
+        prefix = q.upper().replace(" ", "")
+        digits = _digits(q) if len(_digits(q)) >= SEARCH_MIN_LENGTH else ""
+        with self._lock:
+            if len(q) >= 3:
+                candidates = self._containing(q)
+                if len(digits) >= 3 and digits != q:
+                    # "0300-1234567" should also find phones stored without the dash
+                    candidates |= self._containing(digits)
+            else:
+                candidates = set(self.docs)
+            scored = []
+            for parcel_id in candidates:
+                doc = self.docs[parcel_id]
+                if sender_id is not None and doc[4] != sender_id:
+                    continue
+                score = self._score(doc, q, prefix, digits)
+                if score:
+                    scored.append((-score, -parcel_id))
+        scored.sort()
+        return [-parcel_id for _, parcel_id in scored[offset:offset + limit]]
+
+search_index = InvertedIndex()
+
+def search_parcel_ids(db, q: str, sender_id=None, limit: int = 20, offset: int = 0):
+    """Ranked parcel ids matching `q`, optionally only those sent by `sender_id`"""
+    q = normalize_query(q)
+    if db.get_bind().dialect.name == "postgresql":
+        return _postgres_search(db, q, sender_id, limit, offset)
+    return search_index.search(db, q, sender_id, limit, offset)
+
+def search_parcels(db, q: str, sender_id=None, limit: int = 20, offset: int = 0):
+    ids = search_parcel_ids(db, q, sender_id, limit, offset)
+    if not ids:
+        return []
+    parcels = {p.parcel_id: p for p in db.scalars(select(Parcel).where(Parcel.parcel_id.in_(ids)))}
+    return [parcels[parcel_id] for parcel_id in ids if parcel_id in parcels]
+
+def index_parcels(rows):
+    """Keep the in-process index current after parcels are booked or edited"""
+    search_index.update(rows)
+
+def unindex_parcels(parcel_ids):
+    """Drop parcels moved out of `parcels` by utils/archive.py"""
+    search_index.remove(parcel_ids)
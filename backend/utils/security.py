@@ -3,14 +3,32 @@ from jose import jwt
 from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
+import logging
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Event stream tickets go in the URL (EventSource cannot send headers), so
+# they only open streams and expire quickly
+STREAM_TICKET_PURPOSE = "event_stream"
+STREAM_TICKET_EXPIRE_SECONDS = int(os.getenv("STREAM_TICKET_EXPIRE_SECONDS", "60"))
+
+# bcrypt cost factor. Existing hashes made with a different cost are
+# re-hashed on the user's next successful login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 
 def get_password_hash(password: str):
     # Bcrypt accepts at most 72 bytes. To be safe, truncate at 50 characters
@@ -25,37 +43,46 @@ def verify_password(plain: str, hashed: str):
         plain = plain[:50]
     return pwd_context.verify(plain, hashed)
 
+def verify_and_update_password(plain: str, hashed: str):
+    """Return (valid, new_hash); new_hash is set when the stored cost is outdated"""
+    if len(plain) > 50:
+        plain = plain[:50]
+    return pwd_context.verify_and_update(plain, hashed)
+
 def create_access_token(data: dict):
+    # Callers include "user_id" so authenticated requests never need to look
+    # the user up by email
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    now = datetime.utcnow()
+    expire = now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode.update({"exp": expire, "iat": now})
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+def create_stream_ticket(data: dict):
+    """Short-lived token that is only accepted for opening event streams"""
+    to_encode = data.copy()
+    now = datetime.utcnow()
+    expire = now + timedelta(seconds=STREAM_TICKET_EXPIRE_SECONDS)
+    to_encode.update({"exp": expire, "iat": now, "purpose": STREAM_TICKET_PURPOSE})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def decode_token(token: str):
-    import logging
-    logger = logging.getLogger(__name__)
-    
+    # Runs on every uncached request: never log the token or its claims
     try:
         if not token:
-            logger.error("Token is empty or None")
+            logger.debug("Token is empty or None")
             return None
         if not SECRET_KEY:
             logger.error("SECRET_KEY is not configured!")
             return None
-        
-        logger.info(f"Decoding token (first 20 chars): {token[:20]}...")
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        logger.info(f"Token decoded successfully: {payload}")
-        return payload
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except jwt.ExpiredSignatureError:
-        # Token has expired
-        logger.error("Token has expired")
+        logger.debug("Token has expired")
         return None
-    except jwt.InvalidTokenError as e:
-        # Invalid token
-        logger.error(f"Invalid token: {str(e)}")
+    except jwt.JWTError as e:
+        # A client error; info so the auth log rate limit can absorb floods
+        logger.info("Invalid token: %s", e)
         return None
     except Exception as e:
-        # Unexpected error
-        logger.error(f"Token decode error: {str(e)}")
-        return None
\ No newline at end of file
+        logger.error("Token decode error: %s", e)
+        return None
@@ -0,0 +1,49 @@
+"""
+Fast path for large parcel list responses.
+
+Returning ORM objects makes every row go through identity-map bookkeeping
+on load and jsonable_encoder (or ParcelOut validation) on the way out.
+List endpoints instead select just the ParcelOut columns as plain rows
+and encode them straight to JSON bytes with orjson, falling back to the
+standard json module when orjson is not installed. The output has the
+same fields and formatting as ParcelOut.
+"""
+from datetime import date, datetime
+from fastapi.responses import JSONResponse
+from models.sql_models import Parcel
+from schemas.pydantic_schemas import ParcelOut
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is an optional speedup
+    orjson = None
+
+PARCEL_OUT_COLUMNS = tuple(getattr(Parcel, name) for name in ParcelOut.model_fields)
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        # Naive datetimes come out exactly like datetime.isoformat()
+        return orjson.dumps(content)
+    return json.dumps(content, default=_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse for content that is already plain dicts/lists"""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+def parcel_columns(statement):
+    """Turn a select(Parcel) statement into one returning only the ParcelOut columns"""
+    return statement.with_only_columns(*PARCEL_OUT_COLUMNS, maintain_column_froms=True)
+
+def fetch_parcel_rows(db, statement):
+    """Run `statement` (a select(Parcel)) and return ParcelOut-shaped dicts"""
+    result = db.execute(parcel_columns(statement))
+    keys = tuple(result.keys())
+    return [dict(zip(keys, row)) for row in result]
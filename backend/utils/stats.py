@@ -0,0 +1,238 @@
+"""
+Incrementally maintained dashboard counters.
+
+`parcel_stats` holds one row per bucket:
+
+    ("day", booking day, status)    parcels booked that day now in `status`, and their charges
+                                    (legacy parcels with no booked_at share the "unknown" day)
+    ("rider", rider_id, status)     parcels assigned to the rider now in `status` (no revenue)
+
+Every writer that books, re-prices, assigns or moves a parcel collects the
+changes in a StatsDelta and applies it with `apply()` before committing,
+so the counters move in the same transaction as the parcel. Reading the
+dashboard then costs one row per bucket instead of a scan of `parcels`.
+
+`reconcile()` rebuilds the counters from the base tables and reports how
+many buckets had drifted. It runs every STATS_RECONCILE_INTERVAL_SECONDS
+in the background (see `main.py`), first one interval after startup.
+Every worker schedules it, but on Postgres an advisory lock lets only one
+run at a time, and a worker skips its turn when another finished a run
+within the last half interval (recorded in `job_runs`).
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import String, cast, delete, func, literal, select, text
+from starlette.concurrency import run_in_threadpool
+from dotenv import load_dotenv
+from config.database import SessionLocal, dialect_insert
+from models.sql_models import DeliveryAssignment, JobRun, Parcel, ParcelArchive, ParcelStat
+import asyncio
+import logging
+import os
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# 0 disables the scheduled reconciliation
+STATS_RECONCILE_INTERVAL_SECONDS = int(os.getenv("STATS_RECONCILE_INTERVAL_SECONDS", "3600"))
+
+# Arbitrary key so only one worker reconciles at a time on Postgres
+STATS_LOCK_ID = 72610403
+STATS_RECONCILE_JOB = "stats_reconcile"
+
+# Day bucket for parcels with no booked_at; every path (incremental, reconcile, backfill) uses it
+UNKNOWN_DAY = "unknown"
+
+def day_bucket(booked_at) -> str:
+    return booked_at.date().isoformat() if booked_at is not None else UNKNOWN_DAY
+
+class StatsDelta:
+    """Counter changes made by one transaction"""
+
+    def __init__(self):
+        self.changes = defaultdict(lambda: [0, 0.0])
+
+    def _add(self, dimension, bucket, status, parcels, revenue=0.0):
+        change = self.changes[(dimension, str(bucket), status)]
+        change[0] += parcels
+        change[1] += revenue
+
+    def booked(self, booked_at, charges, status="booked"):
+        self._add("day", day_bucket(booked_at), status, 1, charges or 0.0)
+
+    def repriced(self, booked_at, status, old_charges, new_charges):
+        self._add("day", day_bucket(booked_at), status, 0, (new_charges or 0.0) - (old_charges or 0.0))
+
+    def moved(self, booked_at, charges, old_status, new_status, rider_id=None):
+        if old_status == new_status:
+            return
+        self._add("day", day_bucket(booked_at), old_status, -1, -(charges or 0.0))
+        self._add("day", day_bucket(booked_at), new_status, 1, charges or 0.0)
+        if rider_id is not None:
+            self._add("rider", rider_id, old_status, -1)
+            self._add("rider", rider_id, new_status, 1)
+
+    def assigned(self, rider_id, status):
+        self._add("rider", rider_id, status, 1)
+
+    def apply(self, db):
+        """Upsert the changes; the caller commits"""
+        rows = [
+            {"dimension": dimension, "bucket": bucket, "status": status, "parcels": parcels, "revenue": revenue}
+            # Sorted so concurrent transactions lock buckets in the same order
+            for (dimension, bucket, status), (parcels, revenue) in sorted(self.changes.items())
+            if parcels or revenue
+        ]
+        if not rows:
+            return
+        statement = dialect_insert(db, ParcelStat)
+        statement = statement.on_conflict_do_update(
+            index_elements=["dimension", "bucket", "status"],
+            set_={
+                "parcels": ParcelStat.parcels + statement.excluded.parcels,
+                "revenue": ParcelStat.revenue + statement.excluded.revenue,
+            },
+        )
+        db.execute(statement, rows)
+
+def counted_from_base_tables(include_archive: bool = True):
+    """SELECT producing every parcel_stats row from parcels and delivery_assignments.
+
+    Archived parcels (see utils/archive.py) keep counting, so archiving
+    never moves the dashboard.
+    """
+    def day(booked_at):
+        return func.coalesce(cast(func.date(booked_at), String), UNKNOWN_DAY).label("day")
+
+    parcels = select(day(Parcel.booked_at), Parcel.current_status, Parcel.charges)
+    assigned = (
+        select(DeliveryAssignment.rider_id, Parcel.current_status)
+        .join(Parcel, Parcel.parcel_id == DeliveryAssignment.parcel_id)
+    )
+    if include_archive:
+        parcels = parcels.union_all(
+            select(day(ParcelArchive.booked_at), ParcelArchive.current_status, ParcelArchive.charges)
+        )
+        assigned = assigned.union_all(
+            select(ParcelArchive.rider_id, ParcelArchive.current_status).where(ParcelArchive.rider_id.is_not(None))
+        )
+    parcels = parcels.subquery()
+    assigned = assigned.subquery()
+
+    by_day = (
+        select(
+            literal("day"),
+            parcels.c.day,
+            parcels.c.current_status,
+            func.count(),
+            func.coalesce(func.sum(parcels.c.charges), 0.0),
+        )
+        .group_by(parcels.c.day, parcels.c.current_status)
+    )
+    by_rider = (
+        select(
+            literal("rider"),
+            cast(assigned.c.rider_id, String),
+            assigned.c.current_status,
+            func.count(),
+            literal(0.0),
+        )
+        .group_by(assigned.c.rider_id, assigned.c.current_status)
+    )
+    return by_day.union_all(by_rider)
+
+def reconcile(db, skip_if_ran_within: float = None):
+    """Rebuild parcel_stats from the base tables; returns the number of buckets that had drifted.
+
+    Returns None without doing anything when another worker is reconciling,
+    or finished less than `skip_if_ran_within` seconds ago.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        if not db.scalar(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": STATS_LOCK_ID}):
+            db.rollback()
+            return None
+    now = datetime.utcnow()
+    if skip_if_ran_within:
+        last_run = db.scalar(select(JobRun.finished_at).where(JobRun.name == STATS_RECONCILE_JOB))
+        if last_run is not None and last_run > now - timedelta(seconds=skip_if_ran_within):
+            db.rollback()
+            return None
+
+    def key(row):
+        return (row[0], row[1], row[2])
+
+    expected = {key(row): (row[3], round(row[4], 2)) for row in db.execute(counted_from_base_tables())}
+    current = {
+        key(row): (row[3], round(row[4], 2))
+        for row in db.execute(select(
+            ParcelStat.dimension, ParcelStat.bucket, ParcelStat.status, ParcelStat.parcels, ParcelStat.revenue
+        ))
+        if row[3] or round(row[4], 2)
+    }
+    drifted = sum(1 for k in expected.keys() | current.keys() if expected.get(k) != current.get(k))
+
+    db.execute(delete(ParcelStat))
+    db.execute(
+        dialect_insert(db, ParcelStat).from_select(
+            ["dimension", "bucket", "status", "parcels", "revenue"], counted_from_base_tables()
+        )
+    )
+    finished = dialect_insert(db, JobRun).values(name=STATS_RECONCILE_JOB, finished_at=datetime.utcnow())
+    db.execute(finished.on_conflict_do_update(index_elements=["name"], set_={"finished_at": finished.excluded.finished_at}))
+    db.commit()
+    return drifted
+
+def dashboard(db, from_day: str = None, to_day: str = None):
+    """Aggregate the counter buckets into the staff dashboard payload.
+
+    A day range leaves out the UNKNOWN_DAY bucket, which falls in no range.
+    """
+    query = select(ParcelStat).where(ParcelStat.parcels != 0)
+    if from_day or to_day:
+        query = query.where((ParcelStat.dimension != "day") | (ParcelStat.bucket != UNKNOWN_DAY))
+    if from_day:
+        query = query.where((ParcelStat.dimension != "day") | (ParcelStat.bucket >= from_day))
+    if to_day:
+        query = query.where((ParcelStat.dimension != "day") | (ParcelStat.bucket <= to_day))
+    rows = db.scalars(query).all()
+
+    by_status = defaultdict(int)
+    by_day = {}
+    by_rider = {}
+    revenue = 0.0
+    for row in rows:
+        if row.dimension == "day":
+            day = by_day.setdefault(row.bucket, {"day": row.bucket, "parcels": 0, "revenue": 0.0, "by_status": {}})
+            day["parcels"] += row.parcels
+            day["revenue"] += row.revenue
+            day["by_status"][row.status] = row.parcels
+            by_status[row.status] += row.parcels
+            revenue += row.revenue
+        elif row.dimension == "rider":
+            rider = by_rider.setdefault(row.bucket, {"rider_id": int(row.bucket), "parcels": 0, "by_status": {}})
+            rider["parcels"] += row.parcels
+            rider["by_status"][row.status] = row.parcels
+
+    return {
+        "parcels": sum(by_status.values()),
+        "revenue": round(revenue, 2),
+        "by_status": dict(by_status),
+        "by_day": [dict(day, revenue=round(day["revenue"], 2)) for _, day in sorted(by_day.items())],
+        "by_rider": sorted(by_rider.values(), key=lambda rider: rider["rider_id"]),
+    }
+
+async def reconcile_job(interval_seconds: int):
+    """Run reconcile every `interval_seconds` until cancelled, starting one interval in"""
+    def run():
+        with SessionLocal() as db:
+            return reconcile(db, skip_if_ran_within=interval_seconds / 2)
+
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            drifted = await run_in_threadpool(run)
+            if drifted:
+                logger.warning(f"Stats reconciliation corrected {drifted} drifted buckets")
+        except Exception:
+            logger.exception("Stats reconciliation failed")
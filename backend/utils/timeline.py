@@ -0,0 +1,38 @@
+"""
+Read path for the append-only status history.
+
+Every statement here filters on parcel_id and orders by updated_at so it
+walks ix_status_history_parcel_updated instead of sorting. history_id
+breaks ties between entries written in the same instant. Archived
+parcels (see utils/archive.py) are read the same way from the archive
+tables by passing `tables`.
+"""
+from sqlalchemy import select
+from models.sql_models import Parcel, StatusHistory
+
+# Upper bound on parcels per staff bulk timeline request
+TIMELINE_MAX_PARCELS = 1000
+
+def parcel_history(tracking_number: str, tables=(Parcel, StatusHistory)):
+    """History of one parcel, oldest first"""
+    parcels, history = tables
+    parcel_id = select(parcels.parcel_id).where(parcels.tracking_number == tracking_number).scalar_subquery()
+    return (
+        select(history)
+        .where(history.parcel_id == parcel_id)
+        .order_by(history.updated_at, history.history_id)
+    )
+
+def parcels_history(parcel_ids):
+    """History of many parcels in one query, grouped by parcel and oldest first"""
+    return (
+        select(StatusHistory)
+        .where(StatusHistory.parcel_id.in_(parcel_ids))
+        .order_by(StatusHistory.parcel_id, StatusHistory.updated_at, StatusHistory.history_id)
+    )
+
+def history_row(entry: StatusHistory):
+    return {
+        "status": entry.status,
+        "updated_at": entry.updated_at.isoformat() if entry.updated_at else None,
+    }
@@ -0,0 +1,252 @@
+"""
+Tracking number generation and validation.
+
+Tracking numbers are "TRK" followed by 13 Crockford base32 characters
+encoding a Snowflake-style 64-bit id and one Luhn mod 32 check character:
+
+    42 bits  milliseconds since TRACKING_EPOCH_MS
+    10 bits  worker id
+    12 bits  per-millisecond sequence
+
+Every process issuing numbers needs its own worker id. Set
+TRACKING_WORKER_ID when the deployment already hands each process a
+unique number; otherwise the process leases a free id from the
+`tracking_worker_leases` table on first use (main.py takes it at startup,
+so a worker that cannot get one fails to start) and renews it in the
+background. A process only issues numbers while it holds an unexpired
+lease. The generator is created on first use in each process, so workers
+forked from a preloaded master never inherit the master's id.
+
+Ids are then unique across workers without a database round trip per
+number, sort by booking time as plain strings, and mistyped numbers are
+rejected by the check character before any query runs.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import delete, exc, insert, select, update
+from starlette.concurrency import run_in_threadpool
+from dotenv import load_dotenv
+from config.database import engine
+from models.sql_models import TrackingWorkerLease
+import asyncio
+import logging
+import os
+import random
+import re
+import socket
+import threading
+import time
+import uuid
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+TRACKING_WORKER_LEASE_SECONDS = int(os.getenv("TRACKING_WORKER_LEASE_SECONDS", "300"))
+
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"  # Crockford base32, ascending ASCII
+TRACKING_PREFIX = "TRK"
+TRACKING_EPOCH_MS = 1704067200000  # 2024-01-01T00:00:00Z
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+ID_LENGTH = 13  # 64 bits in base32
+
+_NEW_FORMAT = re.compile(rf"^{TRACKING_PREFIX}[{ALPHABET}]{{{ID_LENGTH + 1}}}$")
+# Numbers issued before this generator: TRK + booking time as YYYYmmddHHMMSS
+_LEGACY_FORMAT = re.compile(rf"^{TRACKING_PREFIX}\d{{14}}$")
+
+
+def _check_character(body: str) -> str:
+    """Luhn mod 32 check character for a string of base32 characters"""
+    factor = 2
+    total = 0
+    for char in reversed(body):
+        addend = factor * ALPHABET.index(char)
+        factor = 1 if factor == 2 else 2
+        total += addend // 32 + addend % 32
+    return ALPHABET[(32 - total % 32) % 32]
+
+
+def _configured_worker_id():
+    configured = os.getenv("TRACKING_WORKER_ID")
+    if configured is None:
+        return None
+    worker_id = int(configured)
+    if not 0 <= worker_id < (1 << WORKER_BITS):
+        raise ValueError(f"TRACKING_WORKER_ID must be between 0 and {(1 << WORKER_BITS) - 1}")
+    return worker_id
+
+
+class WorkerLease:
+    """A worker id leased from tracking_worker_leases"""
+
+    def __init__(self, bind=None, seconds: int = None):
+        self.bind = bind if bind is not None else engine
+        self.seconds = seconds or TRACKING_WORKER_LEASE_SECONDS
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.worker_id = None
+        self.expires_at = 0.0  # time.time() after which no number may be issued
+
+    def _claim(self, worker_id: int, now: datetime, taken: bool) -> bool:
+        expires_at = now + timedelta(seconds=self.seconds)
+        try:
+            with self.bind.begin() as conn:
+                if taken:
+                    # Only an expired lease may be taken over
+                    return conn.execute(
+                        update(TrackingWorkerLease)
+                        .where(TrackingWorkerLease.worker_id == worker_id, TrackingWorkerLease.expires_at < now)
+                        .values(owner=self.owner, expires_at=expires_at)
+                    ).rowcount == 1
+                conn.execute(insert(TrackingWorkerLease).values(
+                    worker_id=worker_id, owner=self.owner, expires_at=expires_at
+                ))
+                return True
+        except exc.IntegrityError:
+            return False  # another process leased it first
+
+    def acquire(self) -> int:
+        """Lease a free (or expired) worker id; raises RuntimeError if there is none"""
+        started = time.time()
+        now = datetime.utcnow()
+        with self.bind.begin() as conn:
+            leases = dict(conn.execute(select(TrackingWorkerLease.worker_id, TrackingWorkerLease.expires_at)).all())
+        free = [i for i in range(1 << WORKER_BITS) if i not in leases]
+        expired = [i for i, expires_at in leases.items() if expires_at < now]
+        # Random order so processes starting together rarely race for the same id
+        random.shuffle(free)
+        random.shuffle(expired)
+        for worker_id, taken in [(i, False) for i in free] + [(i, True) for i in expired]:
+            if self._claim(worker_id, now, taken):
+                self.worker_id = worker_id
+                self.expires_at = started + self.seconds
+                return worker_id
+        raise RuntimeError("No free tracking worker id to lease; set TRACKING_WORKER_ID or raise the lease count")
+
+    def renew(self) -> int:
+        """Extend the lease, leasing a new id if this one was lost; returns the worker id"""
+        started = time.time()
+        if self.worker_id is not None:
+            with self.bind.begin() as conn:
+                renewed = conn.execute(
+                    update(TrackingWorkerLease)
+                    .where(TrackingWorkerLease.worker_id == self.worker_id, TrackingWorkerLease.owner == self.owner)
+                    .values(expires_at=datetime.utcnow() + timedelta(seconds=self.seconds))
+                ).rowcount == 1
+            if renewed:
+                self.expires_at = started + self.seconds
+                return self.worker_id
+            logger.warning("Tracking worker id %s was taken over; leasing a new one", self.worker_id)
+        return self.acquire()
+
+    def release(self):
+        if self.worker_id is None:
+            return
+        with self.bind.begin() as conn:
+            conn.execute(delete(TrackingWorkerLease).where(
+                TrackingWorkerLease.worker_id == self.worker_id, TrackingWorkerLease.owner == self.owner
+            ))
+        self.worker_id = None
+        self.expires_at = 0.0
+
+    def expiring(self) -> bool:
+        # Renewed by the background job at a third of the term; this is the backstop
+        return time.time() > self.expires_at - self.seconds / 3
+
+
+class TrackingNumberGenerator:
+    def __init__(self, worker_id: int):
+        self.worker_id = worker_id
+        self.pid = os.getpid()
+        self._last_ms = -1
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def _next_id(self) -> int:
+        with self._lock:
+            now = int(time.time() * 1000) - TRACKING_EPOCH_MS
+            if now < self._last_ms:
+                # Clock stepped backwards: keep issuing from the last timestamp
+                now = self._last_ms
+            if now == self._last_ms:
+                self._sequence = (self._sequence + 1) & ((1 << SEQUENCE_BITS) - 1)
+                if self._sequence == 0:
+                    # Sequence exhausted for this millisecond; wait for the next one
+                    while now <= self._last_ms:
+                        now = int(time.time() * 1000) - TRACKING_EPOCH_MS
+            else:
+                self._sequence = 0
+            self._last_ms = now
+            return (now << (WORKER_BITS + SEQUENCE_BITS)) | (self.worker_id << SEQUENCE_BITS) | self._sequence
+
+    def next(self) -> str:
+        value = self._next_id()
+        chars = []
+        for _ in range(ID_LENGTH):
+            chars.append(ALPHABET[value & 31])
+            value >>= 5
+        body = "".join(reversed(chars))
+        return f"{TRACKING_PREFIX}{body}{_check_character(body)}"
+
+
+_generator = None
+_lease = None
+_generator_lock = threading.Lock()
+
+
+def tracking_generator() -> TrackingNumberGenerator:
+    """This process's generator, created on first use so forked workers never share one"""
+    global _generator, _lease
+    with _generator_lock:
+        if _generator is None or _generator.pid != os.getpid():
+            worker_id = _configured_worker_id()
+            if worker_id is None:
+                _lease = WorkerLease()
+                worker_id = _lease.acquire()
+            else:
+                _lease = None
+            _generator = TrackingNumberGenerator(worker_id)
+        elif _lease is not None and _lease.expiring():
+            _generator.worker_id = _lease.renew()
+        return _generator
+
+
+def renew_worker_lease():
+    with _generator_lock:
+        if _lease is not None and _generator is not None and _generator.pid == os.getpid():
+            _generator.worker_id = _lease.renew()
+
+
+def release_worker_lease():
+    global _generator, _lease
+    with _generator_lock:
+        if _lease is not None and _generator is not None and _generator.pid == os.getpid():
+            try:
+                _lease.release()
+            except Exception:
+                logger.warning("Could not release tracking worker id %s; it expires on its own", _lease.worker_id)
+        _generator = None
+        _lease = None
+
+
+async def worker_lease_job():
+    """Renew the tracking worker lease at a third of its term until cancelled"""
+    while True:
+        await asyncio.sleep(TRACKING_WORKER_LEASE_SECONDS / 3)
+        try:
+            await run_in_threadpool(renew_worker_lease)
+        except Exception:
+            logger.exception("Renewing the tracking worker lease failed")
+
+
+def new_tracking_number() -> str:
+    return tracking_generator().next()
+
+
+def is_valid_tracking_number(value: str) -> bool:
+    """Cheap format/check-character test, run before looking a number up"""
+    if _LEGACY_FORMAT.match(value):
+        return True
+    if not _NEW_FORMAT.match(value):
+        return False
+    body = value[len(TRACKING_PREFIX):-1]
+    return _check_character(body) == value[-1]
@@ -0,0 +1,139 @@
+"""
+Read-through cache for public parcel tracking.
+
+Two tiers: a per-process LRU with a short TTL (so other workers' stale
+copies age out quickly) and an optional shared tier configured with
+TRACKING_CACHE_REDIS_URL. Writers call `invalidate` after committing a
+change to a parcel; new parcels are written through with `prime`.
+
+`invalidate` also bumps a per-parcel version. A reader that misses takes
+the version with `version()` before querying and passes it to `prime`,
+which only caches the entry if the version has not moved. Otherwise a
+read that started before a write could cache the old row after the
+writer's invalidation, and keep serving it for the shared TTL.
+"""
+from dotenv import load_dotenv
+from datetime import timezone
+from email.utils import format_datetime
+from schemas.pydantic_schemas import ParcelOut
+from utils.cache import LRUCache, RedisSharedCache
+import hashlib
+import itertools
+import json
+import logging
+import os
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+TRACKING_CACHE_SIZE = int(os.getenv("TRACKING_CACHE_SIZE", "50000"))
+TRACKING_CACHE_LOCAL_TTL = float(os.getenv("TRACKING_CACHE_LOCAL_TTL", "5"))
+TRACKING_CACHE_SHARED_TTL = int(os.getenv("TRACKING_CACHE_SHARED_TTL", "300"))
+TRACKING_CACHE_REDIS_URL = os.getenv("TRACKING_CACHE_REDIS_URL")
+
+class TrackingEntry:
+    """A serialized tracking response with its validators"""
+
+    __slots__ = ("body", "etag", "last_modified")
+
+    def __init__(self, body: bytes, last_modified: str):
+        self.body = body
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.last_modified = last_modified  # HTTP-date string
+
+    def dumps(self) -> str:
+        return json.dumps({"body": self.body.decode("utf-8"), "last_modified": self.last_modified})
+
+    @classmethod
+    def loads(cls, raw: str):
+        data = json.loads(raw)
+        return cls(data["body"].encode("utf-8"), data["last_modified"])
+
+def entry_for_parcel(parcel, last_changed_at=None) -> TrackingEntry:
+    """Serialize a parcel the way the tracking endpoint returns it"""
+    body = ParcelOut.model_validate(parcel).model_dump_json().encode("utf-8")
+    changed = last_changed_at or parcel.booked_at
+    last_modified = format_datetime(changed.replace(tzinfo=timezone.utc), usegmt=True) if changed else None
+    return TrackingEntry(body, last_modified)
+
+class TrackingCache:
+    def __init__(self, shared=None):
+        self.local = LRUCache(TRACKING_CACHE_SIZE, TRACKING_CACHE_LOCAL_TTL)
+        # Versions come from one counter so an evicted version never comes back
+        self.local_versions = LRUCache(TRACKING_CACHE_SIZE, TRACKING_CACHE_SHARED_TTL * 2)
+        self._next_version = itertools.count(1)
+        self.shared = shared
+
+    @staticmethod
+    def _key(tracking_number: str) -> str:
+        return f"track:{tracking_number}"
+
+    @staticmethod
+    def _version_key(tracking_number: str) -> str:
+        return f"trackver:{tracking_number}"
+
+    async def version(self, tracking_number: str):
+        """Token to pass to `prime` for an entry read after this call"""
+        shared_version = None
+        if self.shared is not None:
+            try:
+                shared_version = await self.shared.get(self._version_key(tracking_number)) or "0"
+            except Exception as exc:
+                logger.warning(f"Shared tracking cache read failed: {exc}")
+        return self.local_versions.get(tracking_number) or 0, shared_version
+
+    async def get(self, tracking_number: str):
+        entry = self.local.get(tracking_number)
+        if entry is not None or self.shared is None:
+            return entry
+        try:
+            raw = await self.shared.get(self._key(tracking_number))
+        except Exception as exc:
+            # The shared tier is an optimisation; fall through to the database
+            logger.warning(f"Shared tracking cache read failed: {exc}")
+            return None
+        if raw is None:
+            return None
+        entry = TrackingEntry.loads(raw)
+        self.local.set(tracking_number, entry)
+        return entry
+
+    async def prime(self, tracking_number: str, entry: TrackingEntry, shared: bool = True, version=None):
+        """Cache `entry`; pass shared=False for reads that may be stale (replicas),
+        so they only live for the short local TTL.
+
+        Entries read from the database need the `version()` taken before the
+        read; they are dropped if the parcel was invalidated since.
+        """
+        local_version, shared_version = version or (None, None)
+        if local_version is not None and (self.local_versions.get(tracking_number) or 0) != local_version:
+            return
+        self.local.set(tracking_number, entry)
+        if not shared or self.shared is None:
+            return
+        try:
+            if version is None:
+                await self.shared.set(self._key(tracking_number), entry.dumps(), TRACKING_CACHE_SHARED_TTL)
+            elif shared_version is not None:
+                stored = await self.shared.set_if_version(
+                    self._key(tracking_number), entry.dumps(), TRACKING_CACHE_SHARED_TTL,
+                    self._version_key(tracking_number), shared_version,
+                )
+                if not stored:
+                    self.local.delete(tracking_number)
+        except Exception as exc:
+            logger.warning(f"Shared tracking cache write failed: {exc}")
+
+    async def invalidate(self, tracking_number: str):
+        self.local_versions.set(tracking_number, next(self._next_version))
+        self.local.delete(tracking_number)
+        if self.shared is not None:
+            try:
+                await self.shared.invalidate(
+                    self._key(tracking_number), self._version_key(tracking_number), TRACKING_CACHE_SHARED_TTL * 2
+                )
+            except Exception as exc:
+                logger.warning(f"Shared tracking cache delete failed: {exc}")
+
+tracking_cache = TrackingCache(RedisSharedCache(TRACKING_CACHE_REDIS_URL) if TRACKING_CACHE_REDIS_URL else None)